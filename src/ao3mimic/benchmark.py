@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+import datetime
+import pathlib
+import platform
+import random
+import statistics
+import tempfile
+import time
+import typing as T
+
+import msgspec
+import tomli_w
+from msgspec import Struct
+
+from . import __version__ as code_version
+from . import cache, utils
+from .exceptions import Ao3MimicException
+
+if T.TYPE_CHECKING:
+    import collections.abc as C
+
+# By default, a benchmark only counts as slower than its baseline if it takes this much longer.
+DEFAULT_TOLERANCE = 0.1
+
+_SYLLABLES = ["an", "bel", "cor", "da", "el", "fen", "gar", "hol", "is", "jor", "ka", "lin", "mor", "nel", "or", "pa", "quil", "ros"]
+_SYLLABLES += ["sa", "tor", "ul", "ven", "wyn", "xa", "yl", "zo", "th", "ch", "ae", "ri", "mu", "ste"]
+_PUNCTUATION = [".", ".", ".", ",", ",", ";", "?", "!", "—"]
+
+
+class ArchiveShape(Struct, kw_only=True, frozen=True):
+    """The size of a synthetic archive. The same shape and seed always give the same archive."""
+
+    works: int = 50
+    # chapters per work
+    chapters: int = 10
+    # paragraphs per chapter
+    paragraphs: int = 40
+    words_per_paragraph: int = 80
+    # additional tags per work, drawn from a pool shared by all the works
+    tags: int = 8
+    series: int = 5
+    seed: int = 0
+
+
+class _Generator:
+    def __init__(self, shape: ArchiveShape):
+        self.shape = shape
+        self.rng = random.Random(shape.seed)
+        self.vocabulary = sorted({self._word() for _ in range(5000)})
+        self.tag_pool = [self._tag_name() for _ in range(max(shape.tags * 10, 20))]
+        self.people = [self.title(1) for _ in range(40)]
+
+    def _word(self):
+        return "".join(self.rng.choices(_SYLLABLES, k=self.rng.choice([1, 1, 2, 2, 2, 3, 4])))
+
+    def title(self, words: int):
+        return " ".join(self.rng.choice(self.vocabulary).capitalize() for _ in range(words))
+
+    def _tag_name(self):
+        return self.title(self.rng.randint(1, 4))
+
+    def tag(self, name: str):
+        return [name, f"https://archiveofourown.org/tags/{name.replace(' ', '%20')}"]
+
+    def sentence(self, words: int):
+        text = " ".join(self.rng.choice(self.vocabulary) for _ in range(words))
+        return text.capitalize() + self.rng.choice(_PUNCTUATION)
+
+    def paragraph(self):
+        words_left = self.shape.words_per_paragraph
+        sentences = []
+        while words_left > 0:
+            length = min(words_left, self.rng.randint(4, 20))
+            sentence = self.sentence(length)
+            match self.rng.randrange(12):
+                case 0:
+                    sentence = f"“{sentence}”"
+                case 1:
+                    sentence = f"<em>{sentence}</em>"
+                case 2:
+                    sentence = f'<a href="https://example.com/{self.rng.choice(self.vocabulary)}">{sentence}</a>'
+            sentences.append(sentence)
+            words_left -= length
+        return f"<p>{' '.join(sentences)}</p>"
+
+    def chapter(self):
+        paragraphs = [self.paragraph() for _ in range(self.shape.paragraphs)]
+        if len(paragraphs) > 4:
+            paragraphs.insert(len(paragraphs) // 2, "<hr />")
+        return "\n".join(paragraphs) + "\n"
+
+    def work(self, num: int) -> dict[str, T.Any]:
+        from .models import Category, Rating, WorkWarning
+
+        rng = self.rng
+        characters = rng.sample(self.people, 3)
+        return {
+            "title": self.title(rng.randint(1, 5)),
+            "author": rng.choice(self.people),
+            "ordering": num,
+            "rating": rng.choice(list(Rating)).value,
+            "warnings": [rng.choice(list(WorkWarning)).value],
+            "categories": [category.value for category in rng.sample(list(Category), rng.randint(1, 2))],
+            "fandoms": [self.tag(f"{self.title(2)} - {rng.choice(self.people)}")],
+            "relationships": [self.tag(f"{characters[0]}/{characters[1]}")],
+            "characters": [self.tag(character) for character in characters],
+            "additional_tags": [self.tag(name) for name in rng.sample(self.tag_pool, self.shape.tags)],
+            "pubdate": datetime.date(1800, 1, 1) + datetime.timedelta(days=rng.randrange(200 * 365)),
+            "summary": f"<p>{self.sentence(30)}</p>",
+            "is_complete": rng.random() < 0.8,
+            "display_chapter_numbers": True,
+            "chapters": [
+                {"title": self.title(rng.randint(1, 6)), "content_file": f"chapter-{n:03}.html"} for n in range(1, self.shape.chapters + 1)
+            ],
+        }
+
+
+def generate_archive(dest: pathlib.Path, shape: ArchiveShape):
+    """Write a content directory full of made-up works and series, for seeing how the build copes with a big archive."""
+    generator = _Generator(shape)
+    dest.mkdir(parents=True, exist_ok=True)
+    (dest / "settings.toml").write_text(f'name = "Synthetic Archive"\nabout = "{shape.works} generated works."\n')
+    slugs = [f"work-{num:05}" for num in range(1, shape.works + 1)]
+    for num, slug in enumerate(slugs, start=1):
+        work_path = dest / "works" / slug
+        work_path.mkdir(parents=True, exist_ok=True)
+        work_dict = generator.work(num)
+        with (work_path / "work.toml").open("wb") as work_file:
+            tomli_w.dump(work_dict, work_file, indent=2)
+        for chapter in work_dict["chapters"]:
+            (work_path / chapter["content_file"]).write_text(generator.chapter())
+    if shape.series:
+        (dest / "series").mkdir(exist_ok=True)
+    for num in range(shape.series):
+        # every other work is in a series, spread among them round robin
+        series_dict = {
+            "title": generator.title(3),
+            "summary": f"<p>{generator.sentence(20)}</p>",
+            "works": slugs[num * 2 :: shape.series * 2],
+        }
+        with (dest / "series" / f"series-{num + 1:03}.toml").open("wb") as series_file:
+            tomli_w.dump(series_dict, series_file)
+
+
+class BenchmarkResult(Struct, kw_only=True):
+    # how many things (chapters, pages) each run went through
+    items: int
+    runs: list[float]
+
+    @property
+    def best(self):
+        return min(self.runs)
+
+    @property
+    def median(self):
+        return statistics.median(self.runs)
+
+
+class BenchmarkReport(Struct, kw_only=True):
+    version: str
+    python: str
+    shape: T.Optional[ArchiveShape]
+    results: dict[str, BenchmarkResult]
+
+    def save(self, path: pathlib.Path):
+        path.write_bytes(msgspec.json.format(msgspec.json.encode(self)))
+
+    @classmethod
+    def load(cls, path: pathlib.Path):
+        return msgspec.json.decode(path.read_bytes(), type=cls)
+
+    def summary(self) -> str:
+        lines = [f"{'Benchmark':<20}{'Items':>8}{'Best s':>10}{'Median s':>10}{'Per item ms':>13}"]
+        for name, result in self.results.items():
+            lines.append(
+                f"{name:<20}{result.items:>8}{result.best:>10.3f}{result.median:>10.3f}{result.best / max(result.items, 1) * 1000:>13.2f}"
+            )
+        return "\n".join(lines)
+
+
+class Comparison(Struct, kw_only=True):
+    name: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self):
+        return self.current / self.baseline if self.baseline else float("inf")
+
+    def __str__(self):
+        return f"{self.name}: {self.baseline:.3f}s -> {self.current:.3f}s ({self.ratio - 1:+.1%})"
+
+
+def compare(report: BenchmarkReport, baseline: BenchmarkReport, tolerance: float = DEFAULT_TOLERANCE) -> list[Comparison]:
+    """The benchmarks whose best time is more than ``tolerance`` slower than in the baseline."""
+    if report.shape != baseline.shape:
+        raise Ao3MimicException("The baseline was measured on a differently shaped archive, so it can't be compared.")
+    regressions = []
+    for name, result in report.results.items():
+        if (before := baseline.results.get(name)) is None:
+            continue
+        comparison = Comparison(name=name, baseline=before.best, current=result.best)
+        if comparison.ratio > 1 + tolerance:
+            regressions.append(comparison)
+    return regressions
+
+
+def _time_runs(func: C.Callable[[], T.Any], repeat: int) -> list[float]:
+    runs = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start_time)
+    return runs
+
+
+def run_benchmarks(content: pathlib.Path, repeat: int = 3, shape: T.Optional[ArchiveShape] = None) -> BenchmarkReport:
+    """Time each stage of the build on a content directory, ``repeat`` times over.
+
+    The build cache is turned off, so each run does all its work from scratch. Laying out pages is timed with the chapters
+    already sanitized, as sanitizing is timed on its own.
+    """
+    cache_root = cache.get_root()
+    cache.configure(None)
+    try:
+        return _run_benchmarks(content, repeat, shape)
+    finally:
+        cache.configure(cache_root)
+
+
+def _run_benchmarks(content: pathlib.Path, repeat: int, shape: T.Optional[ArchiveShape]) -> BenchmarkReport:
+    # imported here, so that the command line doesn't load the whole build just to list its options
+    import htpy as h
+
+    from .models import Site
+    from .render import RenderableArchive
+    from .sanitize import process_html
+
+    results: dict[str, BenchmarkResult] = {}
+    site = Site.load_site(content)
+    results["load_site"] = BenchmarkResult(items=len(site.works), runs=_time_runs(lambda: Site.load_site(content), repeat))
+
+    chapter_texts = [chapter.content for work in site.works for chapter in work.chapters]
+    results["count_html_text"] = BenchmarkResult(
+        items=len(chapter_texts), runs=_time_runs(lambda: [utils.count_html_text(text) for text in chapter_texts], repeat)
+    )
+    # the sanitizer itself, rather than clean_userstuff, which remembers what it has already cleaned
+    results["clean_userstuff"] = BenchmarkResult(
+        items=len(chapter_texts), runs=_time_runs(lambda: [process_html(text) for text in chapter_texts], repeat)
+    )
+
+    archive = RenderableArchive(site)
+    routers = [router for router in map(archive.router, archive.plan()) if not router.is_binary]
+    pages: dict[str, str] = {}
+
+    def layout_pages():
+        archive.fragments.clear()
+        for router in routers:
+            pages[router.current_url] = "".join(h.iter_node(archive.layout_page(router)))
+
+    layout_pages()
+    results["layout"] = BenchmarkResult(items=len(routers), runs=_time_runs(layout_pages, repeat))
+    results["get_site_urls"] = BenchmarkResult(
+        items=len(pages), runs=_time_runs(lambda: [utils.get_site_urls(page, url) for url, page in pages.items()], repeat)
+    )
+
+    with tempfile.TemporaryDirectory(prefix="ao3mimic-benchmark-") as output:
+
+        def render():
+            utils._sanitized.clear()
+            fresh_archive = RenderableArchive(Site.load_site(content))
+            fresh_archive.render(pathlib.Path(output), force=True)
+
+        results["render"] = BenchmarkResult(items=len(archive.plan()), runs=_time_runs(render, repeat))
+
+    return BenchmarkReport(version=code_version, python=platform.python_version(), shape=shape, results=results)
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import typing as T
+
+if T.TYPE_CHECKING:
+    import collections.abc as C
+    import pathlib
+
+DEFAULT_CACHE_DIRNAME = ".ao3mimic-cache"
+
+_cache_root: T.Optional[pathlib.Path] = None
+
+
+def configure(root: T.Optional[pathlib.Path]):
+    """Set (or with None, disable) the directory that persistent caches are kept in."""
+    global _cache_root
+    _cache_root = root.resolve() if root is not None else None
+
+
+def get_root() -> T.Optional[pathlib.Path]:
+    return _cache_root
+
+
+def get_cache(namespace: str) -> T.Optional[DiskCache]:
+    if _cache_root is None:
+        return None
+    return DiskCache(_cache_root / namespace)
+
+
+def cache_key(*parts: str | bytes) -> str:
+    hasher = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        hasher.update(part.encode("utf-8") if isinstance(part, str) else part)
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+class DiskCache:
+    """Stores byte strings in files named for their keys. Several processes can share one safely."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+
+    def _entry_path(self, key: str):
+        return self.path / key[:2] / key
+
+    def get(self, key: str) -> T.Optional[bytes]:
+        try:
+            return self._entry_path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: bytes):
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file and move it into place, so readers never see a partial entry
+        fd, temp_name = tempfile.mkstemp(dir=entry_path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(value)
+            os.replace(temp_name, entry_path)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+
+    def prune(self, keep: C.Container[str]):
+        """Remove every entry except those with these keys."""
+        if not self.path.is_dir():
+            return
+        for bucket in self.path.iterdir():
+            if not bucket.is_dir():
+                continue
+            for entry_path in bucket.iterdir():
+                # another process may be about to move a temporary file into place
+                if entry_path.name not in keep and not entry_path.name.startswith(".tmp-"):
+                    entry_path.unlink(missing_ok=True)
@@ -1,24 +1,127 @@
+from __future__ import annotations
+
 import argparse
+import contextlib
 import pathlib
+import tempfile
+import typing as T
+
+from . import cache
+from .media import MediaMode
+
+if T.TYPE_CHECKING:
+    from .models import Site
+
+# Each command imports the parts of ao3mimic it needs when it runs, as the libraries behind them are slow to import, and
+# there's no need to wait for them just to see --help.
+
+
+def encoding_list(value: str) -> list[str]:
+    from . import compress
+
+    encodings = [encoding.strip() for encoding in value.split(",") if encoding.strip()]
+    for encoding in encodings:
+        if encoding not in compress.ENCODING_SUFFIXES:
+            raise argparse.ArgumentTypeError(f"unknown encoding {encoding!r}; choose from {', '.join(compress.ENCODING_SUFFIXES)}")
+        if encoding not in compress.available_encodings():
+            raise argparse.ArgumentTypeError(f"{encoding} needs an optional dependency; install ao3mimic[{encoding}]")
+    return encodings
+
 
-from .models import Site, converter
-from .normalize import NormalizeArgs, normalize
-from .render import RenderableArchive
+cache_options = argparse.ArgumentParser(add_help=False)
+cache_options.add_argument(
+    "--cache-dir",
+    type=pathlib.Path,
+    help=f"Directory for the build cache (defaults to {cache.DEFAULT_CACHE_DIRNAME} in the content directory)",
+)
+cache_options.add_argument("--no-cache", action="store_true", help="Don't keep a build cache on disk")
 
 parser = argparse.ArgumentParser()
 subparsers = parser.add_subparsers(dest="command", title="commands", required=True)
 
-normalize_parser = subparsers.add_parser("normalize", help="Normalize a work's TOML file, including resolving tags.")
-normalize_parser.add_argument("work", type=pathlib.Path, help="TOML file for the work")
+normalize_parser = subparsers.add_parser(
+    "normalize", help="Normalize a work's TOML file, including resolving tags.", parents=[cache_options]
+)
+normalize_parser.add_argument("work", type=pathlib.Path, help="TOML file for the work (or the content directory, with --all)")
+normalize_parser.add_argument("--all", action="store_true", help="Normalize every work in the content directory")
 normalize_parser.add_argument("--dry-run", action="store_true", help="Print out the normalized TOML instead of writing to the file")
 normalize_parser.add_argument("--skip-tag-check", action="store_true", help="Don't check tag URLs against AO3")
 
-analyze_parser = subparsers.add_parser("analyze", help="Analyze the content directory and print out various particulars.")
+analyze_parser = subparsers.add_parser(
+    "analyze", help="Analyze the content directory and print out various particulars.", parents=[cache_options]
+)
 analyze_parser.add_argument("content", type=pathlib.Path, help="Directory with content")
 
-render_parser = subparsers.add_parser("render", help="Render the site from the content directory")
+render_parser = subparsers.add_parser("render", help="Render the site from the content directory", parents=[cache_options])
 render_parser.add_argument("content", type=pathlib.Path, help="Directory with content")
 render_parser.add_argument("dest", type=pathlib.Path, help="Destination directory")
+render_parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of worker processes to render pages with")
+render_parser.add_argument("--force", action="store_true", help="Rebuild every page, even those whose inputs haven't changed")
+render_parser.add_argument("--verify-links", action="store_true", help="Crawl the rendered site afterward and report any broken links")
+render_parser.add_argument("--watch", action="store_true", help="Keep running, and rebuild the affected pages whenever the content changes")
+render_parser.add_argument(
+    "--fingerprint-assets",
+    action="store_true",
+    help="Put a digest of their content in the names of stylesheets, scripts and the logo, so they can be cached indefinitely",
+)
+render_parser.add_argument(
+    "--media-mode",
+    choices=[mode.value for mode in MediaMode],
+    default=MediaMode.COPY.value,
+    help="How to put media, stylesheets and the logo into the output: copy them, or link to them instead of copying the bytes",
+)
+render_parser.add_argument(
+    "--precompress",
+    type=encoding_list,
+    default=[],
+    metavar="ENCODINGS",
+    help="Also write compressed copies of the HTML, CSS, JavaScript and SVG files, such as --precompress gzip,brotli",
+)
+render_parser.add_argument(
+    "--low-memory",
+    action="store_true",
+    help="Render work by work, letting go of each work's chapters once its pages are written, to build big archives in less memory",
+)
+render_parser.add_argument(
+    "--profile",
+    type=pathlib.Path,
+    metavar="REPORT",
+    help="Time each phase of the build and each page, print a summary and save the full report as JSON",
+)
+
+# Options left out take ArchiveShape's defaults.
+shape_options = argparse.ArgumentParser(add_help=False)
+shape_options.add_argument("--works", type=int, help="Number of works to generate")
+shape_options.add_argument("--chapters", type=int, help="Number of chapters in each work")
+shape_options.add_argument("--paragraphs", type=int, help="Number of paragraphs in each chapter")
+shape_options.add_argument("--words-per-paragraph", type=int, help="Number of words in each paragraph")
+shape_options.add_argument("--tags", type=int, help="Number of additional tags on each work")
+shape_options.add_argument("--series", type=int, help="Number of series to group the works into")
+shape_options.add_argument("--seed", type=int, help="Seed for the random content; the same seed gives the same archive")
+
+generate_parser = subparsers.add_parser(
+    "generate-archive", help="Generate a content directory full of made-up works, for benchmarking.", parents=[shape_options]
+)
+generate_parser.add_argument("dest", type=pathlib.Path, help="Directory to generate the content in")
+
+benchmark_parser = subparsers.add_parser(
+    "benchmark", help="Time loading, sanitizing, laying out and rendering a generated archive.", parents=[shape_options]
+)
+benchmark_parser.add_argument("--content", type=pathlib.Path, help="Benchmark this content directory instead of generating one")
+benchmark_parser.add_argument("--repeat", type=int, default=3, help="Number of times to run each benchmark")
+benchmark_parser.add_argument("--output", type=pathlib.Path, help="Save the results as JSON")
+benchmark_parser.add_argument("--baseline", type=pathlib.Path, help="Results saved earlier, to report any benchmarks that have got slower")
+benchmark_parser.add_argument(
+    "--tolerance", type=float, help="How much slower than the baseline a benchmark may be, as a fraction (defaults to 0.1)"
+)
+
+serve_parser = subparsers.add_parser(
+    "serve", help="Serve the site from the content directory, rendering pages as they are requested", parents=[cache_options]
+)
+serve_parser.add_argument("content", type=pathlib.Path, help="Directory with content")
+serve_parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+serve_parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+serve_parser.add_argument("--no-reload", action="store_true", help="Don't restart the server when content files change")
 
 
 def display_site(site: Site):
@@ -35,10 +138,10 @@ def display_site(site: Site):
         print()
         print(f"{work.slug} — {work.title} — {work.author}")
         print(f"{work.rating} — {work.warnings} — {work.categories}")
-        print(f"Fandoms: {[t[0] for t in work.fandoms]}")
-        print(f"Relationships: {[t[0] for t in work.relationships]}")
-        print(f"Characters: {[t[0] for t in work.characters]}")
-        print(f"Additional Tags: {[t[0] for t in work.additional_tags]}")
+        print(f"Fandoms: {[tag.name for tag in work.fandoms]}")
+        print(f"Relationships: {[tag.name for tag in work.relationships]}")
+        print(f"Characters: {[tag.name for tag in work.characters]}")
+        print(f"Additional Tags: {[tag.name for tag in work.additional_tags]}")
         print(f"{work.published} — {work.chapter_count} chapters — {work.wordcount} words")
         if work.notes_before is not None:
             print("Has notes before")
@@ -50,16 +153,126 @@ def display_site(site: Site):
             print(f"Series: {wis.position} in {wis.series.title}")
 
 
+def find_content_directory(path: pathlib.Path) -> T.Optional[pathlib.Path]:
+    for candidate in [path, *path.parents]:
+        if (candidate / "settings.toml").is_file():
+            return candidate
+    return None
+
+
+def configure_cache(args: dict[str, T.Any], content: T.Optional[pathlib.Path]):
+    if args["no_cache"]:
+        cache.configure(None)
+    elif args["cache_dir"] is not None:
+        cache.configure(args["cache_dir"])
+    elif content is not None:
+        cache.configure(content / cache.DEFAULT_CACHE_DIRNAME)
+
+
+def content_files(content: pathlib.Path) -> list[pathlib.Path]:
+    cache_root = cache.get_root()
+    return [
+        path for path in content.resolve().rglob("*") if path.is_file() and not (cache_root is not None and path.is_relative_to(cache_root))
+    ]
+
+
+def archive_shape(args: dict[str, T.Any]):
+    from .benchmark import ArchiveShape
+
+    return ArchiveShape(**{field: args[field] for field in ArchiveShape.__struct_fields__ if args[field] is not None})
+
+
+def benchmark(args: dict[str, T.Any]):
+    from .benchmark import DEFAULT_TOLERANCE, BenchmarkReport, compare, generate_archive, run_benchmarks
+
+    if args["content"] is not None:
+        report = run_benchmarks(args["content"], repeat=args["repeat"])
+    else:
+        shape = archive_shape(args)
+        with tempfile.TemporaryDirectory(prefix="ao3mimic-archive-") as content:
+            generate_archive(pathlib.Path(content), shape)
+            report = run_benchmarks(pathlib.Path(content), repeat=args["repeat"], shape=shape)
+    print(report.summary())
+    if args["output"] is not None:
+        report.save(args["output"])
+    if args["baseline"] is not None:
+        tolerance = DEFAULT_TOLERANCE if args["tolerance"] is None else args["tolerance"]
+        regressions = compare(report, BenchmarkReport.load(args["baseline"]), tolerance=tolerance)
+        for regression in regressions:
+            print(f"Slower than baseline: {regression}")
+        if regressions:
+            parser.exit(1, f"{len(regressions)} benchmarks slower than the baseline.\n")
+
+
 def main() -> None:
     args = vars(parser.parse_args())
     command = args.pop("command")
     if command == "normalize":
+        from .models import converter
+        from .normalize import NormalizeArgs, normalize
+
+        configure_cache(args, args["work"] if args["all"] else find_content_directory(args["work"].resolve().parent))
         normalize(converter.structure(args, NormalizeArgs))
     elif command == "analyze":
+        from .models import Site
+
+        configure_cache(args, args["content"])
         display_site(Site.load_site(args["content"]))
+    elif command == "render" and args["watch"]:
+        from .watch import Watcher
+
+        if args["profile"] is not None:
+            # a watch never finishes, so there's no end to the build to report on
+            render_parser.error("--profile can't be used with --watch")
+        configure_cache(args, args["content"])
+        with contextlib.suppress(KeyboardInterrupt):
+            Watcher(
+                args["content"],
+                args["dest"],
+                jobs=args["jobs"],
+                force=args["force"],
+                verify_links=args["verify_links"],
+                precompress=args["precompress"],
+                fingerprint_assets=args["fingerprint_assets"],
+                media_mode=MediaMode(args["media_mode"]),
+                low_memory=args["low_memory"],
+            ).run()
     elif command == "render":
+        from . import profiling
+        from .models import Site
+        from .render import RenderableArchive
+
+        configure_cache(args, args["content"])
+        if args["profile"] is not None:
+            profiling.start()
+        site = Site.load_site(args["content"])
+        archive = RenderableArchive(site, fingerprint_assets=args["fingerprint_assets"], media_mode=MediaMode(args["media_mode"]))
+        archive.render(args["dest"], jobs=args["jobs"], force=args["force"], precompress=args["precompress"], low_memory=args["low_memory"])
+        broken = []
+        if args["verify_links"]:
+            with profiling.timed("verify_links"):
+                broken = archive.verify_links(args["dest"], archive.plan())
+            for page, target in broken:
+                print(f"Broken link: {page} -> {target}")
+        if (report := profiling.stop()) is not None:
+            report.save(args["profile"])
+            print(report.summary())
+        if broken:
+            parser.exit(1, f"{len(broken)} broken links found.\n")
+    elif command == "generate-archive":
+        from .benchmark import generate_archive
+
+        generate_archive(args["dest"], archive_shape(args))
+    elif command == "benchmark":
+        benchmark(args)
+    elif command == "serve":
+        from .models import Site
+        from .render import RenderableArchive
+        from .serve import serve
+
+        configure_cache(args, args["content"])
         site = Site.load_site(args["content"])
-        archive = RenderableArchive(site)
-        archive.render(args["dest"])
+        watch = [] if args["no_reload"] else content_files(args["content"])
+        serve(RenderableArchive(site), args["host"], args["port"], watch=watch)
     else:
         raise AssertionError("This should never happen.")
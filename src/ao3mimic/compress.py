@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import concurrent.futures
+import gzip
+import hashlib
+import itertools
+import typing as T
+
+from .utils import urlpath_to_filepath
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+if T.TYPE_CHECKING:
+    import collections.abc as C
+    import pathlib
+
+# The suffix each encoding's compressed copy is saved with, next to the original file.
+ENCODING_SUFFIXES = {"gzip": ".gz", "brotli": ".br"}
+
+COMPRESSIBLE_SUFFIXES = frozenset([".html", ".css", ".js", ".svg", ".json"])
+
+# Smaller files aren't worth compressing; the saving is lost in the overhead of the request.
+MIN_COMPRESS_SIZE = 1024
+
+
+def available_encodings() -> list[str]:
+    return [encoding for encoding in ENCODING_SUFFIXES if encoding != "brotli" or brotli is not None]
+
+
+def is_compressible(url: str):
+    filename = urlpath_to_filepath(url)
+    return any(filename.endswith(suffix) for suffix in COMPRESSIBLE_SUFFIXES)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    match encoding:
+        case "gzip":
+            # a fixed mtime, so the same page always compresses to the same bytes
+            return gzip.compress(data, compresslevel=9, mtime=0)
+        case "brotli":
+            if brotli is None:
+                raise ValueError("Brotli compression needs the brotli package to be installed.")
+            return brotli.compress(data, mode=brotli.MODE_TEXT)
+    raise ValueError(f"Unknown encoding {encoding}")
+
+
+def compressed_path(path: pathlib.Path, encoding: str):
+    return path.with_name(path.name + ENCODING_SUFFIXES[encoding])
+
+
+def remove_compressed(path: pathlib.Path):
+    for encoding in ENCODING_SUFFIXES:
+        compressed_path(path, encoding).unlink(missing_ok=True)
+
+
+def compress_file(path: pathlib.Path, encodings: C.Collection[str], previous_digest: T.Optional[str]) -> T.Optional[str]:
+    """Write a compressed copy of the file for each encoding, returning a digest of its content.
+
+    Nothing is compressed again if the content still has the previous digest and its compressed copies are all there. Returns
+    None, leaving no compressed copies, if the file is too small to bother with.
+    """
+    data = path.read_bytes()
+    if len(data) < MIN_COMPRESS_SIZE:
+        remove_compressed(path)
+        return None
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    for encoding in ENCODING_SUFFIXES:
+        dest = compressed_path(path, encoding)
+        if encoding not in encodings:
+            dest.unlink(missing_ok=True)
+        elif digest != previous_digest or not dest.is_file():
+            dest.unlink(missing_ok=True)
+            dest.write_bytes(compress(data, encoding))
+    return digest
+
+
+def precompress(
+    output_directory: pathlib.Path,
+    urls: C.Iterable[str],
+    encodings: C.Collection[str],
+    previous: C.Mapping[str, str],
+    jobs: int = 1,
+) -> dict[str, str]:
+    """Write compressed copies of the rendered text files, for web servers which can serve them directly.
+
+    ``previous`` maps each URL compressed last time to the digest of its content then; the same mapping for these URLs is
+    returned. Without any encodings, their compressed copies from last time are removed instead.
+    """
+    if not encodings:
+        for url in urls:
+            if url in previous:
+                remove_compressed(output_directory / urlpath_to_filepath(url))
+        return {}
+    urls = [url for url in urls if is_compressible(url)]
+    paths = [output_directory / urlpath_to_filepath(url) for url in urls]
+    previous_digests = [previous.get(url) for url in urls]
+    if jobs <= 1 or len(urls) <= 1:
+        digests = list(map(compress_file, paths, itertools.repeat(encodings), previous_digests))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            digests = list(executor.map(compress_file, paths, itertools.repeat(frozenset(encodings)), previous_digests, chunksize=16))
+    return {url: digest for url, digest in zip(urls, digests, strict=True) if digest is not None}
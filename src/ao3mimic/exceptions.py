@@ -4,3 +4,12 @@ class Ao3MimicException(Exception):
 
 class SiteStructureError(Ao3MimicException):
     pass
+
+
+class RenderError(Ao3MimicException):
+    def __init__(self, url: str):
+        super().__init__(url)
+        self.url = url
+
+    def __str__(self):
+        return f"Failed to render {self.url}"
@@ -1,28 +1,101 @@
 from __future__ import annotations
 
-import operator
+import html
+import itertools
 import typing as T
 
 import htpy as h
+import markupsafe
 
 from . import __version__ as code_version
-from .models import Category, Chapter, Series, Site, Work, WorkInSeries, WorkWarning
-from .utils import clean_userstuff, comma_separated, thousands
+from .models import Category, Chapter, Series, Site, Tag, Work, WorkInSeries, WorkWarning
+from .utils import clean_userstuff, comma_separated, page_count, page_items, thousands
 
 if T.TYPE_CHECKING:
     import collections.abc as C
 
     from .render import Router
 
+# Surrounds each link's absolute URL in a fragment template; see FragmentCache.
+LINK_MARKER = "\0"
+# How many page links to show either side of the current page.
+PAGINATION_WINDOW = 2
+
+
+class FragmentCache:
+    """Keeps the pieces of markup shared by many pages, such as the site header and work blurbs.
+
+    Each fragment is rendered once, with a template router which marks every link, and the relative links are then filled
+    in once for each directory the fragment is used from.
+    """
+
+    def __init__(self, template_router: Router):
+        self.template_router = template_router
+        self._templates: dict[T.Hashable, list[str]] = {}
+        self._fragments: dict[tuple[T.Hashable, str], markupsafe.Markup] = {}
+
+    def get(self, key: T.Hashable, router: Router, build: C.Callable[[Layout], h.Node]) -> markupsafe.Markup:
+        if (fragment := self._fragments.get((key, router.directory))) is not None:
+            return fragment
+        if (template := self._templates.get(key)) is None:
+            rendered = "".join(h.iter_node(build(Layout(self.template_router.site, self.template_router))))
+            template = self._templates[key] = rendered.split(LINK_MARKER)
+        # the odd-numbered parts are the (escaped) absolute URLs
+        fragment = markupsafe.Markup(
+            "".join(part if i % 2 == 0 else markupsafe.escape(router.relative_url(html.unescape(part))) for i, part in enumerate(template))
+        )
+        self._fragments[(key, router.directory)] = fragment
+        return fragment
+
+    def clear(self):
+        self._templates.clear()
+        self._fragments.clear()
+
 
 class Layout:
-    def __init__(self, site: Site, router: Router):
+    def __init__(self, site: Site, router: Router, fragments: T.Optional[FragmentCache] = None):
         self.site = site
         self.router = router
+        self.fragments = fragments
+
+    def fragment(self, key: T.Hashable, build: C.Callable[[Layout], h.Node]) -> h.Node:
+        if self.fragments is None:
+            return build(self)
+        return self.fragments.get(key, self.router, build)
 
     def site_skin(self, page_title: str, body, extra_header=None):
         if not (self.site.settings.single_work or page_title == self.site.settings.name):
             page_title += f" [{self.site.settings.name}]"
+        return h.html(lang="en")[
+            h.head[
+                h.meta(charset="utf-8"),
+                h.meta(http_equiv="x-ua-compatible", content="ie=edge"),
+                h.meta(name="language", content="en-US"),
+                h.meta(name="viewport", content="width=device-width, initial-scale=1.0"),
+                h.title[page_title],
+                self.fragment("site_stylesheets", Layout._site_stylesheets),
+                extra_header,
+            ],
+            h.body[
+                h.div("#outer.wrapper")[
+                    self.fragment("site_header", Layout._site_header),
+                    h.div("#inner.wrapper")[body],
+                    self.fragment("site_footer", Layout._site_footer),
+                ]
+            ],
+        ]
+
+    def _site_stylesheets(self):
+        site_css = None
+        if self.site.has_site_css:
+            site_css = h.link(rel="stylesheet", type="text/css", media="screen", href=self.router.static_file("site.css"))
+        return [
+            h.link(rel="stylesheet", type="text/css", media="screen", href=self.router.static_file("styles.css")),
+            site_css,
+            h.script(src=self.router.static_file("_hyperscript-0.9.13.js"), type="text/javascript"),
+        ]
+
+    def _site_header(self):
         if self.site.settings.single_work:
             nav_header_items = h.li[h.a]
         else:
@@ -31,7 +104,14 @@ class Layout:
                 nav_header_items.append(h.li[h.a(href=self.router.section_index("series"))["Series"]])
             nav_header_items.append(
                 h.li(".search")[
-                    h.form("#search.search", role="search", aria_label="Work", action="", accept_charset="UTF-8", method="get")[
+                    h.form(
+                        "#search.search",
+                        role="search",
+                        aria_label="Work",
+                        action=self.router.search_page(),
+                        accept_charset="UTF-8",
+                        method="get",
+                    )[
                         h.fieldset[
                             h.p[
                                 h.label(".landmark", for_="site_search")["Work Search"],
@@ -42,77 +122,53 @@ class Layout:
                                     name="work_search[query]",
                                 ),
                                 h.span("#site_search_tooltip.tip", role="tooltip")["tip: words:100"],
-                                h.span(".submit.actions")[h.input(".button", type="submit", value="Search", disabled=True)],
+                                h.span(".submit.actions")[h.input(".button", type="submit", value="Search")],
                             ]
                         ]
                     ]
                 ]
             )
+        return [
+            h.ul("#skiplinks")[h.li[h.a(href="#main")["Main Content"]]],
+            h.noscript[
+                h.p("#javascript-warning")[
+                    "While we've done our best to make the core functionality of this site accessible without JavaScript, it will work better with it enabled. Please consider turning it on!"
+                ]
+            ],
+            h.header("#header.region")[
+                h.h1(".heading")[
+                    h.a(href=self.router.root())[
+                        h.span[self.site.settings.name],
+                        h.sup[self.site.settings.release_status],
+                        h.img(".logo", alt=self.site.settings.name, src=self.router.static_file("logo.png")),
+                    ]
+                ],
+                h.nav(aria_label="Site")[h.ul(".primary.navigation.actions")[nav_header_items]],
+                h.div(".clear"),
+            ],
+        ]
+
+    def _site_footer(self):
         about = None
         if self.site.settings.about:
             about = h.li(".module.group")[h.h4(".heading")["About"], h.ul(".menu")[h.li[self.site.settings.about]]]
-        site_css = None
-        if self.site.has_site_css:
-            site_css = h.link(rel="stylesheet", type="text/css", media="screen", href=self.router.static_file("site.css"))
-        return h.html(lang="en")[
-            h.head[
-                h.meta(charset="utf-8"),
-                h.meta(http_equiv="x-ua-compatible", content="ie=edge"),
-                h.meta(name="language", content="en-US"),
-                h.meta(name="viewport", content="width=device-width, initial-scale=1.0"),
-                h.title[page_title],
-                h.link(rel="stylesheet", type="text/css", media="screen", href=self.router.static_file("styles.css")),
-                site_css,
-                h.script(src=self.router.static_file("_hyperscript-0.9.13.js"), type="text/javascript"),
-                extra_header,
-            ],
-            h.body[
-                h.div("#outer.wrapper")[
-                    h.ul("#skiplinks")[h.li[h.a(href="#main")["Main Content"]]],
-                    h.noscript[
-                        h.p("#javascript-warning")[
-                            "While we've done our best to make the core functionality of this site accessible without JavaScript, it will work better with it enabled. Please consider turning it on!"
-                        ]
+        return h.div("#footer.region", role="contentinfo")[
+            h.h3(".landmark.heading")["Footer"],
+            h.ul(".navigation.actions", role="navigation")[
+                h.li(".module.group")[
+                    h.h4(".heading")["Development"],
+                    h.ul(".menu")[
+                        h.li[h.a(href=f"https://github.com/inklesspen/ao3mimic/commits/v{code_version}")[f"ao3mimic v{code_version}"]],
+                        h.li[h.a(title="View License", href="https://www.gnu.org/licenses/old-licenses/gpl-2.0.html")["GPL-2.0-or-later"]],
                     ],
-                    h.header("#header.region")[
-                        h.h1(".heading")[
-                            h.a(href=self.router.root())[
-                                h.span[self.site.settings.name],
-                                h.sup[self.site.settings.release_status],
-                                h.img(".logo", alt=self.site.settings.name, src=self.router.static_file("logo.png")),
-                            ]
-                        ],
-                        h.nav(aria_label="Site")[h.ul(".primary.navigation.actions")[nav_header_items]],
-                        h.div(".clear"),
-                    ],
-                    h.div("#inner.wrapper")[body],
-                    h.div("#footer.region", role="contentinfo")[
-                        h.h3(".landmark.heading")["Footer"],
-                        h.ul(".navigation.actions", role="navigation")[
-                            h.li(".module.group")[
-                                h.h4(".heading")["Development"],
-                                h.ul(".menu")[
-                                    h.li[
-                                        h.a(href=f"https://github.com/inklesspen/ao3mimic/commits/v{code_version}")[
-                                            f"ao3mimic v{code_version}"
-                                        ]
-                                    ],
-                                    h.li[
-                                        h.a(title="View License", href="https://www.gnu.org/licenses/old-licenses/gpl-2.0.html")[
-                                            "GPL-2.0-or-later"
-                                        ]
-                                    ],
-                                ],
-                            ],
-                            about,
-                        ],
-                    ],
-                ]
+                ],
+                about,
             ],
         ]
 
-    def tag(self, tag):
-        return h.a(".tag", rel="noreferrer", href=tag[1])[tag[0]] if isinstance(tag, tuple) else h.span(".tag")[tag]
+    def tag(self, tag: Tag | str):
+        # ratings and warnings are shown like tags, but aren't in the tag table
+        return h.span(".tag")[tag] if isinstance(tag, str) else tag.anchor
 
     def warning_symbol(self, warnings: C.Sequence[WorkWarning]):
         if len(warnings) == 0:
@@ -138,7 +194,7 @@ class Layout:
                 ]
             ]
         else:
-            warning_text = ", ".join(frozenset([str(w) for w in warnings]))
+            warning_text = ", ".join(dict.fromkeys(str(w) for w in warnings))
             warnings_el = h.li[
                 h.a(".help.symbol.question", title="Symbols key")[
                     h.span(".warning-yes.warnings", title=warning_text)[h.span(".text")[warning_text]]
@@ -155,7 +211,7 @@ class Layout:
             category_text = categories[0].value
         else:
             category_class = "category-multi"
-            category_text = ", ".join(frozenset([str(w) for w in categories]))
+            category_text = ", ".join(dict.fromkeys(str(w) for w in categories))
         return h.li[
             h.a(".help.symbol.question", title="Symbols key")[
                 h.span(class_=[category_class, "category"], title=category_text)[h.span(".text")[category_text]]
@@ -178,6 +234,9 @@ class Layout:
         )
 
     def work_blurb(self, work: Work):
+        return self.fragment(("work_blurb", work.slug), lambda layout: layout._work_blurb(work))
+
+    def _work_blurb(self, work: Work):
         series = None
         wises = self.site.work_in_series.get(work.slug, [])
         if wises:
@@ -237,6 +296,9 @@ class Layout:
         )
 
     def series_blurb(self, series: Series):
+        return self.fragment(("series_blurb", series.slug), lambda layout: layout._series_blurb(series))
+
+    def _series_blurb(self, series: Series):
         highest_rating = series.overall_rating
         rating_text = ", ".join(str(r) for r in series.ratings)
         rating = h.li[
@@ -257,40 +319,79 @@ class Layout:
             series.summary and [h.h6(".landmark.heading")["Summary"], h.blockquote(".userstuff.summary")[clean_userstuff(series.summary)]],
             h.dl(".stats")[
                 h.dt["Words:"],
-                h.dd[thousands(sum([work.wordcount for work in series.works]))],
+                h.dd[thousands(series.wordcount)],
                 h.dt["Works:"],
                 h.dd[len(series.works)],
             ],
         ]
 
-    def _index(self, show_works: bool, show_series: bool):
-        groups = []
-        if show_works:
-            groups.append(
-                h.div("#works.work.listbox.group")[
-                    h.h3(".heading")["Works"],
-                    h.ul(".index.group")[(self.work_blurb(work) for work in self.site.works),],
-                ]
-            )
-        if show_series:
-            groups.append(
-                h.div("#series.series.listbox.group")[
-                    h.h3(".heading")["Series"],
-                    h.ul(".index.group")[(self.series_blurb(series) for series in self.site.series),],
-                ]
-            )
+    def _pagination(self, page: int, item_count: int, page_url: C.Callable[[int], str]):
+        """AO3's page navigation: the first and last couple of pages, and a few either side of the current one."""
+        last_page = page_count(item_count, self.site.settings.page_size)
+        if last_page == 1:
+            return None
+        shown = sorted(
+            {1, 2, last_page - 1, last_page, *range(page - PAGINATION_WINDOW, page + PAGINATION_WINDOW + 1)} & set(range(1, last_page + 1))
+        )
+        items = []
+        for previous, number in itertools.pairwise([0, *shown]):
+            if number - previous > 1:
+                items.append(h.li(".gap")["\u2026"])
+            if number == page:
+                items.append(h.li[h.span(".current")[number]])
+            else:
+                items.append(h.li[h.a(href=page_url(number))[number]])
+        previous_link = h.span(".disabled")["\u2190 Previous"] if page == 1 else h.a(rel="prev", href=page_url(page - 1))["\u2190 Previous"]
+        next_link = h.span(".disabled")["Next \u2192"] if page == last_page else h.a(rel="next", href=page_url(page + 1))["Next \u2192"]
+        return [
+            h.h4(".landmark.heading")["Pages Navigation"],
+            h.ol(".pagination.actions", role="navigation", title="pagination")[
+                h.li(".previous", title="previous")[previous_link],
+                items,
+                h.li(".next", title="next")[next_link],
+            ],
+        ]
+
+    def _works_listbox(self, page: int):
+        works = page_items(self.site.works, page, self.site.settings.page_size)
+        return h.div("#works.work.listbox.group")[
+            h.h3(".heading")["Works"],
+            h.ul(".index.group")[(self.work_blurb(work) for work in works),],
+            self._pagination(page, len(self.site.works), lambda number: self.router.section_index("works", page=number)),
+        ]
+
+    def _series_listbox(self, page: int):
+        series_list = page_items(self.site.series, page, self.site.settings.page_size)
+        return h.div("#series.series.listbox.group")[
+            h.h3(".heading")["Series"],
+            h.ul(".index.group")[(self.series_blurb(series) for series in series_list),],
+            self._pagination(page, len(self.site.series), lambda number: self.router.section_index("series", page=number)),
+        ]
+
+    def _index(self, groups: list[h.Element]):
         return self.site_skin(page_title=self.site.settings.name, body=h.div("#main.works-show.region", role="main")[groups])
 
     def archive_index(self):
-        return self._index(show_works=True, show_series=True)
+        # the front page lists the first page of each; their page links lead on to the works and series indexes
+        return self._index([self._works_listbox(1), self._series_listbox(1)])
+
+    def series_index(self, page: int = 1):
+        return self._index([self._series_listbox(page)])
 
-    def series_index(self):
-        return self._index(show_works=False, show_series=True)
+    def works_index(self, page: int = 1):
+        return self._index([self._works_listbox(page)])
 
-    def works_index(self):
-        return self._index(show_works=True, show_series=False)
+    def search_results(self):
+        body = h.div("#main.works-search.region", role="main")[
+            h.h2(".heading")["Search Results"],
+            h.p("#search-status")[h.noscript["Searching the archive needs JavaScript."]],
+            h.h3(".landmark.heading")["Listing Works"],
+            h.ol("#search-results.work.index.group"),
+        ]
+        extra_header = h.script(src=self.router.static_file("search.js"), type="text/javascript", defer=True)
+        return self.site_skin(page_title="Search Results", body=body, extra_header=extra_header)
 
-    def series_detail(self, series: Series):
+    def series_detail(self, series: Series, page: int = 1):
         header_items = []
         if series.summary:
             header_items.append(h.dt["Description:"])
@@ -310,7 +411,7 @@ class Layout:
                     h.dd(".stats")[
                         h.dl(".stats")[
                             h.dt(".words")["Words:"],
-                            h.dd(".words")[thousands(sum([work.wordcount for work in series.works]))],
+                            h.dd(".words")[thousands(series.wordcount)],
                             h.dt(".works")["Works:"],
                             h.dd(".works")[len(series.works)],
                         ]
@@ -318,7 +419,10 @@ class Layout:
                 ]
             ],
             h.h3(".landmark.heading")["Listing Series"],
-            h.ul(".series.work.index.group")[(self.work_blurb(work) for work in series.works),],
+            h.ul(".series.work.index.group")[
+                (self.work_blurb(work) for work in page_items(series.works, page, self.site.settings.page_size)),
+            ],
+            self._pagination(page, len(series.works), lambda number: self.router.series_detail(series, page=number)),
             h.div(".clear"),
         ]
         return self.site_skin(page_title=series.title, body=body)
@@ -410,6 +514,114 @@ class Layout:
         if work.download_link:
             nav_items.append(h.li(".download")[h.a(ref="noreferrer", href=work.download_link)["Download"]])
 
+        wises = self.site.work_in_series.get(work.slug, [])
+        metadata = self.fragment(("work_metadata", work.slug), lambda layout: layout._work_metadata(work))
+        preface = None
+        if show_preface:
+            preface = []
+            if work.summary is not None:
+                preface.append(
+                    h.div(".summary.module")[h.h3(".heading")["Summary:"], h.blockquote(".userstuff")[clean_userstuff(work.summary)]]
+                )
+            if work.notes_before is not None:
+                preface.append(
+                    h.div(".notes.module")[h.h3(".heading")["Notes:"], h.blockquote(".userstuff")[clean_userstuff(work.notes_before)]]
+                )
+        afterward = None
+        if show_afterward and (work.notes_after or wises):
+            afterward_items = []
+            if work.notes_after is not None:
+                afterward_items.append(
+                    h.div("#work_endnotes.end.notes.module")[
+                        h.h3(".heading")["Notes:"], h.blockquote(".userstuff")[clean_userstuff(work.notes_after)]
+                    ]
+                )
+            if wises:
+                afterward_items.append(
+                    h.div("#series.series.module")[
+                        h.h3(".heading")["Series this work belongs to:"], h.ul[(h.li[self._series_links(wis)] for wis in wises)]
+                    ]
+                )
+            afterward = h.div(".afterword.preface.group")[afterward_items]
+        bottom_nav = [h.li[h.a(href="#main")["↑ Top"]]]
+        if not work.is_oneshot and not is_all_chapters:
+            if previous_chapter is not None:
+                bottom_nav.append(
+                    h.li(".chapter.previous")[h.a(href=self.router.chapter_path(work, previous_chapter))["← Previous Chapter"]]
+                )
+            if next_chapter is not None:
+                bottom_nav.append(h.li(".chapter.next")[h.a(href=self.router.chapter_path(work, next_chapter))["Next Chapter →"]])
+
+        body = h.div("#main.chapters-show.region", role="main")[
+            h.div(".flash"),
+            h.div(".work")[
+                h.p(".landmark")[h.a(name="top")],
+                h.h3(".landmark.heading")["Actions"],
+                h.ul(".work.navigation.actions", role="menu")[nav_items],
+                h.h3(".landmark.heading")["Work Header"],
+                h.div(".wrapper")[metadata],
+                h.div("#workskin")[
+                    h.div(".preface.group")[
+                        h.h2(".title.heading")[work.title],
+                        h.h3(".byline.heading")[work.author],
+                        preface,
+                    ],
+                    h.div("#chapters", role="main")[self._chapter_texts(work, chapters)],
+                    afterward,
+                ],
+            ],
+            h.div[
+                h.h3(".landmark.heading")["Actions"],
+                h.ul(".actions", role="navigation")[bottom_nav],
+            ],
+            h.div(".clear"),
+        ]
+        return self.site_skin(page_title=page_title, body=body, extra_header=extra_header)
+
+    def _chapter_texts(self, work: Work, chapters: C.Sequence[Chapter]):
+        """Yield each chapter's text in turn, so only one is sanitized and rendered at a time."""
+        if work.is_oneshot:
+            yield h.h3("#work.landmark.heading")["Work Text:"]
+            yield h.div(".userstuff")[clean_userstuff(work.chapters[0].content)]
+            return
+        for chapter in chapters:
+            titleprefix = []
+            if work.display_chapter_numbers and work.display_num_for_chapter(chapter) is not None:
+                titleprefix.extend(("Chapter ", work.display_num_for_chapter(chapter), " — "))
+            chapter_preface = [
+                h.h3(".title")[
+                    titleprefix,
+                    h.a(href=self.router.chapter_path(work, chapter))[chapter.title],
+                ]
+            ]
+            if chapter.summary is not None:
+                chapter_preface.append(
+                    h.div("#summary.summary.module")[
+                        h.h3(".heading")["Summary:"], h.blockquote(".userstuff")[clean_userstuff(chapter.summary)]
+                    ]
+                )
+            if chapter.notes_before is not None:
+                chapter_preface.append(
+                    h.div("#notes.notes.module")[
+                        h.h3(".heading")["Notes:"], h.blockquote(".userstuff")[clean_userstuff(chapter.notes_before)]
+                    ]
+                )
+            chapter_afterward = None
+            if chapter.notes_after is not None:
+                chapter_afterward = h.div(".chapter.preface.group")[
+                    h.div("#chapter-${chapter.num}-endnotes.end.notes.module", role="complementary")[
+                        h.h3(".heading")["Notes:"], h.blockquote(".userstuff")[clean_userstuff(chapter.notes_after)]
+                    ]
+                ]
+            yield h.div(".chapter", {"id": f"chapter-{chapter.num}"})[
+                h.div(".chapter.preface.group", role="complementary")[chapter_preface],
+                h.div(".userstuff.module", role="article")[
+                    h.h3("#work.landmark.heading")["Chapter Text"], clean_userstuff(chapter.content)
+                ],
+                chapter_afterward,
+            ]
+
+    def _work_metadata(self, work: Work):
         categories = None
         if work.categories:
             categories = [
@@ -442,7 +654,6 @@ class Layout:
             ]
         series = None
         wises = self.site.work_in_series.get(work.slug, [])
-        wises.sort(key=operator.attrgetter("series.sort_key"))
         if wises:
             series = [h.dt(".series")["Series:"], h.dd(".series")[comma_separated((self._series_links(wis) for wis in wises))]]
         collections = None
@@ -454,7 +665,7 @@ class Layout:
                 ],
             ]
 
-        metadata = h.dl(".work.meta.group")[
+        return h.dl(".work.meta.group")[
             h.dt(".rating.tags")["Rating:"],
             h.dd(".rating.tags")[h.ul(".commas")[h.li[self.tag(work.rating.value)]]],
             h.dt(".warning.tags")["Archive Warning:" if len(work.warnings) == 1 else "Archive Warnings:"],
@@ -478,110 +689,6 @@ class Layout:
                 ]
             ],
         ]
-        preface = None
-        if show_preface:
-            preface = []
-            if work.summary is not None:
-                preface.append(
-                    h.div(".summary.module")[h.h3(".heading")["Summary:"], h.blockquote(".userstuff")[clean_userstuff(work.summary)]]
-                )
-            if work.notes_before is not None:
-                preface.append(
-                    h.div(".notes.module")[h.h3(".heading")["Notes:"], h.blockquote(".userstuff")[clean_userstuff(work.notes_before)]]
-                )
-        chapterstuff = []
-        if work.is_oneshot:
-            chapterstuff.append(h.h3("#work.landmark.heading")["Work Text:"])
-            chapterstuff.append(h.div(".userstuff")[clean_userstuff(work.chapters[0].content)])
-        else:
-            for chapter in chapters:
-                titleprefix = []
-                if work.display_chapter_numbers and work.display_num_for_chapter(chapter) is not None:
-                    titleprefix.extend(("Chapter ", work.display_num_for_chapter(chapter), " — "))
-                chapter_preface = [
-                    h.h3(".title")[
-                        titleprefix,
-                        h.a(href=self.router.chapter_path(work, chapter))[chapter.title],
-                    ]
-                ]
-                if chapter.summary is not None:
-                    chapter_preface.append(
-                        h.div("#summary.summary.module")[
-                            h.h3(".heading")["Summary:"], h.blockquote(".userstuff")[clean_userstuff(chapter.summary)]
-                        ]
-                    )
-                if chapter.notes_before is not None:
-                    chapter_preface.append(
-                        h.div("#notes.notes.module")[
-                            h.h3(".heading")["Notes:"], h.blockquote(".userstuff")[clean_userstuff(chapter.notes_before)]
-                        ]
-                    )
-                chapter_afterward = None
-                if chapter.notes_after is not None:
-                    chapter_afterward = h.div(".chapter.preface.group")[
-                        h.div("#chapter-${chapter.num}-endnotes.end.notes.module", role="complementary")[
-                            h.h3(".heading")["Notes:"], h.blockquote(".userstuff")[clean_userstuff(chapter.notes_after)]
-                        ]
-                    ]
-                chapterstuff.append(
-                    h.div(".chapter", {"id": f"chapter-{chapter.num}"})[
-                        h.div(".chapter.preface.group", role="complementary")[chapter_preface],
-                        h.div(".userstuff.module", role="article")[
-                            h.h3("#work.landmark.heading")["Chapter Text"], clean_userstuff(chapter.content)
-                        ],
-                        chapter_afterward,
-                    ],
-                )
-        afterward = None
-        if show_afterward and (work.notes_after or series):
-            afterward_items = []
-            if work.notes_after is not None:
-                afterward_items.append(
-                    h.div("#work_endnotes.end.notes.module")[
-                        h.h3(".heading")["Notes:"], h.blockquote(".userstuff")[clean_userstuff(work.notes_after)]
-                    ]
-                )
-            if wises:
-                afterward_items.append(
-                    h.div("#series.series.module")[
-                        h.h3(".heading")["Series this work belongs to:"], h.ul[(h.li[self._series_links(wis)] for wis in wises)]
-                    ]
-                )
-            afterward = h.div(".afterword.preface.group")[afterward_items]
-        bottom_nav = [h.li[h.a(href="#main")["↑ Top"]]]
-        if not work.is_oneshot and not is_all_chapters:
-            if previous_chapter is not None:
-                bottom_nav.append(
-                    h.li(".chapter.previous")[h.a(href=self.router.chapter_path(work, previous_chapter))["← Previous Chapter"]]
-                )
-            if next_chapter is not None:
-                bottom_nav.append(h.li(".chapter.next")[h.a(href=self.router.chapter_path(work, next_chapter))["Next Chapter →"]])
-
-        body = h.div("#main.chapters-show.region", role="main")[
-            h.div(".flash"),
-            h.div(".work")[
-                h.p(".landmark")[h.a(name="top")],
-                h.h3(".landmark.heading")["Actions"],
-                h.ul(".work.navigation.actions", role="menu")[nav_items],
-                h.h3(".landmark.heading")["Work Header"],
-                h.div(".wrapper")[metadata],
-                h.div("#workskin")[
-                    h.div(".preface.group")[
-                        h.h2(".title.heading")[work.title],
-                        h.h3(".byline.heading")[work.author],
-                        preface,
-                    ],
-                    h.div("#chapters", role="main")[chapterstuff,],
-                    afterward,
-                ],
-            ],
-            h.div[
-                h.h3(".landmark.heading")["Actions"],
-                h.ul(".actions", role="navigation")[bottom_nav],
-            ],
-            h.div(".clear"),
-        ]
-        return self.site_skin(page_title=page_title, body=body, extra_header=extra_header)
 
     def work_allchapters(self, work: Work):
         return self._work_chapters(
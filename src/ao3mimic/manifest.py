@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import importlib.resources
+import pathlib
+import typing as T
+
+import msgspec
+from msgspec import Struct
+
+from . import __version__ as code_version
+from .media import MediaMode
+from .utils import file_digest, page_items
+
+if T.TYPE_CHECKING:
+    import collections.abc as C
+
+    from .models import Series, Site, Work
+
+MANIFEST_FILENAME = ".ao3mimic-manifest.json"
+# the endpoints whose files may be published from the content directory by linking them
+PUBLISHED_ENDPOINTS = frozenset(["site.logo", "site.stylesheet", "work.media", "work.stylesheet"])
+# Lists the fingerprinted name of each asset, for anything else that needs to link to them.
+ASSET_MANIFEST_FILENAME = "asset-manifest.json"
+
+
+class BuildManifest(Struct, kw_only=True):
+    """Records, for each URL in a rendered site, a fingerprint of the inputs it was rendered from.
+
+    Each URL with compressed copies is also recorded in ``compressed``, along with a digest of the content they were made from.
+    """
+
+    entries: dict[str, str] = {}
+    compressed: dict[str, str] = {}
+
+    @classmethod
+    def load(cls, output_directory: pathlib.Path) -> T.Optional[BuildManifest]:
+        manifest_path = output_directory / MANIFEST_FILENAME
+        try:
+            return msgspec.json.decode(manifest_path.read_bytes(), type=cls)
+        except (FileNotFoundError, msgspec.DecodeError):
+            return None
+
+    def save(self, output_directory: pathlib.Path):
+        (output_directory / MANIFEST_FILENAME).write_bytes(msgspec.json.encode(self))
+
+
+def save_asset_manifest(output_directory: pathlib.Path, assets: C.Mapping[str, str]):
+    """Write out the asset manifest, mapping each asset's usual path to its fingerprinted one; or remove it, if there are none."""
+    asset_manifest_path = output_directory / ASSET_MANIFEST_FILENAME
+    if not assets:
+        asset_manifest_path.unlink(missing_ok=True)
+        return
+    entries = {url.removeprefix("/"): fingerprinted.removeprefix("/") for url, fingerprinted in sorted(assets.items())}
+    asset_manifest_path.write_bytes(msgspec.json.format(msgspec.json.encode(entries)))
+
+
+def _combine(parts: C.Iterable[str]):
+    return hashlib.blake2b("\0".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class InputFingerprints:
+    """Computes a fingerprint of everything a page depends on, so unchanged pages can be skipped.
+
+    The search index files are generated from every work at once, so they are fingerprinted by the inputs of every work,
+    without building the index.
+    """
+
+    def __init__(self, site: Site, assets: T.Optional[C.Mapping[str, str]] = None, media_mode: MediaMode = MediaMode.COPY):
+        self.site = site
+        self.media_mode = media_mode
+        # every page links to the fingerprinted assets, so their names are part of each page's inputs
+        self._asset_names = sorted((assets or {}).values())
+        self._digests: dict[pathlib.Path, str] = {}
+
+    def digest(self, path: pathlib.Path):
+        if path not in self._digests:
+            self._digests[path] = file_digest(path) if path.is_file() else "missing"
+        return self._digests[path]
+
+    def _get_work(self, args: C.Mapping[str, T.Any]):
+        return self.site.works[0] if self.site.settings.single_work else self.site.get_work(args["slug"])
+
+    def _series_toml(self, series: Series):
+        return self.site.base_path / "series" / f"{series.slug}.toml"
+
+    def _work_toml(self, work: Work):
+        return T.cast(pathlib.Path, work.work_path) / "work.toml"
+
+    def site_inputs(self):
+        parts = [code_version, self.digest(self.site.base_path / "settings.toml"), str(self.site.has_site_css), *self._asset_names]
+        if self.site.settings.logo is not None:
+            parts.append(self.digest(self.site.settings.logo))
+        return parts
+
+    def work_inputs(self, work: Work):
+        parts = [work.slug, self.digest(self._work_toml(work)), str(work.has_work_css)]
+        parts.extend(self.digest(chapter.content_path) for chapter in work.chapters)
+        # series links point at the neighbouring works, so their structure matters too
+        for wis in self.site.work_in_series.get(work.slug, []):
+            parts.append(self.digest(self._series_toml(wis.series)))
+            parts.extend(self.digest(self._work_toml(series_work)) for series_work in wis.series.works)
+        return parts
+
+    def works_page_inputs(self, page: int):
+        # a page of the works index shows its own works' blurbs, and links to the other pages
+        parts = [f"works={len(self.site.works)}"]
+        for work in page_items(self.site.works, page, self.site.settings.page_size):
+            parts.extend(self.work_inputs(work))
+        return parts
+
+    def series_page_inputs(self, page: int):
+        # a series blurb sums up all of the series' works
+        parts = [f"series={len(self.site.series)}"]
+        for series in page_items(self.site.series, page, self.site.settings.page_size):
+            parts.append(self.digest(self._series_toml(series)))
+            for work in series.works:
+                parts.extend(self.work_inputs(work))
+        return parts
+
+    @functools.cached_property
+    def _search_inputs(self):
+        parts = self.site_inputs()
+        for work in self.site.works:
+            parts.extend(self.work_inputs(work))
+        return _combine(parts)
+
+    def fingerprint(self, endpoint: str, args: C.Mapping[str, T.Any]):
+        parts = [endpoint, *(f"{key}={value}" for key, value in sorted(args.items()))]
+        if endpoint in PUBLISHED_ENDPOINTS:
+            # switching to links from copies, or back, means putting the files in place again
+            parts.append(self.media_mode.value)
+        match endpoint:
+            case "archive.index":
+                parts.extend(self.site_inputs())
+                parts.extend(self.works_page_inputs(1))
+                parts.extend(self.series_page_inputs(1))
+            case "works.index":
+                parts.extend(self.site_inputs())
+                parts.extend(self.works_page_inputs(args["page"]))
+            case "series.index":
+                parts.extend(self.site_inputs())
+                parts.extend(self.series_page_inputs(args["page"]))
+            case "search.index":
+                parts.extend(self.site_inputs())
+            case "search.documents" | "search.shard":
+                parts.append(self._search_inputs)
+            case "series.detail":
+                series = self.site.get_series(args["slug"])
+                parts.extend(self.site_inputs())
+                parts.append(self.digest(self._series_toml(series)))
+                for work in series.works:
+                    parts.extend(self.work_inputs(work))
+            case "work.index" | "work.nav" | "work.chapter" | "work.all_chapters":
+                parts.extend(self.site_inputs())
+                parts.extend(self.work_inputs(self._get_work(args)))
+            case "static_file":
+                parts.append(code_version)
+            case "site.logo":
+                parts.append(code_version if self.site.settings.logo is None else self.digest(self.site.settings.logo))
+            case "archive.stylesheet":
+                parts.append(hashlib.blake2b((importlib.resources.files("ao3mimic.branding") / "styles.scss").read_bytes()).hexdigest())
+            case "site.stylesheet":
+                parts.append(self.digest(self.site.site_css))
+            case "work.media":
+                parts.append(self.digest(T.cast(pathlib.Path, self._get_work(args).work_path) / "media" / args["filename"]))
+            case "work.stylesheet":
+                parts.append(self.digest(self._get_work(args).work_css))
+            case _:
+                raise NotImplementedError(endpoint, args)
+        return _combine(parts)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import enum
+import os
+import shutil
+import typing as T
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+if T.TYPE_CHECKING:
+    import pathlib
+
+# from linux/fs.h: make the destination file share the source file's blocks, on filesystems which can
+FICLONE = 0x40049409
+
+
+class MediaMode(enum.Enum):
+    """How files from the content directory, such as work media and stylesheets, get into the output directory."""
+
+    COPY = "copy"
+    HARDLINK = "hardlink"
+    REFLINK = "reflink"
+    SYMLINK = "symlink"
+
+
+def reflink(source: pathlib.Path, dest: pathlib.Path):
+    if fcntl is None:
+        raise OSError("Reflinks are not supported on this platform")
+    with source.open("rb") as src, dest.open("wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+class MediaPublisher:
+    """Puts files from the content directory into the output directory without copying their bytes, where it can.
+
+    Hard links and reflinks fall back to copying when the filesystem won't have them, such as when the output directory is on
+    a different device. Copies of identical files are hard links to the first one, so each file is only stored once.
+    """
+
+    def __init__(self, mode: MediaMode = MediaMode.COPY):
+        self.mode = mode
+        # for each digest, the file copied with that content, and its inode and mtime to tell if it has been replaced since
+        self._copies: dict[str, tuple[pathlib.Path, int, int]] = {}
+
+    def publish(self, source: pathlib.Path, dest: pathlib.Path):
+        # Never write into the existing file: it may well be a link to the source, or to another output file.
+        dest.unlink(missing_ok=True)
+        match self.mode:
+            case MediaMode.SYMLINK:
+                dest.symlink_to(source.resolve())
+                return
+            case MediaMode.HARDLINK:
+                try:
+                    os.link(source, dest)
+                except OSError:
+                    pass
+                else:
+                    return
+            case MediaMode.REFLINK:
+                try:
+                    reflink(source, dest)
+                except OSError:
+                    dest.unlink(missing_ok=True)
+                else:
+                    return
+        self._copy(source, dest)
+
+    def _copy(self, source: pathlib.Path, dest: pathlib.Path):
+        # imported here, as the command line imports this module just to list the media modes
+        from .utils import file_digest
+
+        digest = file_digest(source)
+        if (copy := self._copies.get(digest)) is not None:
+            copy_path, inode, mtime_ns = copy
+            try:
+                stat = copy_path.stat()
+                if (stat.st_ino, stat.st_mtime_ns) == (inode, mtime_ns):
+                    os.link(copy_path, dest)
+                    return
+            except OSError:
+                pass
+        shutil.copyfile(source, dest)
+        stat = dest.stat()
+        self._copies[digest] = (dest, stat.st_ino, stat.st_mtime_ns)
@@ -3,16 +3,21 @@ from __future__ import annotations
 import datetime
 import enum
 import functools
+import hashlib
 import itertools
 import pathlib
 import typing as T
 
 import cattrs
+import markupsafe
 import msgspec
 from msgspec import Struct
 
+from . import __version__ as code_version
+from .cache import cache_key, get_cache
 from .exceptions import SiteStructureError
-from .utils import count_html_text, tomllib
+from .profiling import timed
+from .utils import count_userstuff, forget_cleaned, load_toml, userstuff_cache_key
 
 converter = cattrs.Converter()
 converter.register_unstructure_hook(
@@ -24,9 +29,100 @@ def msgspec_dec_hook(type: T.Type, obj: T.Any):
     return converter.structure(obj, type)
 
 
+def msgspec_enc_hook(obj: T.Any):
+    if isinstance(obj, Tag):
+        return obj.declaration
+    return str(obj)
+
+
 converter.register_structure_hook(Struct, functools.partial(msgspec.convert, dec_hook=msgspec_dec_hook))
 
 
+class Tag:
+    """A fandom, relationship, character or additional tag: a bare name, or a name linked to its page on AO3.
+
+    Its id is worked out from the name and URL alone, so it is the same whichever works a tag is loaded from, and in
+    whatever order. A site keeps one of each distinct tag in its tag table, along with the HTML that shows it on a page.
+    """
+
+    __slots__ = ("anchor", "id", "name", "url")
+
+    def __init__(self, name: str, url: T.Optional[str] = None):
+        self.name = name
+        self.url = url
+        self.id = int.from_bytes(hashlib.blake2b(msgspec.json.encode(self.declaration), digest_size=8).digest())
+        if url is None:
+            self.anchor = markupsafe.Markup('<span class="tag">{}</span>').format(name)
+        else:
+            self.anchor = markupsafe.Markup('<a class="tag" rel="noreferrer" href="{}">{}</a>').format(url, name)
+
+    @classmethod
+    def parse(cls, declaration: T.Sequence[str] | str) -> Tag:
+        match declaration:
+            case str(name):
+                return cls(name)
+            case (str(name), str(url)):
+                return cls(name, url)
+            case _:
+                raise ValueError("A tag must be a name, or a [name, url] pair")
+
+    @property
+    def declaration(self) -> tuple[str, str] | str:
+        """The tag as it is written in a work file."""
+        return self.name if self.url is None else (self.name, self.url)
+
+    def __eq__(self, other: object):
+        if not isinstance(other, Tag):
+            return NotImplemented
+        return self.name == other.name and self.url == other.url
+
+    def __hash__(self):
+        return self.id
+
+    def __repr__(self):
+        return f"Tag({self.declaration!r})"
+
+
+class TagTable:
+    """One of each distinct tag of a site's works, by id."""
+
+    def __init__(self):
+        self._tags: dict[int, Tag] = {}
+
+    def intern(self, tag: Tag) -> Tag:
+        return self._tags.setdefault(tag.id, tag)
+
+    def intern_work(self, work: Work):
+        """Swap the work's tags for the table's copies, so that each tag is held only once however many works have it."""
+        for tags in (work.fandoms, work.relationships, work.characters, work.additional_tags):
+            tags[:] = [self.intern(tag) for tag in tags]
+
+    def __getitem__(self, id: int) -> Tag:
+        return self._tags[id]
+
+    def __len__(self):
+        return len(self._tags)
+
+    def __iter__(self):
+        return iter(self._tags.values())
+
+
+converter.register_structure_hook(Tag, lambda obj, _: Tag.parse(obj))
+converter.register_unstructure_hook(Tag, lambda tag: tag.declaration)
+
+# Fields which hold what a model is given or works out after it is loaded, rather than anything from its file; they are
+# left out when it is written back to TOML or into a snapshot, and a file which sets them is rejected.
+_WORK_RUNTIME_FIELDS = ("work_path", "_display_nums", "_wordcount")
+_CHAPTER_RUNTIME_FIELDS = ("work_path", "_content", "_wordcount")
+_SERIES_RUNTIME_FIELDS = ("_ratings", "_warnings", "_categories", "_wordcount")
+
+
+def _reject_runtime_fields(declaration: T.Mapping[str, T.Any], runtime_fields: T.Iterable[str], what: str):
+    for name in runtime_fields:
+        if name in declaration:
+            raise SiteStructureError(f"{name} can't be set for {what}, since it is worked out when the site is loaded")
+
+
 class Category(enum.Enum):
     GEN = "Gen"
     F_F = "F/F"
@@ -160,20 +256,25 @@ class Settings(Struct, kw_only=True):
     logo: T.Optional[pathlib.Path] = None
     single_work: bool = False
     about: T.Optional[str] = None
+    search_chapter_text: bool = False
+    # how many blurbs to list on each page of the works, series and series detail indexes
+    page_size: int = 20
 
     @classmethod
     def load(cls, toml_path: pathlib.Path):
-        settings_dict = tomllib.load(toml_path.open("rb"))
+        settings_dict = load_toml(toml_path)
         settings = converter.structure(settings_dict, Settings)
         if settings.logo is not None:
             logo_path = toml_path.parent / settings.logo
             if not logo_path.is_file():
                 raise SiteStructureError("Logo path was specified, but the file cannot be found")
             settings.logo = logo_path
+        if settings.page_size < 1:
+            raise SiteStructureError("page_size must be at least 1")
         return settings
 
 
-class Work(Struct, kw_only=True, dict=True):
+class Work(Struct, kw_only=True, gc=False):
     slug: str
     ordering: int = 0
     title: str
@@ -181,10 +282,10 @@ class Work(Struct, kw_only=True, dict=True):
     rating: Rating
     warnings: list[WorkWarning]
     categories: list[Category]
-    fandoms: list[tuple[str, str] | str]
-    relationships: list[tuple[str, str] | str]
-    characters: list[tuple[str, str] | str]
-    additional_tags: list[tuple[str, str] | str]
+    fandoms: list[Tag]
+    relationships: list[Tag]
+    characters: list[Tag]
+    additional_tags: list[Tag]
     collections: list[tuple[str, str]] = []
     pubdate: datetime.date
     pubdate_granularity: DateGranularity = DateGranularity.DAY
@@ -195,12 +296,17 @@ class Work(Struct, kw_only=True, dict=True):
     is_complete: bool = True
     display_chapter_numbers: bool
     chapters: list[Chapter]
+    # see _WORK_RUNTIME_FIELDS
+    work_path: T.Optional[pathlib.Path] = None
+    _display_nums: T.Optional[list[T.Optional[int]]] = None
+    _wordcount: T.Optional[int] = None
 
     @classmethod
     def load(cls, toml_path: pathlib.Path):
-        work_dict = tomllib.load(toml_path.open("rb"))
+        work_dict = load_toml(toml_path)
         work_path = toml_path.parent.resolve()
         work_dict["slug"] = work_path.name
+        _reject_runtime_fields(work_dict, _WORK_RUNTIME_FIELDS, f"work {work_path.name}")
 
         if "chapters" not in work_dict and "content_file" in work_dict:
             chapter = {"title": "Oneshot", "content_file": work_dict.pop("content_file")}
@@ -210,24 +316,37 @@ class Work(Struct, kw_only=True, dict=True):
             work_dict["display_chapter_numbers"] = False
 
         for num, chapter_dict in enumerate(work_dict["chapters"], start=1):
+            _reject_runtime_fields(chapter_dict, _CHAPTER_RUNTIME_FIELDS, f"chapter {num} of work {work_path.name}")
             chapter_dict["num"] = num
 
         work = converter.structure(work_dict, Work)
-        work.work_path = work_path
-        for chapter in work.chapters:
-            chapter.work_path = work_path
-
+        work.set_work_path(work_path)
         return work
 
+    def set_work_path(self, work_path: pathlib.Path):
+        self.work_path = work_path
+        for chapter in self.chapters:
+            chapter.work_path = work_path
+
     @property
     def sort_key(self):
         return (self.ordering, self.slug)
 
     def asdict(self) -> dict[str, T.Any]:
-        work_dict = converter.unstructure(self)
+        work_dict = converter.unstructure(self.declared())
         del work_dict["slug"]
+        for name in _WORK_RUNTIME_FIELDS:
+            del work_dict[name]
+        for chapter_dict in work_dict["chapters"]:
+            for name in _CHAPTER_RUNTIME_FIELDS:
+                del chapter_dict[name]
         return work_dict
 
+    def declared(self) -> Work:
+        """A copy of the work with only what its files declare, without its path, content or anything worked out."""
+        runtime = dict.fromkeys(_WORK_RUNTIME_FIELDS)
+        return msgspec.structs.replace(self, chapters=[chapter.declared() for chapter in self.chapters], **runtime)
+
     @property
     def published(self):
         match self.pubdate_granularity:
@@ -248,40 +367,55 @@ class Work(Struct, kw_only=True, dict=True):
         # TODO: move this into views
         return str(self.chapter_count) if self.is_complete else "?"
 
-    @functools.cached_property
-    def wordcount(self):
-        return sum([c.wordcount for c in self.chapters])
+    @property
+    def wordcount(self) -> int:
+        if self._wordcount is None:
+            self._wordcount = sum([c.wordcount for c in self.chapters])
+        return self._wordcount
+
+    def reload_chapter(self, chapter: Chapter):
+        chapter.reload()
+        self._wordcount = None
+
+    def release_content(self):
+        """Let go of every chapter's content, keeping only the word counts. See Chapter.release."""
+        for chapter in self.chapters:
+            chapter.release()
 
     @property
     def is_oneshot(self):
         return len(self.chapters) == 1
 
-    def next_chapter(self, chapter: Chapter):
-        if chapter not in self.chapters:
+    def _chapter_index(self, chapter: Chapter):
+        # Work.load numbers the chapters by their position, so there is no need to search for them
+        i = chapter.num - 1
+        if not 0 <= i < len(self.chapters) or self.chapters[i] is not chapter:
             raise ValueError("Provided chapter is not one of this work's chapters")
-        if chapter is self.chapters[-1]:
+        return i
+
+    def next_chapter(self, chapter: Chapter):
+        i = self._chapter_index(chapter)
+        if i == len(self.chapters) - 1:
             # last chapter, no next chapter
             return None
-        i = self.chapters.index(chapter)
         return self.chapters[i + 1]
 
     def previous_chapter(self, chapter: Chapter):
-        if chapter not in self.chapters:
-            raise ValueError("Provided chapter is not one of this work's chapters")
-        if chapter is self.chapters[0]:
+        i = self._chapter_index(chapter)
+        if i == 0:
             # first chapter, no previous chapter
             return None
-        i = self.chapters.index(chapter)
         return self.chapters[i - 1]
 
-    @functools.cached_property
+    @property
     def _substantial_chapters(self):
         return [c for c in self.chapters if not c.interstitial]
 
     def display_num_for_chapter(self, chapter: Chapter):
-        if chapter.interstitial:
-            return None
-        return self._substantial_chapters.index(chapter) + 1
+        if self._display_nums is None:
+            substantial = itertools.count(1)
+            self._display_nums = [None if c.interstitial else next(substantial) for c in self.chapters]
+        return self._display_nums[self._chapter_index(chapter)]
 
     @property
     def work_css(self):
@@ -292,7 +426,7 @@ class Work(Struct, kw_only=True, dict=True):
         return self.work_css.is_file()
 
 
-class Chapter(Struct, kw_only=True, dict=True):
+class Chapter(Struct, kw_only=True, gc=False):
     num: int
     title: str
     interstitial: bool = False
@@ -300,18 +434,70 @@ class Chapter(Struct, kw_only=True, dict=True):
     summary: T.Optional[str] = None
     notes_before: T.Optional[str] = None
     notes_after: T.Optional[str] = None
+    # see _CHAPTER_RUNTIME_FIELDS
+    work_path: T.Optional[pathlib.Path] = None
+    _content: T.Optional[str] = None
+    _wordcount: T.Optional[int] = None
+
+    def declared(self) -> Chapter:
+        return msgspec.structs.replace(self, **dict.fromkeys(_CHAPTER_RUNTIME_FIELDS))
+
+    def __reduce__(self):
+        # a worker reads the content from the chapter file if it needs it, rather than being sent a copy
+        rebuild, (cls, fields) = super().__reduce__()
+        return rebuild, (cls, dict(fields, _content=None))
+
+    def reload(self):
+        """Forget the cached content, its sanitized copy and the word count, so they are read from the chapter file again."""
+        self.release()
+        self._wordcount = None
+
+    def release(self):
+        """Let go of the content, and its sanitized copy, once the pages showing it have been written. The word count is
+        kept, and the content is read from the chapter file again if it is needed after all."""
+        if (content := self._content) is not None:
+            self._content = None
+            forget_cleaned(content)
 
-    @functools.cached_property
+    @property
     def content_path(self):
         return T.cast(pathlib.Path, self.work_path) / self.content_file
 
-    @functools.cached_property
-    def content(self):
+    @property
+    def content(self) -> str:
+        if self._content is None:
+            self._content = self.content_path.read_text()
+        return self._content
+
+    def peek_content(self) -> str:
+        """The content, without holding on to it afterward if it hasn't already been read."""
+        if (content := self._content) is not None:
+            return content
         return self.content_path.read_text()
 
-    @functools.cached_property
-    def wordcount(self):
-        return count_html_text(self.content_path.read_text())
+    def file_cache_key(self) -> str:
+        """The build cache key for what is worked out from the chapter file. It goes by the file's size and mtime, so an
+        unchanged chapter need not even be read."""
+        stat = self.content_path.stat()
+        return cache_key(code_version, str(self.content_path), str(stat.st_mtime_ns), str(stat.st_size))
+
+    @property
+    def wordcount(self) -> int:
+        if self._wordcount is None:
+            self._wordcount = self._count_words()
+        return self._wordcount
+
+    def _count_words(self) -> int:
+        # sanitizing the chapter counts its words too, and keeps it for when its pages are rendered
+        disk_cache = get_cache("wordcount")
+        if disk_cache is None:
+            return count_userstuff(self.peek_content())
+        key = self.file_cache_key()
+        if (cached := disk_cache.get(key)) is not None:
+            return int(cached)
+        wordcount = count_userstuff(self.peek_content())
+        disk_cache.set(key, str(wordcount).encode("ascii"))
+        return wordcount
 
 
 class Series(Struct, kw_only=True):
@@ -321,12 +507,21 @@ class Series(Struct, kw_only=True):
     summary: T.Optional[str] = None
     notes: T.Optional[str] = None
     works: list[Work]
+    # what the series' blurb shows of its works all together, gathered by Site.create; see _SERIES_RUNTIME_FIELDS
+    _ratings: tuple[Rating, ...] = ()
+    _warnings: tuple[WorkWarning, ...] = ()
+    _categories: tuple[Category, ...] = ()
+    _wordcount: T.Optional[int] = None
 
     @classmethod
     def load(cls, toml_path: pathlib.Path, work_lookup: T.Mapping[str, Work]):
-        series_dict = tomllib.load(toml_path.open("rb"))
-        series_dict["slug"] = toml_path.stem
+        series_dict = load_toml(toml_path)
+        return cls.from_dict(series_dict, toml_path.stem, work_lookup)
 
+    @classmethod
+    def from_dict(cls, series_dict: dict[str, T.Any], slug: str, work_lookup: T.Mapping[str, Work]):
+        _reject_runtime_fields(series_dict, _SERIES_RUNTIME_FIELDS, f"series {slug}")
+        series_dict = dict(series_dict, slug=slug)
         work_slugs = series_dict.pop("works", [])
         series_dict["works"] = [work_lookup[slug] for slug in work_slugs]
 
@@ -336,21 +531,34 @@ class Series(Struct, kw_only=True):
     def sort_key(self):
         return (self.ordering, self.slug)
 
+    def gather(self):
+        self._ratings = tuple(dict.fromkeys(work.rating for work in self.works))
+        self._warnings = tuple(dict.fromkeys(itertools.chain.from_iterable(work.warnings for work in self.works)))
+        self._categories = tuple(dict.fromkeys(itertools.chain.from_iterable(work.categories for work in self.works)))
+        self._wordcount = None
+
     @property
     def ratings(self):
-        return tuple(frozenset([work.rating for work in self.works]))
+        return self._ratings
 
     @property
     def overall_rating(self):
-        return max(self.ratings)
+        return max(self._ratings)
 
     @property
     def warnings(self):
-        return tuple(frozenset(itertools.chain.from_iterable(work.warnings for work in self.works)))
+        return self._warnings
 
     @property
     def categories(self):
-        return tuple(frozenset(itertools.chain.from_iterable(work.categories for work in self.works)))
+        return self._categories
+
+    @property
+    def wordcount(self) -> int:
+        # the chapters are only counted when first needed, rather than all of them as the site is loaded
+        if self._wordcount is None:
+            self._wordcount = sum([work.wordcount for work in self.works])
+        return self._wordcount
 
 
 class WorkInSeries(Struct, kw_only=True):
@@ -368,6 +576,12 @@ class Site(Struct, kw_only=True):
     series: list[Series]
 
     work_in_series: dict[str, list[WorkInSeries]]
+    works_by_slug: dict[str, Work]
+    series_by_slug: dict[str, Series]
+    # where each work and series comes in the site's listings, by slug
+    work_positions: dict[str, int]
+    series_positions: dict[str, int]
+    tags: TagTable
 
     @classmethod
     def create(cls, base_path: pathlib.Path, settings: Settings, works: list[Work], series: list[Series]):
@@ -377,8 +591,13 @@ class Site(Struct, kw_only=True):
             raise SiteStructureError("single_work cannot be true if any series are defined")
         works.sort(key=lambda work: work.sort_key)
         series.sort(key=lambda series: series.sort_key)
+        tags = TagTable()
+        for work in works:
+            tags.intern_work(work)
+        # the series are already sorted, so each work's list of series comes out in the same order
         wises: dict[str, list[WorkInSeries]] = {}
         for s in series:
+            s.gather()
             s_wises: list[WorkInSeries] = []
             for i, w in enumerate(s.works, start=1):
                 s_wises.append(WorkInSeries(series=s, work=w, position=i))
@@ -387,36 +606,61 @@ class Site(Struct, kw_only=True):
                 second.backward = first
             for wis in s_wises:
                 wises.setdefault(wis.work.slug, []).append(wis)
-        return cls(base_path=base_path, settings=settings, works=works, series=series, work_in_series=wises)
+        return cls(
+            base_path=base_path,
+            settings=settings,
+            works=works,
+            series=series,
+            work_in_series=wises,
+            tags=tags,
+            works_by_slug={work.slug: work for work in works},
+            series_by_slug={s.slug: s for s in series},
+            work_positions={work.slug: i for i, work in enumerate(works)},
+            series_positions={s.slug: i for i, s in enumerate(series)},
+        )
+
+    def __reduce__(self):
+        # work_in_series is cyclic (backward/forward), so rebuild it and the lookups rather than pickling them.
+        return (self.__class__.create, (self.base_path, self.settings, self.works, self.series))
 
     @classmethod
-    def load_single_work_site(cls, content_path: pathlib.Path, settings: Settings):
+    def load_single_work_site(cls, content_path: pathlib.Path, settings: Settings, loader: T.Optional[SnapshotLoader] = None):
+        loader = loader or SnapshotLoader(content_path)
         work_toml = content_path / "work.toml"
         if not work_toml.is_file():
             raise SiteStructureError(
                 "Expected to find a work.toml directory next to settings.toml (since single_work is true), but did not."
             )
-        work = Work.load(work_toml)
+        work = loader.load_work(work_toml)
         return cls.create(base_path=content_path, settings=settings, works=[work], series=[])
 
     @classmethod
     def load_site(cls, content_path: pathlib.Path):
-        settings = Settings.load(content_path / "settings.toml")
-        if settings.single_work:
-            return cls.load_single_work_site(content_path, settings)
+        with timed("load"):
+            loader = SnapshotLoader(content_path)
+            site = cls._load_site(content_path, loader)
+            loader.save()
+        return site
+
+    @staticmethod
+    def work_toml_paths(content_path: pathlib.Path) -> list[pathlib.Path]:
+        """Find the work.toml of each work in a content directory, without loading any of them."""
         works_path = content_path / "works"
         if not works_path.is_dir():
             raise SiteStructureError("Expected to find a works directory next to settings.toml, but did not.")
-        works = [
-            Work.load(work_path / "work.toml")
-            for work_path in works_path.iterdir()
-            if work_path.is_dir() and (work_path / "work.toml").is_file()
-        ]
+        return [work_path / "work.toml" for work_path in works_path.iterdir() if work_path.is_dir() and (work_path / "work.toml").is_file()]
+
+    @classmethod
+    def _load_site(cls, content_path: pathlib.Path, loader: SnapshotLoader):
+        settings = Settings.load(content_path / "settings.toml")
+        if settings.single_work:
+            return cls.load_single_work_site(content_path, settings, loader)
+        works = [loader.load_work(toml_path) for toml_path in cls.work_toml_paths(content_path)]
         series_path = content_path / "series"
         if series_path.is_dir():
             works_lookup = {work.slug: work for work in works}
             series = [
-                Series.load(series_toml_path, works_lookup)
+                loader.load_series(series_toml_path, works_lookup)
                 for series_toml_path in series_path.iterdir()
                 if series_toml_path.suffix == ".toml"
             ]
@@ -433,9 +677,145 @@ class Site(Struct, kw_only=True):
         return self.site_css.is_file()
 
     def get_series(self, slug):
-        series_lookup = {series.slug: series for series in self.series}
-        return series_lookup[slug]
+        return self.series_by_slug[slug]
 
     def get_work(self, slug):
-        works_lookup = {work.slug: work for work in self.works}
-        return works_lookup[slug]
+        return self.works_by_slug[slug]
+
+    def reload_chapter(self, work: Work, chapter: Chapter):
+        """Read a chapter's file again, forgetting every word count that included it."""
+        work.reload_chapter(chapter)
+        for wis in self.work_in_series.get(work.slug, []):
+            wis.series._wordcount = None
+
+    def prune_cache(self):
+        """Remove what the build cache holds for chapters and userstuff that are no longer in the site, such as the
+        sanitized copy of a chapter from before it was edited, so that the cache doesn't grow with every edit."""
+        chapter_keys = set()
+        userstuff_keys = set()
+
+        def keep(*texts: T.Optional[str]):
+            userstuff_keys.update(userstuff_cache_key(text) for text in texts if text)
+
+        for work in self.works:
+            keep(work.summary, work.notes_before, work.notes_after)
+            for chapter in work.chapters:
+                keep(chapter.summary, chapter.notes_before, chapter.notes_after)
+                try:
+                    chapter_keys.add(chapter.file_cache_key())
+                    keep(chapter.peek_content())
+                except FileNotFoundError:
+                    continue
+        for series in self.series:
+            keep(series.summary, series.notes)
+        for namespace, keys in (("wordcount", chapter_keys), ("search", chapter_keys), ("userstuff", userstuff_keys)):
+            if (disk_cache := get_cache(namespace)) is not None:
+                disk_cache.prune(keys)
+
+
+class FileStamp(Struct, array_like=True, frozen=True):
+    """A file's modification time and size, which together stand in for its contents."""
+
+    mtime_ns: int
+    size: int
+
+    @classmethod
+    def of(cls, path: pathlib.Path) -> T.Optional[FileStamp]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return cls(stat.st_mtime_ns, stat.st_size)
+
+
+class WorkSnapshot(Struct, array_like=True):
+    toml_stamp: FileStamp
+    work: Work
+    # the stamp and word count of each chapter file, or None if it was missing
+    chapters: list[T.Optional[tuple[FileStamp, int]]]
+
+
+class SeriesSnapshot(Struct, array_like=True):
+    toml_stamp: FileStamp
+    series_dict: dict[str, T.Any]
+
+
+class SiteSnapshot(Struct, kw_only=True):
+    """The structured contents of a site's work and series files, along with its chapter word counts, keyed by path."""
+
+    works: dict[str, WorkSnapshot] = {}
+    series: dict[str, SeriesSnapshot] = {}
+
+
+class SnapshotLoader:
+    """Loads works and series for a site, reusing anything the previous load's snapshot shows to be unchanged, and then
+    saves a fresh snapshot in the build cache."""
+
+    def __init__(self, content_path: pathlib.Path):
+        self.disk_cache = get_cache("site")
+        self.key = cache_key(code_version, str(content_path.resolve()))
+        self.previous = SiteSnapshot()
+        self.current = SiteSnapshot()
+        self.changed = True
+        if self.disk_cache is not None and (data := self.disk_cache.get(self.key)) is not None:
+            try:
+                self.previous = msgspec.msgpack.decode(data, type=SiteSnapshot, dec_hook=msgspec_dec_hook)
+                self.changed = False
+            except msgspec.DecodeError:
+                pass
+
+    def load_work(self, toml_path: pathlib.Path) -> Work:
+        if self.disk_cache is None:
+            return Work.load(toml_path)
+        toml_path = toml_path.resolve()
+        key = str(toml_path)
+        toml_stamp = T.cast(FileStamp, FileStamp.of(toml_path))
+        previous = self.previous.works.get(key)
+        if previous is not None and previous.toml_stamp == toml_stamp:
+            work = previous.work
+            work.set_work_path(toml_path.parent)
+            previous_chapters = previous.chapters
+        else:
+            work = Work.load(toml_path)
+            previous_chapters = [None] * len(work.chapters)
+            self.changed = True
+        chapters = []
+        for chapter, previous_chapter in zip(work.chapters, previous_chapters, strict=True):
+            chapter_stamp = FileStamp.of(chapter.content_path)
+            if chapter_stamp is None:
+                chapters.append(None)
+                continue
+            if previous_chapter is not None and previous_chapter[0] == chapter_stamp:
+                chapter._wordcount = previous_chapter[1]
+            else:
+                self.changed = True
+            chapters.append((chapter_stamp, chapter.wordcount))
+        self.current.works[key] = WorkSnapshot(toml_stamp=toml_stamp, work=work, chapters=chapters)
+        return work
+
+    def load_series(self, toml_path: pathlib.Path, work_lookup: T.Mapping[str, Work]) -> Series:
+        if self.disk_cache is None:
+            return Series.load(toml_path, work_lookup)
+        key = str(toml_path.resolve())
+        toml_stamp = T.cast(FileStamp, FileStamp.of(toml_path))
+        previous = self.previous.series.get(key)
+        if previous is not None and previous.toml_stamp == toml_stamp:
+            series_dict = previous.series_dict
+        else:
+            series_dict = load_toml(toml_path)
+            self.changed = True
+        self.current.series[key] = SeriesSnapshot(toml_stamp=toml_stamp, series_dict=series_dict)
+        return Series.from_dict(series_dict, toml_path.stem, work_lookup)
+
+    def save(self):
+        if self.disk_cache is None:
+            return
+        # works and series which have been deleted also call for a new snapshot
+        if (
+            self.changed
+            or self.current.works.keys() != self.previous.works.keys()
+            or self.current.series.keys() != self.previous.series.keys()
+        ):
+            works = {key: msgspec.structs.replace(snapshot, work=snapshot.work.declared()) for key, snapshot in self.current.works.items()}
+            snapshot = msgspec.structs.replace(self.current, works=works)
+            self.disk_cache.set(self.key, msgspec.msgpack.encode(snapshot, enc_hook=msgspec_enc_hook))
@@ -1,17 +1,24 @@
+import asyncio
 import pathlib
+import typing as T
 
 import bs4
+import httpx
 import tomli_w
 from msgspec import Struct
 
-from .models import Work
-from .utils import resolve_tag
+from .models import Settings, Site, Tag, Work
+from .utils import check_tag_urls, resolve_tag, tag_check_url
+
+# (field, is_ship) for each of a work's tag fields
+TAG_FIELDS = (("fandoms", False), ("relationships", True), ("characters", False), ("additional_tags", False))
 
 
 class NormalizeArgs(Struct):
     work: pathlib.Path
     dry_run: bool
     skip_tag_check: bool
+    all: bool = False
 
 
 def remove_nulls(d: dict):
@@ -21,21 +28,26 @@ def remove_nulls(d: dict):
             del d[key]
 
 
-def normalize_work(work: Work, check_tag_existence=False):
+def check_work_tags(works: T.Iterable[Work], transport: T.Optional[httpx.AsyncBaseTransport] = None) -> dict[str, bool]:
+    """Check every tag of the given works against AO3 in one batch."""
+    urls = set()
+    for work in works:
+        for field, is_ship in TAG_FIELDS:
+            urls.update(url for tag in getattr(work, field) if (url := tag_check_url(tag.declaration, is_ship=is_ship)) is not None)
+    return asyncio.run(check_tag_urls(urls, transport=transport))
+
+
+def normalize_work(work: Work, tag_exists: T.Optional[T.Mapping[str, bool]] = None):
     missing = []
     for chapter in work.chapters:
         if not chapter.content_path.is_file():
             missing.append(chapter)
     if missing:
         raise ValueError(f"Some chapter files for {work.slug} are missing!")
-    for i, tag in enumerate(work.fandoms):
-        work.fandoms[i] = resolve_tag(tag, check_existence=check_tag_existence)
-    for i, tag in enumerate(work.relationships):
-        work.relationships[i] = resolve_tag(tag, is_ship=True, check_existence=check_tag_existence)
-    for i, tag in enumerate(work.characters):
-        work.characters[i] = resolve_tag(tag, check_existence=check_tag_existence)
-    for i, tag in enumerate(work.additional_tags):
-        work.additional_tags[i] = resolve_tag(tag, check_existence=check_tag_existence)
+    for field, is_ship in TAG_FIELDS:
+        tags = getattr(work, field)
+        for i, tag in enumerate(tags):
+            tags[i] = Tag.parse(resolve_tag(tag.declaration, is_ship=is_ship, tag_exists=tag_exists))
     for html_attr in ("summary", "notes_before", "notes_after"):
         value = getattr(work, html_attr)
         if value is None:
@@ -45,18 +57,35 @@ def normalize_work(work: Work, check_tag_existence=False):
             setattr(work, html_attr, f"<p>{value}</p>")
 
 
-def normalize(args: NormalizeArgs):
-    work_path = args.work.resolve()
-    work = Work.load(work_path)
-    normalize_work(work, check_tag_existence=not args.skip_tag_check)
-
+def write_work(work: Work, work_path: pathlib.Path, dry_run: bool):
     work_dict = work.asdict()
     remove_nulls(work_dict)
     for chapter_dict in work_dict["chapters"]:
         remove_nulls(chapter_dict)
         del chapter_dict["num"]
 
-    if args.dry_run:
+    if dry_run:
         print(tomli_w.dumps(work_dict, indent=2))
     else:
-        tomli_w.dump(work_dict, work_path.open("wb"), indent=2)
+        with work_path.open("wb") as work_file:
+            tomli_w.dump(work_dict, work_file, indent=2)
+
+
+def normalize(args: NormalizeArgs):
+    if args.all:
+        # only the work files themselves are needed, not the whole site with its word counts
+        if Settings.load(args.work / "settings.toml").single_work:
+            toml_paths = [args.work / "work.toml"]
+        else:
+            toml_paths = Site.work_toml_paths(args.work)
+        works = [(Work.load(toml_path), toml_path.resolve()) for toml_path in toml_paths]
+        works.sort(key=lambda item: item[0].sort_key)
+    else:
+        work_path = args.work.resolve()
+        works = [(Work.load(work_path), work_path)]
+    tag_exists = None if args.skip_tag_check else check_work_tags(work for work, _ in works)
+    for work, work_path in works:
+        normalize_work(work, tag_exists=tag_exists)
+        if args.all and args.dry_run:
+            print(f"# {work_path}")
+        write_work(work, work_path, dry_run=args.dry_run)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import contextlib
+import functools
+import heapq
+import math
+import time
+import tracemalloc
+import typing as T
+
+import msgspec
+from msgspec import Struct
+
+if T.TYPE_CHECKING:
+    import collections.abc as C
+    import pathlib
+
+# how many of the slowest URLs to report
+SLOWEST_URL_COUNT = 20
+
+_profile: T.Optional[BuildProfile] = None
+
+
+class PhaseReport(Struct, kw_only=True):
+    count: int
+    seconds: float
+
+
+class EndpointReport(Struct, kw_only=True):
+    count: int
+    total_seconds: float
+    mean_seconds: float
+    p95_seconds: float
+    max_seconds: float
+    bytes_written: int
+
+
+class UrlReport(Struct, kw_only=True):
+    url: str
+    endpoint: str
+    seconds: float
+    bytes_written: int
+
+
+class ProfileReport(Struct, kw_only=True):
+    """Where the time went in a build. Phases can nest inside each other and inside endpoints, so their times overlap."""
+
+    total_seconds: float
+    peak_memory_bytes: int
+    phases: dict[str, PhaseReport]
+    endpoints: dict[str, EndpointReport]
+    slowest_urls: list[UrlReport]
+
+    def save(self, path: pathlib.Path):
+        path.write_bytes(msgspec.json.format(msgspec.json.encode(self)))
+
+    def summary(self) -> str:
+        lines = [f"{'Phase':<24}{'Count':>8}{'Seconds':>10}"]
+        for name, phase in sorted(self.phases.items(), key=lambda item: -item[1].seconds):
+            lines.append(f"{name:<24}{phase.count:>8}{phase.seconds:>10.3f}")
+        lines.append("")
+        lines.append(f"{'Endpoint':<24}{'Count':>8}{'Seconds':>10}{'p95 ms':>10}{'Max ms':>10}{'MB':>10}")
+        for name, endpoint in sorted(self.endpoints.items(), key=lambda item: -item[1].total_seconds):
+            lines.append(
+                f"{name:<24}{endpoint.count:>8}{endpoint.total_seconds:>10.3f}{endpoint.p95_seconds * 1000:>10.1f}"
+                f"{endpoint.max_seconds * 1000:>10.1f}{endpoint.bytes_written / 1e6:>10.2f}"
+            )
+        lines.append("")
+        lines.append("Slowest URLs:")
+        lines.extend(f"  {url.seconds * 1000:>8.1f} ms  {url.url}" for url in self.slowest_urls[:5])
+        lines.append("")
+        lines.append(f"Total {self.total_seconds:.2f}s; peak traced memory {self.peak_memory_bytes / 1e6:.1f} MB")
+        return "\n".join(lines)
+
+
+class ProfileData(Struct):
+    """The timings one process has gathered, which can be sent back from a worker process and merged into the main one."""
+
+    phases: dict[str, list[float]] = {}
+    endpoint_times: dict[str, list[float]] = {}
+    endpoint_bytes: dict[str, int] = {}
+    # (seconds, url, endpoint, bytes) for the slowest URLs, as a min-heap
+    slowest: list[tuple[float, str, str, int]] = []
+    peak_memory: int = 0
+
+
+class BuildProfile:
+    def __init__(self):
+        self.data = ProfileData()
+        self.start_time = time.perf_counter()
+
+    def add_phase(self, phase: str, seconds: float):
+        timing = self.data.phases.setdefault(phase, [0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+
+    def add_url(self, url: str, endpoint: str, seconds: float, bytes_written: int):
+        self.data.endpoint_times.setdefault(endpoint, []).append(seconds)
+        self.data.endpoint_bytes[endpoint] = self.data.endpoint_bytes.get(endpoint, 0) + bytes_written
+        entry = (seconds, url, endpoint, bytes_written)
+        if len(self.data.slowest) < SLOWEST_URL_COUNT:
+            heapq.heappush(self.data.slowest, entry)
+        else:
+            heapq.heappushpop(self.data.slowest, entry)
+
+    def take(self) -> ProfileData:
+        """Hand over what has been gathered so far, and start again from nothing."""
+        self.data.peak_memory = max(self.data.peak_memory, tracemalloc.get_traced_memory()[1])
+        data, self.data = self.data, ProfileData(peak_memory=self.data.peak_memory)
+        return data
+
+    def merge(self, data: ProfileData):
+        for phase, (count, seconds) in data.phases.items():
+            timing = self.data.phases.setdefault(phase, [0, 0.0])
+            timing[0] += count
+            timing[1] += seconds
+        for endpoint, times in data.endpoint_times.items():
+            self.data.endpoint_times.setdefault(endpoint, []).extend(times)
+        for endpoint, bytes_written in data.endpoint_bytes.items():
+            self.data.endpoint_bytes[endpoint] = self.data.endpoint_bytes.get(endpoint, 0) + bytes_written
+        self.data.slowest = heapq.nlargest(SLOWEST_URL_COUNT, self.data.slowest + data.slowest)
+        heapq.heapify(self.data.slowest)
+        self.data.peak_memory = max(self.data.peak_memory, data.peak_memory)
+
+    def report(self) -> ProfileReport:
+        peak_memory = max(self.data.peak_memory, tracemalloc.get_traced_memory()[1])
+        endpoints = {}
+        for endpoint, times in self.data.endpoint_times.items():
+            times = sorted(times)
+            endpoints[endpoint] = EndpointReport(
+                count=len(times),
+                total_seconds=sum(times),
+                mean_seconds=sum(times) / len(times),
+                p95_seconds=percentile(times, 95),
+                max_seconds=times[-1],
+                bytes_written=self.data.endpoint_bytes.get(endpoint, 0),
+            )
+        return ProfileReport(
+            total_seconds=time.perf_counter() - self.start_time,
+            peak_memory_bytes=peak_memory,
+            phases={phase: PhaseReport(count=int(count), seconds=seconds) for phase, (count, seconds) in self.data.phases.items()},
+            endpoints=endpoints,
+            slowest_urls=[
+                UrlReport(url=url, endpoint=endpoint, seconds=seconds, bytes_written=bytes_written)
+                for seconds, url, endpoint, bytes_written in sorted(self.data.slowest, reverse=True)
+            ],
+        )
+
+
+def percentile(sorted_values: C.Sequence[float], percent: float) -> float:
+    """The nearest-rank percentile of some values, which must already be sorted."""
+    return sorted_values[max(0, math.ceil(len(sorted_values) * percent / 100) - 1)]
+
+
+def start() -> BuildProfile:
+    """Start profiling this process, including tracing its memory allocations."""
+    global _profile
+    _profile = BuildProfile()
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return _profile
+
+
+def stop() -> T.Optional[ProfileReport]:
+    global _profile
+    if _profile is None:
+        return None
+    report = _profile.report()
+    _profile = None
+    tracemalloc.stop()
+    return report
+
+
+def get_profile() -> T.Optional[BuildProfile]:
+    return _profile
+
+
+@contextlib.contextmanager
+def timed(phase: str):
+    """Add the time taken inside this block to a phase of the profile, if there is one."""
+    if _profile is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        _profile.add_phase(phase, time.perf_counter() - start_time)
+
+
+def timed_function[**P, R](phase: str) -> C.Callable[[C.Callable[P, R]], C.Callable[P, R]]:
+    """Add the time taken by each call of the decorated function to a phase of the profile, if there is one."""
+
+    def decorate(func: C.Callable[P, R]) -> C.Callable[P, R]:
+        @functools.wraps(func)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            if _profile is None:
+                return func(*args, **kwargs)
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _profile.add_phase(phase, time.perf_counter() - start_time)
+
+        return wrapper
+
+    return decorate
+
+
+def write_chunks(chunks: C.Iterable[str], write: C.Callable[[str], T.Any]):
+    """Write out a page chunk by chunk. If profiling, the time spent producing the chunks counts as layout, and the time
+    spent writing them as file I/O."""
+    if _profile is None:
+        for chunk in chunks:
+            write(chunk)
+        return
+    layout_seconds = write_seconds = 0.0
+    before_chunk = time.perf_counter()
+    for chunk in chunks:
+        after_chunk = time.perf_counter()
+        layout_seconds += after_chunk - before_chunk
+        write(chunk)
+        before_chunk = time.perf_counter()
+        write_seconds += before_chunk - after_chunk
+    layout_seconds += time.perf_counter() - before_chunk
+    _profile.add_phase("layout", layout_seconds)
+    _profile.add_phase("write", write_seconds)
@@ -1,34 +1,62 @@
 from __future__ import annotations
 
+import concurrent.futures
+import functools
+import hashlib
 import importlib.resources
+import itertools
 import pathlib
+import posixpath
 import shutil
 import subprocess
+import time
 import typing as T
 
+import htpy as h
 from werkzeug.exceptions import NotFound
 from werkzeug.routing import Map, Rule
 
-from .layout import Layout
-from .utils import format_chapter_number, get_css_site_urls, get_site_urls, make_relative_url, urlpath_to_filepath
+from . import cache, compress, profiling
+from .cache import cache_key
+from .exceptions import Ao3MimicException, RenderError
+from .layout import LINK_MARKER, FragmentCache, Layout
+from .manifest import BuildManifest, InputFingerprints, save_asset_manifest
+from .media import MediaMode, MediaPublisher
+from .search import SearchIndex
+from .utils import (
+    format_chapter_number,
+    get_css_site_urls,
+    get_site_urls,
+    make_relative_url,
+    page_count,
+    url_directory,
+    urlpath_to_filepath,
+)
 
 if T.TYPE_CHECKING:
     import collections.abc as C
+    from importlib.resources.abc import Traversable
 
     from .models import Chapter, Series, Site, Work
 
 REGULAR_URL_MAP = Map(
     [
         Rule("/", endpoint="archive.index"),
-        Rule("/series/", endpoint="series.index"),
-        Rule("/series/<slug>/", endpoint="series.detail"),
-        Rule("/works/", endpoint="works.index"),
+        Rule("/series/", endpoint="series.index", defaults={"page": 1}),
+        Rule("/series/page/<int(min=2):page>/", endpoint="series.index"),
+        Rule("/series/<slug>/", endpoint="series.detail", defaults={"page": 1}),
+        Rule("/series/<slug>/page/<int(min=2):page>/", endpoint="series.detail"),
+        Rule("/works/", endpoint="works.index", defaults={"page": 1}),
+        Rule("/works/page/<int(min=2):page>/", endpoint="works.index"),
         Rule("/works/<slug>/", endpoint="work.index"),
         Rule("/works/<slug>/nav.html", endpoint="work.nav"),
         Rule("/works/<slug>/work.html", endpoint="work.all_chapters"),
         Rule("/works/<slug>/<chapter_number>.html", endpoint="work.chapter"),
         Rule("/works/<slug>/media/<filename>", endpoint="work.media"),
         Rule("/works/<slug>/work.css", endpoint="work.stylesheet"),
+        Rule("/search/", endpoint="search.index"),
+        Rule("/search/documents.json", endpoint="search.documents"),
+        Rule("/search/terms/<shard>.json", endpoint="search.shard"),
         Rule("/static/logo.png", endpoint="site.logo"),
         Rule("/static/styles.css", endpoint="archive.stylesheet"),
         Rule("/static/site.css", endpoint="site.stylesheet"),
@@ -52,46 +80,105 @@ SINGLE_WORK_URL_MAP = Map(
 )
 
 STYLESHEET_ENDPOINTS = frozenset(["work.stylesheet", "archive.stylesheet", "site.stylesheet"])
-BINARY_ENDPOINTS = frozenset(["work.media", "work.stylesheet", "site.logo", "archive.stylesheet", "site.stylesheet", "static_file"])
+# the search index files, which are generated from the whole site at once
+SEARCH_DATA_ENDPOINTS = frozenset(["search.documents", "search.shard"])
+BINARY_ENDPOINTS = frozenset(
+    ["work.media", "work.stylesheet", "site.logo", "archive.stylesheet", "site.stylesheet", "static_file", *SEARCH_DATA_ENDPOINTS]
+)
 
 type RouteArgs = C.Mapping[str, T.Any]
 
 
+class Routes:
+    """Builds and matches the site's URLs.
+
+    Every page links to many of the same places, so absolute URLs are built once per site and relative URLs once per
+    directory, instead of going through werkzeug and posixpath for every link.
+    """
+
+    def __init__(self, site: Site, url_map: Map, assets: T.Optional[C.Mapping[str, str]] = None):
+        self.site = site
+        self.url_map = url_map
+        self.adapter = url_map.bind("archive.example", "/")
+        # the fingerprinted URL each asset is published under instead of its usual one, if any
+        self.assets = dict(assets or {})
+        self._asset_sources = {fingerprinted: url for url, fingerprinted in self.assets.items()}
+        self._absolute: dict[tuple[str, tuple[tuple[str, T.Any], ...]], str] = {}
+        self._chapters: dict[str, list[str]] = {}
+        self._relative: dict[tuple[str, str], str] = {}
+
+    def match(self, url: str) -> tuple[str, RouteArgs]:
+        try:
+            return self.adapter.match(self._asset_sources.get(url, url))
+        except NotFound:
+            raise KeyError(url) from None
+
+    def build(self, endpoint: str, **values):
+        if self.site.settings.single_work:
+            values.pop("slug", None)
+        key = (endpoint, tuple(sorted(values.items())))
+        if (url := self._absolute.get(key)) is None:
+            url = self.adapter.build(endpoint, values)
+            url = self._absolute[key] = self.assets.get(url, url)
+        return url
+
+    def chapter_url(self, work: Work, chapter: Chapter):
+        if (chapter_urls := self._chapters.get(work.slug)) is None:
+            if work.is_oneshot:
+                chapter_urls = [self.build("work.index", slug=work.slug)]
+            else:
+                chapter_urls = [
+                    self.build("work.chapter", slug=work.slug, chapter_number=format_chapter_number(c.num, len(work.chapters)))
+                    for c in work.chapters
+                ]
+            self._chapters[work.slug] = chapter_urls
+        return chapter_urls[chapter.num - 1]
+
+    def relative(self, from_url: str, to_url: str):
+        from_directory = url_directory(from_url)
+        key = (from_directory, to_url)
+        if (relpath := self._relative.get(key)) is None:
+            relpath = self._relative[key] = make_relative_url(from_url=from_directory, to_url=to_url)
+        return relpath
+
+
 class Router:
     endpoint: str
     args: RouteArgs
     is_binary: bool
 
-    def __init__(self, site: Site, url_map: Map, url: str):
-        self.site = site
+    def __init__(self, routes: Routes, url: str):
+        self.routes = routes
+        self.site = routes.site
         self.current_url = url
-        self.active_mapping = url_map.bind("archive.example", "/", path_info=url)
-        try:
-            endpoint, args = self.active_mapping.match()
-        except NotFound:
-            raise KeyError(url) from None
-        self.endpoint = endpoint
-        self.args = args
-        self.is_binary = endpoint in BINARY_ENDPOINTS
+        self.endpoint, self.args = routes.match(url)
+        self.is_binary = self.endpoint in BINARY_ENDPOINTS
+
+    @property
+    def directory(self):
+        return url_directory(self.current_url)
+
+    def relative_url(self, to_url: str):
+        return self.routes.relative(self.current_url, to_url)
 
     def _build_relative(self, endpoint: str, **values):
         if self.site.settings.single_work and "slug" in values:
             actual_slug = values.pop("slug")
             expected_slug = self.site.works[0].slug
             assert actual_slug == expected_slug
-        return make_relative_url(from_url=self.active_mapping.path_info, to_url=self.active_mapping.build(endpoint, values))
+        return self.relative_url(self.routes.build(endpoint, **values))
 
     def root(self):
         endpoint = "work.index" if self.site.settings.single_work else "archive.index"
         return self._build_relative(endpoint)
 
-    def section_index(self, section: str):
+    def section_index(self, section: str, page: int = 1):
         if self.site.settings.single_work:
             raise ValueError("Can't have section indexes in single-work mode.")
         if section not in ["series", "works"]:
             raise ValueError("Bad section type")
         endpoint = f"{section}.index"
-        return self._build_relative(endpoint)
+        return self._build_relative(endpoint, page=page)
 
     def static_file(self, filename: str):
         return self._build_relative("static_file", filename=filename)
@@ -100,10 +187,7 @@ class Router:
         return self.chapter_path(work, work.chapters[0])
 
     def chapter_path(self, work: Work, chapter: Chapter):
-        if work.is_oneshot:
-            return self._build_relative("work.index", slug=work.slug)
-        chapter_number = format_chapter_number(chapter.num, len(work.chapters))
-        return self._build_relative("work.chapter", slug=work.slug, chapter_number=chapter_number)
+        return self.relative_url(self.routes.chapter_url(work, chapter))
 
     def entire_work_path(self, work: Work):
         endpoint = "work.index" if work.is_oneshot else "work.all_chapters"
@@ -120,120 +204,534 @@ class Router:
             raise ValueError("This work doesn't have a stylesheet.")
         return self._build_relative("work.stylesheet", slug=work.slug)
 
-    def series_detail(self, series: Series):
-        return self._build_relative("series.detail", slug=series.slug)
+    def series_detail(self, series: Series, page: int = 1):
+        return self._build_relative("series.detail", slug=series.slug, page=page)
+
+    def search_page(self):
+        if self.site.settings.single_work:
+            raise ValueError("Can't have a search page in single-work mode.")
+        return self._build_relative("search.index")
+
+
+class LinkTemplateRouter(Router):
+    """Stands in for a page's Router while a shared fragment is rendered, marking each link with its absolute URL so the
+    fragment can be reused on any page."""
+
+    def __init__(self, routes: Routes):
+        self.routes = routes
+        self.site = routes.site
+
+    def relative_url(self, to_url: str):
+        return f"{LINK_MARKER}{to_url}{LINK_MARKER}"
 
 
 class RenderableArchive:
-    def __init__(self, site: Site):
+    def __init__(self, site: Site, fingerprint_assets: bool = False, media_mode: MediaMode = MediaMode.COPY):
         self.site = site
+        self.media = MediaPublisher(media_mode)
         self.url_map = SINGLE_WORK_URL_MAP if self.site.settings.single_work else REGULAR_URL_MAP
-
-    def render_layout(self, router: Router):
-        layout = Layout(self.site, router)
+        self._use_routes(Routes(site, self.url_map))
+        if fingerprint_assets:
+            self._use_routes(Routes(site, self.url_map, self.fingerprint_assets()))
+
+    def _use_routes(self, routes: Routes):
+        self.routes = routes
+        self.fragments: T.Optional[FragmentCache] = FragmentCache(LinkTemplateRouter(self.routes))
+
+    def asset_urls(self) -> list[str]:
+        """List the stylesheets, scripts and logo which pages link to directly, so they can be fingerprinted.
+
+        Images referred to from stylesheets, and the media in chapters, keep their names.
+        """
+        urls = [self.absolute_url("archive.stylesheet"), self.absolute_url("site.logo")]
+        if self.site.has_site_css:
+            urls.append(self.absolute_url("site.stylesheet"))
+        urls.extend(
+            self.absolute_url("static_file", filename=resource.name)
+            for resource in importlib.resources.files("ao3mimic.static").iterdir()
+            if resource.is_file() and resource.name.endswith(".js")
+        )
+        urls.extend(self.absolute_url("work.stylesheet", slug=work.slug) for work in self.site.works if work.has_work_css)
+        return urls
+
+    def fingerprint_assets(self) -> dict[str, str]:
+        """Work out the name each asset is published under, with a digest of its content in, such as styles.3f9a1c22.css.
+
+        The name changes whenever the content does, so browsers can cache the assets for as long as they like.
+        """
+        assets = {}
+        for url in self.asset_urls():
+            digest = hashlib.blake2b(self.binary_data(*self.routes.match(url)), digest_size=4).hexdigest()
+            stem, suffix = posixpath.splitext(url)
+            assets[url] = f"{stem}.{digest}{suffix}"
+        return assets
+
+    def router(self, url: str):
+        return Router(self.routes, url)
+
+    def _listing_page(self, router: Router, item_count: int) -> int:
+        page = router.args["page"]
+        if page > page_count(item_count, self.site.settings.page_size):
+            raise KeyError(router.current_url)
+        return page
+
+    def _multichapter_work(self, router: Router) -> Work:
+        # a oneshot is all on its index page, without a navigation page or chapter pages
+        work = self.site.works[0] if self.site.settings.single_work else self.site.get_work(router.args["slug"])
+        if work.is_oneshot:
+            raise KeyError(router.current_url)
+        return work
+
+    def _chapter(self, work: Work, router: Router) -> Chapter:
+        # Only the chapter's own URL will do: 01.html for the first of ten chapters, but not 1.html, and not 00.html.
+        chapter_number = router.args["chapter_number"]
+        if not (chapter_number.isascii() and chapter_number.isdigit()) or not 1 <= int(chapter_number) <= len(work.chapters):
+            raise KeyError(router.current_url)
+        chapter = work.chapters[int(chapter_number) - 1]
+        if self.chapter_url(work, chapter) != router.current_url:
+            raise KeyError(router.current_url)
+        return chapter
+
+    def layout_page(self, router: Router) -> h.Element:
+        layout = Layout(self.site, router, fragments=self.fragments)
         match router.endpoint:
             case "archive.index":
-                return str(layout.archive_index())
+                return layout.archive_index()
             case "works.index":
-                return str(layout.works_index())
+                return layout.works_index(self._listing_page(router, len(self.site.works)))
             case "series.index":
-                return str(layout.series_index())
+                return layout.series_index(self._listing_page(router, len(self.site.series)))
             case "series.detail":
                 series = self.site.get_series(router.args["slug"])
-                return str(layout.series_detail(series))
+                return layout.series_detail(series, self._listing_page(router, len(series.works)))
             case "work.index":
                 work = self.site.works[0] if self.site.settings.single_work else self.site.get_work(router.args["slug"])
                 if work.is_oneshot:
-                    return str(layout.work_allchapters(work))
-                return str(layout.work_index(work))
+                    return layout.work_allchapters(work)
+                return layout.work_index(work)
             case "work.nav":
-                work = self.site.works[0] if self.site.settings.single_work else self.site.get_work(router.args["slug"])
-                return str(layout.work_nav(work))
+                return layout.work_nav(self._multichapter_work(router))
             case "work.chapter":
-                work = self.site.works[0] if self.site.settings.single_work else self.site.get_work(router.args["slug"])
-                chapnum = int(router.args["chapter_number"])
-                chapter = work.chapters[chapnum - 1]
-                return str(layout.work_chapter(work, chapter))
+                work = self._multichapter_work(router)
+                return layout.work_chapter(work, self._chapter(work, router))
             case "work.all_chapters":
-                work = self.site.works[0] if self.site.settings.single_work else self.site.get_work(router.args["slug"])
-                return str(layout.work_allchapters(work))
+                return layout.work_allchapters(self._multichapter_work(router))
+            case "search.index":
+                return layout.search_results()
             case _:
                 raise NotImplementedError(router.endpoint, router.args)
 
-    def render_static_file(self, filename: str, dest_file: pathlib.Path):
-        if not importlib.resources.is_resource("ao3mimic.static", filename):
-            raise ValueError("Cannot find static file %s" % filename)
-        with dest_file.open("wb") as dest:
-            src = importlib.resources.open_binary("ao3mimic.static", filename)
-            shutil.copyfileobj(src, dest)
-
-    def render_logo(self, dest_file: pathlib.Path):
-        with dest_file.open("wb") as dest:
-            src = (
-                self.site.settings.logo.open("rb")
-                if self.site.settings.logo is not None
-                else importlib.resources.open_binary("ao3mimic.branding", "not-ao3.png")
-            )
-            shutil.copyfileobj(src, dest)
+    def render_layout(self, router: Router):
+        return str(self.layout_page(router))
+
+    def write_page(self, router: Router, dest_file: pathlib.Path):
+        """Write a page out as htpy renders it, so the whole of a long work is never held in memory as one string."""
+        with dest_file.open("w") as page_file:
+            profiling.write_chunks(h.iter_node(self.layout_page(router)), page_file.write)
+
+    def static_file_source(self, filename: str) -> Traversable:
+        source = importlib.resources.files("ao3mimic.static") / filename
+        if not source.is_file():
+            raise KeyError("Cannot find static file %s" % filename)
+        return source
+
+    def logo_source(self) -> Traversable:
+        if self.site.settings.logo is not None:
+            return self.site.settings.logo
+        return importlib.resources.files("ao3mimic.branding") / "not-ao3.png"
+
+    @profiling.timed_function("sass")
+    def compile_sass(self) -> bytes:
+        scss = importlib.resources.files("ao3mimic.branding") / "styles.scss"
+        scss_digest = hashlib.blake2b(scss.read_bytes()).hexdigest()
+        disk_cache = cache.get_cache("sass")
+        sass = shutil.which("sass")
+        if sass is None:
+            # Without sass, whatever was last compiled from this same stylesheet will do.
+            if disk_cache is not None and (cached := disk_cache.get(cache_key(scss_digest))) is not None:
+                return cached
+            raise Ao3MimicException("Cannot find sass on the PATH, and there is no cached copy of the compiled stylesheet.")
+        # The sass executable's own path, size and mtime stand in for its version, which would take another launch to ask for.
+        sass_stat = pathlib.Path(sass).resolve().stat()
+        key = cache_key(scss_digest, str(pathlib.Path(sass).resolve()), str(sass_stat.st_mtime_ns), str(sass_stat.st_size))
+        if disk_cache is not None and (cached := disk_cache.get(key)) is not None:
+            return cached
+        with importlib.resources.as_file(scss) as scss_src:
+            css = subprocess.check_output([sass, "--no-source-map", scss_src])
+        if disk_cache is not None:
+            disk_cache.set(key, css)
+            disk_cache.set(cache_key(scss_digest), css)
+        return css
 
     def render_sass(self, dest_file: pathlib.Path):
-        sass = shutil.which("sass")
-        with importlib.resources.as_file(importlib.resources.files("ao3mimic.branding") / "styles.scss") as scss_src:
-            subprocess.check_call([sass, scss_src, dest_file])
+        data = self.compile_sass()
+        with profiling.timed("write"):
+            dest_file.write_bytes(data)
 
-    def render_work_media(self, work: Work, filename: str, dest_file: pathlib.Path):
+    def work_media_source(self, work: Work, filename: str) -> pathlib.Path:
         media_src = T.cast(pathlib.Path, work.work_path / "media")
         if not media_src.is_dir():
-            raise ValueError("Work doesn't have media")
+            raise KeyError("Work doesn't have media")
         media_file = media_src / filename
         if not media_file.is_file():
-            raise ValueError("Requested media not found")
-        shutil.copyfile(media_file, dest_file)
+            raise KeyError("Requested media not found")
+        return media_file
 
-    def render_binary(self, endpoint: str, args: RouteArgs, dest_file: pathlib.Path):
+    def binary_source(self, endpoint: str, args: RouteArgs) -> Traversable:
+        """Find the file that a binary endpoint is copied from. (archive.stylesheet is compiled instead.)"""
         match endpoint:
             case "static_file":
-                self.render_static_file(args["filename"], dest_file)
+                return self.static_file_source(args["filename"])
             case "site.logo":
-                self.render_logo(dest_file)
-            case "archive.stylesheet":
-                self.render_sass(dest_file)
+                return self.logo_source()
             case "site.stylesheet":
-                shutil.copyfile(self.site.site_css, dest_file)
+                if not self.site.has_site_css:
+                    raise KeyError("The site doesn't have a stylesheet")
+                return self.site.site_css
             case "work.media":
                 work = self.site.works[0] if self.site.settings.single_work else self.site.get_work(args["slug"])
-                self.render_work_media(work, args["filename"], dest_file)
+                return self.work_media_source(work, args["filename"])
             case "work.stylesheet":
                 work = self.site.works[0] if self.site.settings.single_work else self.site.get_work(args["slug"])
-                shutil.copyfile(work.work_css, dest_file)
+                if not work.has_work_css:
+                    raise KeyError("This work doesn't have a stylesheet")
+                return work.work_css
             case _:
                 raise NotImplementedError(endpoint, args)
 
-    def render(self, output_directory: pathlib.Path):
-        output_directory = output_directory.resolve()
-        if output_directory.is_dir():
-            shutil.rmtree(output_directory)
-        output_directory.mkdir()
+    @functools.cached_property
+    def search_index(self):
+        search_url = self.absolute_url("search.index")
+        with profiling.timed("search_index"):
+            return SearchIndex.build(
+                self.site.works,
+                [self.routes.relative(search_url, self.routes.chapter_url(work, work.chapters[0])) for work in self.site.works],
+                include_chapter_text=self.site.settings.search_chapter_text,
+            )
 
-        # we start with the root, of course.
-        to_render = {"/"}
-        # the work indexes are never linked directly (except for oneshots) so let's get them too.
+    def search_urls(self) -> list[str]:
+        if self.site.settings.single_work:
+            return []
+        return [
+            self.absolute_url("search.index"),
+            self.absolute_url("search.documents"),
+            *(self.absolute_url("search.shard", shard=shard) for shard in self.search_index.shards),
+        ]
+
+    def binary_data(self, endpoint: str, args: RouteArgs) -> bytes:
+        match endpoint:
+            case "archive.stylesheet":
+                return self.compile_sass()
+            case "search.documents":
+                return self.search_index.documents_json()
+            case "search.shard":
+                return self.search_index.shard_json(args["shard"])
+        return self.binary_source(endpoint, args).read_bytes()
+
+    def render_binary(self, endpoint: str, args: RouteArgs, dest_file: pathlib.Path):
+        if endpoint in SEARCH_DATA_ENDPOINTS:
+            data = self.binary_data(endpoint, args)
+            # Every search file is rebuilt when any work changes, but most of the shards come out the same, and are left be.
+            if dest_file.is_file() and dest_file.read_bytes() == data:
+                return
+            with profiling.timed("write"):
+                dest_file.write_bytes(data)
+            return
+        # The existing file may be linked to a file in the content directory, which must not be written through.
+        dest_file.unlink(missing_ok=True)
+        if endpoint == "archive.stylesheet":
+            self.render_sass(dest_file)
+            return
+        source = self.binary_source(endpoint, args)
+        with profiling.timed("write"):
+            if isinstance(source, pathlib.Path):
+                self.media.publish(source, dest_file)
+            else:
+                with source.open("rb") as src, dest_file.open("wb") as dest:
+                    shutil.copyfileobj(src, dest)
+
+    def absolute_url(self, endpoint: str, **values):
+        return self.routes.build(endpoint, **values)
+
+    def chapter_url(self, work: Work, chapter: Chapter):
+        return self.routes.chapter_url(work, chapter)
+
+    def plan_work(self, work: Work) -> set[str]:
+        """List the URLs belonging to one work: its pages, media and stylesheet."""
+        urls = {self.absolute_url("work.index", slug=work.slug)}
+        if not work.is_oneshot:
+            urls.add(self.absolute_url("work.nav", slug=work.slug))
+            urls.add(self.absolute_url("work.all_chapters", slug=work.slug))
+            urls.update(self.chapter_url(work, chapter) for chapter in work.chapters)
+        media_src = T.cast(pathlib.Path, work.work_path) / "media"
+        if media_src.is_dir():
+            urls.update(
+                self.absolute_url("work.media", slug=work.slug, filename=media_file.name)
+                for media_file in media_src.iterdir()
+                if media_file.is_file()
+            )
+        if work.has_work_css:
+            css_url = self.absolute_url("work.stylesheet", slug=work.slug)
+            urls.add(css_url)
+            urls.update(get_css_site_urls(work.work_css.read_text(), css_url))
+        return urls
+
+    def group_by_work(self, urls: C.Iterable[str]) -> list[tuple[T.Optional[Work], list[str]]]:
+        """Split up URLs by the work they belong to, in the order of the works, followed by the rest of the site under None."""
+        owners = {url: work.slug for work in self.site.works for url in self.plan_work(work)}
+        groups: dict[T.Optional[str], list[str]] = {work.slug: [] for work in self.site.works}
+        groups[None] = []
+        for url in urls:
+            groups[owners.get(url)].append(url)
+        return [(None if slug is None else self.site.get_work(slug), work_urls) for slug, work_urls in groups.items() if work_urls]
+
+    def _listing_urls(self, endpoint: str, item_count: int, **values):
+        pages = page_count(item_count, self.site.settings.page_size)
+        return [self.absolute_url(endpoint, page=page, **values) for page in range(1, pages + 1)]
+
+    def blurb_urls(self, work: Work) -> set[str]:
+        """List the index pages with a blurb for this work or for a series it is in, which all show its word count."""
+        page_size = self.site.settings.page_size
+        works_page = self.site.work_positions[work.slug] // page_size + 1
+        urls = {self.absolute_url("works.index", page=works_page)}
+        if works_page == 1:
+            urls.add(self.absolute_url("archive.index"))
+        for wis in self.site.work_in_series.get(work.slug, []):
+            series_page = self.site.series_positions[wis.series.slug] // page_size + 1
+            urls.add(self.absolute_url("series.index", page=series_page))
+            if series_page == 1:
+                urls.add(self.absolute_url("archive.index"))
+            urls.add(self.absolute_url("series.detail", slug=wis.series.slug, page=(wis.position - 1) // page_size + 1))
+        return urls
+
+    def plan(self, search_urls: T.Optional[C.Iterable[str]] = None) -> list[str]:
+        """List every URL in the site, working from the site model instead of crawling the rendered pages.
+
+        Listing the search index's shards means building it, unless ``search_urls`` already gives them.
+        """
+        urls = {"/"}
         if not self.site.settings.single_work:
-            root_router = Router(self.site, self.url_map, "/")
-            to_render.update("/" + root_router.work_index_path(work) for work in self.site.works)
-        rendered = set()
-        while to_render:
-            current = to_render.pop()
-            router = Router(self.site, self.url_map, current)
-            rendered.add(current)
-            dest_file = output_directory / urlpath_to_filepath(current)
+            urls.update(self._listing_urls("works.index", len(self.site.works)))
+            if self.site.series:
+                urls.update(self._listing_urls("series.index", len(self.site.series)))
+            for series in self.site.series:
+                urls.update(self._listing_urls("series.detail", len(series.works), slug=series.slug))
+        for work in self.site.works:
+            urls.update(self.plan_work(work))
+        urls.update(self.search_urls() if search_urls is None else search_urls)
+        urls.add(self.absolute_url("site.logo"))
+        # styles.css only refers to the bundled static files, which are all included anyway.
+        urls.add(self.absolute_url("archive.stylesheet"))
+        if self.site.has_site_css:
+            css_url = self.absolute_url("site.stylesheet")
+            urls.add(css_url)
+            urls.update(get_css_site_urls(self.site.site_css.read_text(), css_url))
+        urls.update(
+            self.absolute_url("static_file", filename=resource.name)
+            for resource in importlib.resources.files("ao3mimic.static").iterdir()
+            if resource.is_file()
+        )
+        return sorted(urls)
+
+    def render_url(self, url: str, output_directory: pathlib.Path):
+        start_time = time.perf_counter()
+        try:
+            router = self.router(url)
+            dest_file = output_directory / urlpath_to_filepath(url)
             dest_file.parent.mkdir(parents=True, exist_ok=True)
             if router.is_binary:
                 self.render_binary(router.endpoint, router.args, dest_file)
-                if router.endpoint in STYLESHEET_ENDPOINTS:
-                    to_render.update(get_css_site_urls(dest_file.read_text(), current))
             else:
-                data = self.render_layout(router)
-                to_render.update(get_site_urls(data, current))
-                dest_file.write_text(data)
-            to_render.difference_update(rendered)
+                self.write_page(router, dest_file)
+        except Exception as exc:
+            raise RenderError(url) from exc
+        if (profile := profiling.get_profile()) is not None:
+            profile.add_url(url, router.endpoint, time.perf_counter() - start_time, dest_file.stat().st_size)
+
+    def _remove_stale_file(self, output_directory: pathlib.Path, url: str):
+        stale_file = output_directory / urlpath_to_filepath(url)
+        stale_file.unlink(missing_ok=True)
+        compress.remove_compressed(stale_file)
+        # tidy up any directories left empty, such as those of a deleted work
+        for parent in stale_file.parents:
+            if parent == output_directory or any(parent.iterdir()):
+                break
+            parent.rmdir()
+
+    def render(
+        self,
+        output_directory: pathlib.Path,
+        jobs: int = 1,
+        force: bool = False,
+        precompress: C.Collection[str] = (),
+        low_memory: bool = False,
+    ):
+        """Render the site into a directory, skipping the URLs whose inputs haven't changed since the last build there.
+
+        With ``low_memory``, the pages are rendered work by work, and each work's chapters are let go of once its pages are
+        written, so that only the word counts stay in memory instead of the whole archive.
+        """
+        output_directory = output_directory.resolve()
+        manifest = None if force else BuildManifest.load(output_directory)
+        if manifest is None:
+            # Without a manifest we can't tell what's in there, so start from scratch.
+            if output_directory.is_dir():
+                shutil.rmtree(output_directory)
+            manifest = BuildManifest()
+        output_directory.mkdir(exist_ok=True)
+
+        fingerprinter = InputFingerprints(self.site, self.routes.assets, self.media.mode)
+        fingerprints = {}
+        with profiling.timed("plan"):
+            planned = self.plan(self._unchanged_search_urls(manifest, fingerprinter))
+        with profiling.timed("fingerprint"):
+            for url in planned:
+                router = self.router(url)
+                fingerprints[url] = fingerprinter.fingerprint(router.endpoint, router.args)
+        for url in sorted(manifest.entries.keys() - fingerprints.keys()):
+            self._remove_stale_file(output_directory, url)
+            manifest.compressed.pop(url, None)
+        urls = [
+            url
+            for url, fingerprint in fingerprints.items()
+            if manifest.entries.get(url) != fingerprint or not (output_directory / urlpath_to_filepath(url)).is_file()
+        ]
+        # Forget the pages about to be rendered first, so that a build which fails partway through will redo them next time.
+        to_forget = frozenset(urls)
+        BuildManifest(
+            entries={url: fingerprint for url, fingerprint in fingerprints.items() if url not in to_forget}, compressed=manifest.compressed
+        ).save(output_directory)
+        with profiling.timed("render"):
+            self._render_urls(urls, output_directory, jobs, low_memory)
+        # Pages rendered again may well have come out the same, so compression goes by their content instead of their inputs.
+        with profiling.timed("precompress"):
+            compressed = compress.precompress(output_directory, fingerprints.keys(), precompress, manifest.compressed, jobs=jobs)
+        with profiling.timed("manifest"):
+            save_asset_manifest(output_directory, self.routes.assets)
+            BuildManifest(entries=fingerprints, compressed=compressed).save(output_directory)
+        if cache.get_root() is not None:
+            with profiling.timed("prune_cache"):
+                self.site.prune_cache()
+        return urls
+
+    def _unchanged_search_urls(self, manifest: BuildManifest, fingerprinter: InputFingerprints) -> T.Optional[list[str]]:
+        """The search URLs of the last build, if none of their inputs have changed since, so that a build with nothing new
+        to search needn't build the search index just to list its shards."""
+        if self.site.settings.single_work:
+            return None
+        search_url = self.absolute_url("search.index")
+        documents_url = self.absolute_url("search.documents")
+        urls = [search_url]
+        for url, fingerprint in manifest.entries.items():
+            if url == search_url or not url.startswith(search_url):
+                continue
+            try:
+                endpoint, args = self.routes.match(url)
+            except KeyError:
+                return None
+            if endpoint not in SEARCH_DATA_ENDPOINTS or fingerprint != fingerprinter.fingerprint(endpoint, args):
+                return None
+            urls.append(url)
+        return urls if documents_url in urls else None
+
+    def rerender(self, urls: C.Collection[str], output_directory: pathlib.Path, precompress: C.Collection[str] = ()):
+        """Render just these URLs into an existing build, updating their entries in its manifest."""
+        output_directory = output_directory.resolve()
+        manifest = BuildManifest.load(output_directory) or BuildManifest()
+        fingerprinter = InputFingerprints(self.site, self.routes.assets, self.media.mode)
+        for url in urls:
+            manifest.entries.pop(url, None)
+        manifest.save(output_directory)
+        for url in sorted(urls):
+            self.render_url(url, output_directory)
+            router = self.router(url)
+            manifest.entries[url] = fingerprinter.fingerprint(router.endpoint, router.args)
+        compressed = compress.precompress(output_directory, urls, precompress, manifest.compressed)
+        for url in urls:
+            manifest.compressed.pop(url, None)
+        manifest.compressed.update(compressed)
+        manifest.save(output_directory)
+
+    def _render_urls(self, urls: C.Sequence[str], output_directory: pathlib.Path, jobs: int, low_memory: bool = False):
+        if jobs <= 1 or len(urls) <= 1:
+            if not low_memory:
+                for url in urls:
+                    self.render_url(url, output_directory)
+                return
+            for work, work_urls in self.group_by_work(urls):
+                for url in work_urls:
+                    self.render_url(url, output_directory)
+                if work is not None:
+                    work.release_content()
+            return
+
+        # Binary files are quick to write, so they are all written here instead: that way the search index is only built
+        # once, and identical media files can be shared across the whole site.
+        binary_urls = [url for url in urls if self.router(url).is_binary]
+        for url in binary_urls:
+            self.render_url(url, output_directory)
+        urls = [url for url in urls if url not in frozenset(binary_urls)]
+
+        # Count the words up front so every worker inherits the totals instead of recounting them.
+        for work in self.site.works:
+            work.wordcount  # noqa: B018
+        if low_memory:
+            # A worker renders a whole work at once, so it can let go of the work's chapters afterward.
+            batches: list[tuple[list[str], T.Optional[str]]] = []
+            for work, work_urls in self.group_by_work(urls):
+                if work is None:
+                    batches.extend(([url], None) for url in work_urls)
+                else:
+                    batches.append((work_urls, work.slug))
+        else:
+            batches = [([url], None) for url in urls]
+        profile = profiling.get_profile()
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker, initargs=(self.site, cache.get_root(), self.routes.assets, profile is not None)
+        ) as executor:
+            try:
+                for worker_profile in executor.map(_render_batch_in_worker, batches, itertools.repeat(output_directory)):
+                    if profile is not None and worker_profile is not None:
+                        profile.merge(worker_profile)
+            except BaseException:
+                executor.shutdown(cancel_futures=True)
+                raise
+
+    def verify_links(self, output_directory: pathlib.Path, urls: C.Collection[str]) -> list[tuple[str, str]]:
+        """Crawl the rendered pages and stylesheets, returning (page, target) pairs for links to URLs that were not rendered."""
+        output_directory = output_directory.resolve()
+        planned = frozenset(urls)
+        broken = []
+        for url in urls:
+            router = self.router(url)
+            if router.is_binary and router.endpoint not in STYLESHEET_ENDPOINTS:
+                continue
+            data = (output_directory / urlpath_to_filepath(url)).read_text()
+            targets = get_css_site_urls(data, url) if router.is_binary else get_site_urls(data, url)
+            broken.extend((url, target) for target in sorted(targets) if target not in planned)
+        return broken
+
+
+_worker_archive: T.Optional[RenderableArchive] = None
+
+
+def _init_worker(site: Site, cache_root: T.Optional[pathlib.Path], assets: C.Mapping[str, str], profile: bool):
+    global _worker_archive
+    cache.configure(cache_root)
+    if profile:
+        profiling.start()
+    _worker_archive = RenderableArchive(site)
+    _worker_archive._use_routes(Routes(site, _worker_archive.url_map, assets))
+
+
+def _render_batch_in_worker(batch: tuple[list[str], T.Optional[str]], output_directory: pathlib.Path):
+    """Render some URLs, and then let go of the chapters of the work they belong to, if it is given."""
+    assert _worker_archive is not None
+    urls, release_slug = batch
+    for url in urls:
+        _worker_archive.render_url(url, output_directory)
+    if release_slug is not None:
+        _worker_archive.site.get_work(release_slug).release_content()
+    # send these pages' timings back to be added to the main process's profile
+    profile = profiling.get_profile()
+    return None if profile is None else profile.take()
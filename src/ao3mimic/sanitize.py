@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import collections
+import functools
+import html.entities
+import re
+import typing as T
+
+from msgspec import Struct
+
+from .utils import count_plain_text
+
+if T.TYPE_CHECKING:
+    import lxml.etree
+
+# Userstuff (chapters, summaries and notes) was always sanitized with html5lib, which parses HTML exactly as browsers do but
+# is slow. libxml2 (through lxml) is much faster, but it follows older rules, and doesn't always build the same tree from
+# the same markup. So userstuff is parsed with libxml2 first, and the tree is checked for anything html5lib might have
+# built differently; only if something turns up is it parsed again with html5lib. The markup that comes out is the same
+# either way, down to the last byte.
+
+# Elements whose parsing libxml2 and html5lib agree on. Anything else, such as forms, SVG or <script>, goes to html5lib.
+FAST_ELEMENTS = frozenset(
+    [
+        *["a", "abbr", "acronym", "address", "article", "aside", "b", "bdi", "bdo", "big", "blockquote", "br", "caption"],
+        *["center", "cite", "code", "col", "colgroup", "data", "dd", "del", "details", "dfn", "div", "dl", "dt", "em"],
+        *["figcaption", "figure", "font", "footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hgroup", "hr", "i", "img"],
+        *["ins", "kbd", "li", "main", "mark", "nav", "ol", "p", "pre", "q", "s", "samp", "section", "small", "span", "strike"],
+        *["strong", "sub", "summary", "sup", "table", "tbody", "td", "tfoot", "th", "thead", "time", "tr", "tt", "u", "ul"],
+        *["var", "wbr"],
+    ]
+)
+# HTML5 elements which libxml2 doesn't know, and reports as invalid, but parses well enough as plain elements
+_UNKNOWN_TO_LIBXML2 = frozenset(
+    [
+        *["article", "aside", "bdi", "data", "details", "figcaption", "figure", "footer", "header", "hgroup", "main", "mark"],
+        *["nav", "section", "summary", "time", "wbr"],
+    ]
+)
+# Starting any of these closes an open <p> in HTML5, which libxml2 doesn't always do.
+_CLOSES_P = frozenset(
+    [
+        *["address", "article", "aside", "blockquote", "center", "details", "div", "dl", "dd", "dt", "figcaption", "figure"],
+        *["footer", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hgroup", "hr", "li", "main", "nav", "ol", "p", "pre"],
+        *["section", "summary", "table", "ul"],
+    ]
+)
+_HEADINGS = frozenset(["h1", "h2", "h3", "h4", "h5", "h6"])
+# what each table element may directly contain, without html5lib inserting or moving anything
+_TABLE_CHILDREN = {
+    "table": frozenset(["caption", "colgroup", "thead", "tbody", "tfoot"]),
+    "thead": frozenset(["tr"]),
+    "tbody": frozenset(["tr"]),
+    "tfoot": frozenset(["tr"]),
+    "tr": frozenset(["td", "th"]),
+    "colgroup": frozenset(["col"]),
+}
+# and what each must be directly inside, as html5lib drops them anywhere else
+_TABLE_PARENTS = {
+    child: frozenset(parent for parent, children in _TABLE_CHILDREN.items() if child in children)
+    for child in frozenset().union(*_TABLE_CHILDREN.values())
+}
+
+# How BeautifulSoup writes out HTML: these elements are written as <br/>, and these attributes are lists of values.
+VOID_ELEMENTS = frozenset(
+    [
+        *["area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta", "param", "source"],
+        *["track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex", "nextid", "spacer"],
+    ]
+)
+_LIST_ATTRIBUTES = frozenset(["class", "accesskey", "dropzone"])
+_ELEMENT_LIST_ATTRIBUTES = {"a": frozenset(["rel", "rev"]), "td": frozenset(["headers"]), "th": frozenset(["headers"])}
+_NOT_WHITESPACE = re.compile(r"\S+")
+
+_END_TAG = re.compile(r"</([a-zA-Z][^\s/>]*)")
+# <span/> leaves the span open in HTML5, but closes it in libxml2
+_SELF_CLOSING_TAG = re.compile(r"<([a-zA-Z][^\s/>]*)[^<>]*/>")
+# HTML5 knows many more named character references than libxml2, will read some without their semicolon, and maps some
+# numeric references to other characters
+_CHARACTER_REFERENCE = re.compile(r"&(#?)([0-9a-zA-Z]*)(;?)")
+# libxml2 complains about a lone ampersand, but keeps it, as HTML5 does
+_HARMLESS_ERRORS = frozenset(["ERR_NAME_REQUIRED"])
+
+
+class ProcessedHtml(Struct, array_like=True):
+    """What comes out of processing some userstuff: its sanitized markup and its word count."""
+
+    cleaned: str
+    wordcount: int
+
+
+def process_html(some_html: str) -> ProcessedHtml:
+    """Sanitize some userstuff and count its words, parsing it only once."""
+    return _process_fast(some_html) or _process_html5lib(some_html)
+
+
+def count_words(some_html: str) -> int:
+    """Count the words in the text of some userstuff, as html5lib sees it, without sanitizing it."""
+    wrapper = _parse_fast(some_html)
+    if wrapper is None:
+        import bs4
+
+        return count_plain_text(bs4.BeautifulSoup(some_html, "html5lib").get_text())
+    return count_plain_text("".join(wrapper.itertext()))
+
+
+def _process_html5lib(some_html: str) -> ProcessedHtml:
+    import bs4
+    import hyperlink
+
+    soup = bs4.BeautifulSoup(some_html, "html5lib")
+    wordcount = count_plain_text(soup.get_text())
+    soup.head.decompose()
+    for a_tag in soup.find_all("a", href=True):
+        url = hyperlink.parse(a_tag["href"])
+        if url.absolute:
+            a_tag["rel"] = "noreferrer"
+    soup.body.unwrap()
+    soup.html.unwrap()
+    return ProcessedHtml(cleaned=str(soup), wordcount=wordcount)
+
+
+def _parse_fast(some_html: str) -> T.Optional[lxml.etree._Element]:
+    """Parse userstuff with libxml2, returning an element holding it, or None if html5lib might see it differently."""
+    import lxml.etree
+
+    if "\0" in some_html or "<!" in some_html.lstrip()[:2]:
+        return None
+    for match in _SELF_CLOSING_TAG.finditer(some_html):
+        if match[1].lower() not in VOID_ELEMENTS:
+            return None
+    for match in _CHARACTER_REFERENCE.finditer(some_html):
+        if not _same_reference_in_html5(*match.groups()):
+            return None
+    # the same newlines as HTML5, and a <div> to keep libxml2 from putting stray text in a <p>
+    some_html = some_html.replace("\r\n", "\n").replace("\r", "\n")
+    parser = lxml.etree.HTMLParser(recover=True, no_network=True, huge_tree=True, default_doctype=False)
+    root = lxml.etree.fromstring(f"<div>{some_html}</div>", parser)
+    for error in parser.error_log:
+        if error.type_name in _HARMLESS_ERRORS:
+            continue
+        if error.type_name != "HTML_UNKNOWN_TAG" or error.message.removeprefix("Tag ").split()[0] not in _UNKNOWN_TO_LIBXML2:
+            return None
+    body = root.find("body")
+    if len(root) != 1 or body is None or len(body) != 1 or body.text or body[0].tail:
+        return None
+    wrapper = body[0]
+    # HTML5 skips whitespace at the very start
+    wrapper.text = wrapper.text and wrapper.text.lstrip("\t\n\f\r ")
+    elements: collections.Counter[str] = collections.Counter()
+    for element in wrapper.iterdescendants():
+        if not isinstance(element.tag, str):
+            if not isinstance(element, lxml.etree._Comment):
+                return None
+            continue
+        if element.tag not in FAST_ELEMENTS:
+            return None
+        if not _same_in_html5(element):
+            return None
+        if element.tag not in VOID_ELEMENTS:
+            elements[element.tag] += 1
+    # libxml2 quietly closes elements that HTML5 would leave open, such as an <i> when a <p> starts inside it. It complains
+    # when it meets the end tag of an element it has already closed, so an element that was closed early has either a
+    # stray end tag, and an error, or none at all.
+    end_tags = collections.Counter(name.lower() for name in _END_TAG.findall(some_html))
+    if end_tags != elements:
+        return None
+    return wrapper
+
+
+def _same_reference_in_html5(number_sign: str, name: str, semicolon: str):
+    if not number_sign and not name:
+        return True
+    if not semicolon:
+        return False
+    if not number_sign:
+        return name in html.entities.name2codepoint
+    try:
+        codepoint = int(name[1:], 16) if name[:1] in "xX" else int(name)
+    except ValueError:
+        return False
+    return 0 < codepoint < 0x80 or 0x9F < codepoint < 0xD800 or 0xDFFF < codepoint <= 0x10FFFF
+
+
+def _same_in_html5(element: lxml.etree._Element):
+    tag = element.tag
+    parent = element.getparent()
+    assert parent is not None
+    if (allowed := _TABLE_CHILDREN.get(parent.tag)) is not None and tag not in allowed:
+        return False
+    # text in a table is moved out of it
+    if tag in _TABLE_CHILDREN and (
+        (element.text and element.text.strip("\t\n\f\r ")) or any(child.tail and child.tail.strip("\t\n\f\r ") for child in element)
+    ):
+        return False
+    if (required := _TABLE_PARENTS.get(tag)) is not None and parent.tag not in required:
+        return False
+    # libxml2 doesn't know <wbr> is empty
+    if tag in VOID_ELEMENTS and (element.text or len(element)):
+        return False
+    if tag == "pre" and element.text and element.text.startswith("\n"):
+        return False
+    for ancestor in element.iterancestors():
+        if ancestor.tag in ("td", "th", "caption", "table", "body"):
+            break
+        if tag in _CLOSES_P and ancestor.tag == "p":
+            return False
+        if tag in _HEADINGS and ancestor.tag in _HEADINGS:
+            return False
+        if tag == "a" and ancestor.tag == "a":
+            return False
+        if tag == "li" and ancestor.tag in ("ul", "ol"):
+            break
+        if tag in ("dd", "dt") and ancestor.tag == "dl":
+            break
+        if tag in ("li", "dd", "dt") and ancestor.tag in ("li", "dd", "dt"):
+            return False
+    return True
+
+
+def _process_fast(some_html: str) -> T.Optional[ProcessedHtml]:
+    wrapper = _parse_fast(some_html)
+    if wrapper is None:
+        return None
+    parts: list[str] = []
+    text: list[str] = []
+    _serialize_children(wrapper, parts, text)
+    return ProcessedHtml(cleaned="".join(parts), wordcount=count_plain_text("".join(text)))
+
+
+def _serialize_children(element: lxml.etree._Element, parts: list[str], text: list[str]):
+    if element.text:
+        parts.append(_escape(element.text))
+        text.append(element.text)
+    for child in element:
+        if isinstance(child.tag, str):
+            _serialize_element(child, parts, text)
+        else:
+            parts.append(f"<!--{child.text or ''}-->")
+        if child.tail:
+            parts.append(_escape(child.tail))
+            text.append(child.tail)
+
+
+def _serialize_element(element: lxml.etree._Element, parts: list[str], text: list[str]):
+    tag = element.tag
+    attributes = dict(element.attrib)
+    if tag == "a" and "href" in attributes and _is_absolute(attributes["href"]):
+        attributes["rel"] = "noreferrer"
+    list_attributes = _ELEMENT_LIST_ATTRIBUTES.get(tag, frozenset())
+    parts.append(f"<{tag}")
+    # BeautifulSoup writes attributes sorted by name
+    for name, value in sorted(attributes.items()):
+        if name in _LIST_ATTRIBUTES or name in list_attributes:
+            value = " ".join(_NOT_WHITESPACE.findall(value))
+        parts.append(f" {name}={_quote_attribute(_escape(value))}")
+    if tag in VOID_ELEMENTS:
+        parts.append("/>")
+        return
+    parts.append(">")
+    _serialize_children(element, parts, text)
+    parts.append(f"</{tag}>")
+
+
+def _escape(text: str):
+    # faster than str.translate
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+@functools.lru_cache(maxsize=4096)
+def _is_absolute(url: str):
+    import hyperlink
+
+    return hyperlink.parse(url).absolute
+
+
+def _quote_attribute(value: str):
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    return '"{}"'.format(value.replace('"', "&quot;"))
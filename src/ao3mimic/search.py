@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import collections
+import itertools
+import typing as T
+
+import msgspec
+from msgspec import Struct
+
+from ._wordchars import WORD_CHARS
+from .cache import get_cache
+from .utils import html_text, iter_words
+
+if T.TYPE_CHECKING:
+    import collections.abc as C
+
+    from .models import Chapter, Work
+
+# How much a match in each part of a work counts for, relative to one in the chapter text.
+TITLE_WEIGHT = 10
+AUTHOR_WEIGHT = 5
+TAG_WEIGHT = 3
+SUMMARY_WEIGHT = 2
+CHAPTER_TEXT_WEIGHT = 1
+
+# Terms are sharded by this many leading characters, so a query only downloads the shards for its own terms.
+SHARD_PREFIX_LENGTH = 2
+
+# WORD_CHARS counts punctuation within words, so "Holmes," is one word; search terms leave it off the ends.
+TERM_PUNCTUATION = "',.;-\u00ad\u2010\u2011"
+
+
+def search_terms(text: str) -> C.Iterator[str]:
+    """Yield the search terms in some plain text. static/search.js splits up queries the same way."""
+    for word in iter_words(text):
+        if term := word.lower().strip(TERM_PUNCTUATION):
+            yield term
+
+
+def shard_name(term: str):
+    return term[:SHARD_PREFIX_LENGTH].encode("utf-8").hex()
+
+
+def chapter_terms(chapter: Chapter) -> dict[str, int]:
+    disk_cache = get_cache("search")
+    if disk_cache is None:
+        return collections.Counter(search_terms(html_text(chapter.peek_content())))
+    key = chapter.file_cache_key()
+    if (cached := disk_cache.get(key)) is not None:
+        return msgspec.msgpack.decode(cached, type=dict[str, int])
+    terms = collections.Counter(search_terms(html_text(chapter.peek_content())))
+    disk_cache.set(key, msgspec.msgpack.encode(terms))
+    return terms
+
+
+def work_terms(work: Work, include_chapter_text: bool) -> collections.Counter[str]:
+    terms: collections.Counter[str] = collections.Counter()
+
+    def add(text: str, weight: int):
+        for term in search_terms(text):
+            terms[term] += weight
+
+    add(work.title, TITLE_WEIGHT)
+    add(work.author, AUTHOR_WEIGHT)
+    for tag in itertools.chain(work.fandoms, work.relationships, work.characters, work.additional_tags):
+        add(tag.name, TAG_WEIGHT)
+    if work.summary:
+        add(html_text(work.summary), SUMMARY_WEIGHT)
+    if include_chapter_text:
+        for chapter in work.chapters:
+            for term, count in chapter_terms(chapter).items():
+                terms[term] += count * CHAPTER_TEXT_WEIGHT
+    return terms
+
+
+class SearchDocument(Struct, array_like=True):
+    url: str
+    title: str
+    author: str
+    words: int
+
+
+class SearchIndex:
+    """An inverted index of the site's works, written out as one file listing the works and a file for each shard of
+    terms. Each term maps to a flat list of (work number, weight) pairs."""
+
+    def __init__(self, documents: list[SearchDocument], shards: dict[str, dict[str, list[int]]]):
+        self.documents = documents
+        self.shards = shards
+
+    @classmethod
+    def build(cls, works: C.Sequence[Work], urls: C.Sequence[str], include_chapter_text: bool):
+        documents = []
+        postings: dict[str, list[int]] = {}
+        for doc_id, (work, url) in enumerate(zip(works, urls, strict=True)):
+            documents.append(SearchDocument(url=url, title=work.title, author=work.author, words=work.wordcount))
+            for term, weight in work_terms(work, include_chapter_text).items():
+                postings.setdefault(term, []).extend((doc_id, weight))
+        shards: dict[str, dict[str, list[int]]] = {}
+        for term in sorted(postings):
+            shards.setdefault(shard_name(term), {})[term] = postings[term]
+        return cls(documents, shards)
+
+    def documents_json(self) -> bytes:
+        # The browser tokenizes queries with the very same pattern, so it is shipped along with the documents.
+        return msgspec.json.encode({"pattern": WORD_CHARS.pattern, "documents": self.documents})
+
+    def shard_json(self, shard: str) -> bytes:
+        return msgspec.json.encode(self.shards[shard])
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import collections
+import hashlib
+import mimetypes
+import typing as T
+
+from werkzeug.exceptions import HTTPException, NotFound
+from werkzeug.serving import run_simple
+from werkzeug.wrappers import Request, Response
+
+if T.TYPE_CHECKING:
+    import pathlib
+
+    from _typeshed.wsgi import StartResponse, WSGIEnvironment
+
+    from .render import RenderableArchive
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class RenderedPage(T.NamedTuple):
+    body: bytes
+    mimetype: str
+    etag: str
+
+
+class PageCache:
+    """A least-recently-used cache of rendered pages, bounded by their total size."""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._pages: collections.OrderedDict[str, RenderedPage] = collections.OrderedDict()
+
+    def get(self, url: str) -> T.Optional[RenderedPage]:
+        page = self._pages.get(url)
+        if page is not None:
+            self._pages.move_to_end(url)
+        return page
+
+    def put(self, url: str, page: RenderedPage):
+        if (old_page := self._pages.pop(url, None)) is not None:
+            self.total_bytes -= len(old_page.body)
+        if len(page.body) > self.max_bytes:
+            return
+        self._pages[url] = page
+        self.total_bytes += len(page.body)
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self._pages.popitem(last=False)
+            self.total_bytes -= len(evicted.body)
+
+
+class DevServer:
+    """A WSGI app which renders each page of the archive when it is first requested."""
+
+    def __init__(self, archive: RenderableArchive, cache_bytes: int = DEFAULT_CACHE_BYTES):
+        self.archive = archive
+        self.pages = PageCache(cache_bytes)
+
+    def render_page(self, url: str) -> RenderedPage:
+        if (page := self.pages.get(url)) is not None:
+            return page
+        router = self.archive.router(url)
+        if router.is_binary:
+            body = self.archive.binary_data(router.endpoint, router.args)
+            mimetype = mimetypes.guess_type(url)[0] or "application/octet-stream"
+        else:
+            body = self.archive.render_layout(router).encode("utf-8")
+            mimetype = "text/html"
+        page = RenderedPage(body=body, mimetype=mimetype, etag=hashlib.blake2b(body, digest_size=16).hexdigest())
+        self.pages.put(url, page)
+        return page
+
+    def dispatch(self, request: Request) -> Response:
+        adapter = self.archive.url_map.bind_to_environ(request.environ)
+        try:
+            # This catches unknown URLs, and redirects directory URLs that are missing their trailing slash.
+            adapter.match()
+        except HTTPException as exc:
+            return T.cast(Response, exc.get_response(request.environ))
+        try:
+            page = self.render_page(request.path)
+        except KeyError:
+            return T.cast(Response, NotFound().get_response(request.environ))
+        response = Response(page.body, mimetype=page.mimetype)
+        response.set_etag(page.etag)
+        return response.make_conditional(request)
+
+    def __call__(self, environ: WSGIEnvironment, start_response: StartResponse):
+        request = Request(environ)
+        return self.dispatch(request)(environ, start_response)
+
+
+def serve(archive: RenderableArchive, host: str, port: int, watch: T.Sequence[pathlib.Path] = ()):
+    """Serve the archive, restarting whenever any of the watched files change."""
+    run_simple(host, port, DevServer(archive), use_reloader=bool(watch), extra_files=[str(path) for path in watch])
@@ -0,0 +1,101 @@
+// Runs work searches against the index that `ao3mimic render` writes into the search directory.
+// Query terms are split up and trimmed exactly as ao3mimic/search.py does when building the index.
+
+(function () {
+    "use strict";
+
+    const QUERY_PARAM = "work_search[query]";
+    const SHARD_PREFIX_LENGTH = 2;
+    const TERM_PUNCTUATION = /^[',.;\-\u00AD\u2010\u2011]+|[',.;\-\u00AD\u2010\u2011]+$/g;
+
+    const shards = new Map();
+
+    function searchTerms(query, pattern) {
+        const terms = new Set();
+        for (const word of query.match(new RegExp(pattern, "g")) || []) {
+            const term = word.toLowerCase().replace(TERM_PUNCTUATION, "");
+            if (term) terms.add(term);
+        }
+        return [...terms];
+    }
+
+    function shardName(term) {
+        const prefix = Array.from(term).slice(0, SHARD_PREFIX_LENGTH).join("");
+        return Array.from(new TextEncoder().encode(prefix), (b) => b.toString(16).padStart(2, "0")).join("");
+    }
+
+    async function fetchJSON(url) {
+        const response = await fetch(url);
+        if (!response.ok) return null;
+        return response.json();
+    }
+
+    function loadShard(name) {
+        if (!shards.has(name)) shards.set(name, fetchJSON(`terms/${name}.json`));
+        return shards.get(name);
+    }
+
+    async function postings(term) {
+        const shard = await loadShard(shardName(term));
+        return (shard && shard[term]) || [];
+    }
+
+    // Every term has to match; works score by the weight of each match, with rarer terms counting for more.
+    async function search(terms, documentCount) {
+        const lists = await Promise.all(terms.map(postings));
+        let scores = null;
+        for (const list of lists) {
+            const idf = Math.log(1 + documentCount / Math.max(1, list.length / 2));
+            const next = new Map();
+            for (let i = 0; i < list.length; i += 2) {
+                const [doc, weight] = [list[i], list[i + 1]];
+                if (scores === null || scores.has(doc)) next.set(doc, (scores === null ? 0 : scores.get(doc)) + weight * idf);
+            }
+            scores = next;
+        }
+        return [...(scores || new Map()).entries()].sort((a, b) => b[1] - a[1] || a[0] - b[0]).map(([doc]) => doc);
+    }
+
+    function element(tag, className, ...children) {
+        const el = document.createElement(tag);
+        if (className) el.className = className;
+        el.append(...children);
+        return el;
+    }
+
+    function blurb([url, title, author, words]) {
+        const link = element("a", null, title);
+        link.href = url;
+        return element(
+            "li",
+            "work blurb group",
+            element("div", "header module", element("h4", "heading", link, ` by ${author}`)),
+            element("dl", "stats", element("dt", "words", "Words:"), element("dd", "words", words.toLocaleString("en-US"))),
+        );
+    }
+
+    async function main() {
+        const status = document.getElementById("search-status");
+        const results = document.getElementById("search-results");
+        const query = new URLSearchParams(window.location.search).get(QUERY_PARAM) || "";
+        const input = document.getElementById("site_search");
+        if (input) input.value = query;
+
+        const index = await fetchJSON("documents.json");
+        const terms = searchTerms(query, index.pattern);
+        if (terms.length === 0) {
+            status.textContent = "Enter some words to search for.";
+            return;
+        }
+        const found = await search(terms, index.documents.length);
+        status.textContent = `${found.length} ${found.length === 1 ? "Work" : "Works"} Found`;
+        results.replaceChildren(...found.map((doc) => blurb(index.documents[doc])));
+    }
+
+    document.addEventListener("DOMContentLoaded", () => {
+        main().catch((error) => {
+            document.getElementById("search-status").textContent = "Sorry, the search index could not be loaded.";
+            console.error(error);
+        });
+    });
+})();
@@ -1,37 +1,94 @@
 from __future__ import annotations
 
-import logging
+import collections
+import datetime
+import functools
+import hashlib
 import math
 import posixpath
+import re
 import typing as T
 
-import bs4
-import cssutils
-import httpx
-import hyperlink
 import markupsafe
 import more_itertools
+import msgspec
 
 try:
     import tomllib
 except ImportError:
-    import tomli as tomllib  # type: ignore  # noqa: F401
+    import tomli as tomllib  # type: ignore
 
+from . import __version__ as code_version
 from ._wordchars import WORD_CHARS
+from .cache import cache_key, get_cache
+from .profiling import timed_function
 
 if T.TYPE_CHECKING:
     import collections.abc as C
+    import pathlib
 
+    import cssutils
     import htpy
+    import httpx
 
+    from .sanitize import ProcessedHtml
 
+# The HTML, CSS and HTTP libraries are slow to import, so they are imported by the functions which use them, and only
+# commands which need them pay for them.
+
+
+class _TextCollector:
+    """lxml parser target which keeps only the character data, like BeautifulSoup's get_text(), without building a tree."""
+
+    def __init__(self):
+        self.parts: list[str] = []
+
+    def data(self, data: str):
+        self.parts.append(data)
+
+    def close(self):
+        return "".join(self.parts)
+
+
+def html_text(html: str) -> str:
+    import lxml.etree
+
+    parser = lxml.etree.HTMLParser(target=_TextCollector(), huge_tree=True)
+    parser.feed(html)
+    return parser.close()
+
+
+@timed_function("wordcount")
 def count_html_text(html: str) -> int:
-    soup = bs4.BeautifulSoup(html, "html5lib")
-    return count_plain_text(soup.get_text())
+    """Count the words in some HTML's text. libxml2 and html5lib can disagree about what the text of unusual markup is,
+    so this takes html5lib's view, as sanitizing does, and uses libxml2 only where the two are known to agree."""
+    from .sanitize import count_words
+
+    if not html:
+        return 0
+    return count_words(html)
+
+
+# WORD_CHARS alternates one large character class with a run of JavaScript-style surrogate pairs, which cannot occur in
+# ordinary Python text. Matching runs of the large class directly finds exactly the same words much more quickly.
+_WORD_CLASS = WORD_CHARS.pattern[len("(?:[") : WORD_CHARS.pattern.index("]|")]
+assert WORD_CHARS.pattern.endswith(r"|[\u00AD\u2010\u2011]|\u002D(?!\u002D))+")
+_WORD_RUNS = re.compile(rf"(?:[{_WORD_CLASS}\u00AD\u2010\u2011]+|-(?!-))+")
+_SURROGATES = re.compile(r"[\ud800-\udfff]")
+
+
+def _word_pattern(text: str):
+    return WORD_CHARS if _SURROGATES.search(text) else _WORD_RUNS
 
 
 def count_plain_text(text: str) -> int:
-    return more_itertools.ilen(WORD_CHARS.finditer(text))
+    return more_itertools.ilen(_word_pattern(text).finditer(text))
+
+
+def iter_words(text: str) -> C.Iterator[str]:
+    """Yield the words of some plain text one at a time, as count_plain_text counts them."""
+    for match in _word_pattern(text).finditer(text):
+        yield match.group()
 
 
 def thousands(num):
@@ -39,29 +96,94 @@ def thousands(num):
 
 
 TAG_URL_TEMPLATE = "https://archiveofourown.org/tags/{}"
+TAG_CHECK_CONCURRENCY = 8
+TAG_CACHE_TTL = datetime.timedelta(days=7)
+
+
+def _as_linked_tag(tag: tuple[str, str] | str, is_ship=False) -> tuple[str, str]:
+    if isinstance(tag, tuple):
+        return tag
+    tag_path = tag.replace(" & ", " *a* ").replace("&", " *a* ").replace("/", "*s*") if is_ship else tag
+    return (tag, tag_path)
+
 
-timeout = httpx.Timeout(5.0, read=15.0)
-client = httpx.Client(timeout=timeout)
+def tag_check_url(tag: tuple[str, str] | str, is_ship=False) -> T.Optional[str]:
+    """The AO3 URL which would have to exist for this tag to be linked, or None if the tag already links elsewhere."""
+    import httpx
 
+    tag = _as_linked_tag(tag, is_ship=is_ship)
+    if not httpx.URL(tag[1]).is_relative_url:
+        return None
+    return str(httpx.URL(TAG_URL_TEMPLATE.format(tag[1])))
 
-def resolve_tag(tag: tuple[str, str] | str, is_ship=False, check_existence=False) -> tuple[str, str] | str:
-    if isinstance(tag, str):
-        if not check_existence:
-            # Since we can't check against AO3, better to leave it as-is.
-            return tag
-        tag_text = tag
-        tag_path = tag_text.replace(" & ", " *a* ").replace("&", " *a* ").replace("/", "*s*") if is_ship else tag_text
-        tag = (tag_text, tag_path)
+
+def resolve_tag(tag: tuple[str, str] | str, is_ship=False, tag_exists: T.Optional[C.Mapping[str, bool]] = None) -> tuple[str, str] | str:
+    """Turn tag paths into full AO3 URLs. If tag_exists (from check_tag_urls) is given, bare tags are linked and tags
+    which don't exist on AO3 are left bare."""
+    if isinstance(tag, str) and tag_exists is None:
+        # Since we can't check against AO3, better to leave it as-is.
+        return tag
+    import httpx
+
+    tag = _as_linked_tag(tag, is_ship=is_ship)
     tag_url = httpx.URL(tag[1])
     if tag_url.is_relative_url:
         tag_url = httpx.URL(TAG_URL_TEMPLATE.format(tag[1]))
-        if check_existence:
-            r = client.head(tag_url)
-            if r.status_code != httpx.codes.OK:
-                return tag[0]
+        if tag_exists is not None and not tag_exists[str(tag_url)]:
+            return tag[0]
     return (tag[0], str(tag_url))
 
 
+class _TagCheck(msgspec.Struct):
+    exists: bool
+    checked: datetime.datetime
+
+
+async def check_tag_urls(
+    urls: C.Iterable[str], concurrency=TAG_CHECK_CONCURRENCY, transport: T.Optional[httpx.AsyncBaseTransport] = None
+) -> dict[str, bool]:
+    """Check which AO3 tag URLs exist, several at a time. Results are kept in the tag cache for TAG_CACHE_TTL."""
+    import asyncio
+
+    import httpx
+
+    tag_cache = get_cache("tags")
+    now = datetime.datetime.now(datetime.UTC)
+    results: dict[str, bool] = {}
+    to_check = []
+    for url in sorted(set(urls)):
+        if tag_cache is not None and (cached := tag_cache.get(cache_key(url))) is not None:
+            tag_check = msgspec.json.decode(cached, type=_TagCheck)
+            if now - tag_check.checked < TAG_CACHE_TTL:
+                results[url] = tag_check.exists
+                continue
+        to_check.append(url)
+
+    if not to_check:
+        return results
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timeout = httpx.Timeout(5.0, read=15.0)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits, transport=transport) as client:
+
+        async def check(url: str):
+            async with semaphore:
+                r = await client.head(url)
+            exists = r.status_code == httpx.codes.OK
+            if tag_cache is not None:
+                tag_cache.set(cache_key(url), msgspec.json.encode(_TagCheck(exists=exists, checked=now)))
+            return url, exists
+
+        results.update(await asyncio.gather(*(check(url) for url in to_check)))
+    return results
+
+
+def url_directory(url: str):
+    """The directory part of a URL path, with its trailing slash."""
+    return url[: url.rindex("/") + 1]
+
+
 def make_relative_url(from_url: str, to_url: str):
     assert from_url.startswith("/")
     assert to_url.startswith("/")
@@ -75,6 +197,21 @@ def make_relative_url(from_url: str, to_url: str):
     return relpath
 
 
+def page_count(item_count: int, page_size: int):
+    """How many pages a listing of this many items takes up; even an empty listing has a page."""
+    return max(1, math.ceil(item_count / page_size))
+
+
+def page_items[I](items: C.Sequence[I], page: int, page_size: int) -> C.Sequence[I]:
+    return items[(page - 1) * page_size : page * page_size]
+
+
+@timed_function("toml")
+def load_toml(toml_path: pathlib.Path) -> dict[str, T.Any]:
+    with toml_path.open("rb") as toml_file:
+        return tomllib.load(toml_file)
+
+
 def format_chapter_number(chapter_number: int, total_chapters: int):
     template_digits = math.floor(math.log10(total_chapters)) + 1
     return str(chapter_number).zfill(template_digits)
@@ -84,6 +221,11 @@ def comma_separated(values: C.Iterable[htpy.Element]) -> C.Iterator[htpy.Node]:
     return more_itertools.intersperse(", ", values)
 
 
+def file_digest(path: pathlib.Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "blake2b").hexdigest()
+
+
 def urlpath_to_filepath(path: str):
     assert path.startswith("/")
     if path.endswith("/"):
@@ -96,10 +238,18 @@ def _css_null_fetcher(_):
     return None, None
 
 
-CSS_PARSER = cssutils.CSSParser(fetcher=_css_null_fetcher, loglevel=logging.CRITICAL)
+@functools.cache
+def css_parser() -> cssutils.CSSParser:
+    import logging
+
+    import cssutils
+
+    return cssutils.CSSParser(fetcher=_css_null_fetcher, loglevel=logging.CRITICAL)
 
 
 def _site_urls(current_url: str, candidates: C.Iterable[str]):
+    import hyperlink
+
     current_url = hyperlink.parse(current_url)
     for url in candidates:
         url = hyperlink.parse(url)
@@ -108,27 +258,124 @@ def _site_urls(current_url: str, candidates: C.Iterable[str]):
         yield str(current_url.click(url))
 
 
+@timed_function("get_site_urls")
 def get_css_site_urls(some_css: str, css_url: str) -> set[str]:
-    sheet = CSS_PARSER.parseString(some_css, href=css_url)
+    import cssutils
+
+    sheet = css_parser().parseString(some_css, href=css_url)
     css_urls = set(cssutils.getUrls(sheet))
     return set(_site_urls(css_url, css_urls))
 
 
+class _UrlCollector:
+    """lxml parser target which keeps only the href and src attribute values, without building a tree."""
+
+    def __init__(self):
+        self.urls: set[str] = set()
+
+    def start(self, tag: str, attrib: T.Mapping[str, str]):
+        if (href := attrib.get("href")) is not None:
+            self.urls.add(href)
+        if (src := attrib.get("src")) is not None:
+            self.urls.add(src)
+
+    def close(self):
+        return self.urls
+
+
+@timed_function("get_site_urls")
 def get_site_urls(some_html: str, current_url: str) -> set[str]:
-    soup = bs4.BeautifulSoup(some_html, "html5lib")
-    hrefs = soup.find_all(href=True)
-    srcs = soup.find_all(src=True)
-    urls_in_page = set([tag["href"] for tag in hrefs] + [tag["src"] for tag in srcs])
-    return set(_site_urls(current_url, urls_in_page))
+    import lxml.etree
+
+    parser = lxml.etree.HTMLParser(target=_UrlCollector(), huge_tree=True)
+    parser.feed(some_html)
+    return set(_site_urls(current_url, parser.close()))
+
+
+# The same summary or chapter is shown on several pages, so clean_userstuff keeps what it has sanitized, up to this many
+# characters in all.
+SANITIZED_CACHE_CHARS = 64 * 1024 * 1024
+
+
+class _SanitizedCache:
+    """A least-recently-used cache of sanitized userstuff, by a digest of the raw HTML, bounded by its total length."""
+
+    def __init__(self, max_chars: int = SANITIZED_CACHE_CHARS):
+        self.max_chars = max_chars
+        self.total_chars = 0
+        self._cleaned: collections.OrderedDict[str, markupsafe.Markup] = collections.OrderedDict()
+
+    def get(self, key: str) -> T.Optional[markupsafe.Markup]:
+        cleaned = self._cleaned.get(key)
+        if cleaned is not None:
+            self._cleaned.move_to_end(key)
+        return cleaned
+
+    def put(self, key: str, cleaned: markupsafe.Markup):
+        self.forget(key)
+        if len(cleaned) > self.max_chars:
+            return
+        self._cleaned[key] = cleaned
+        self.total_chars += len(cleaned)
+        while self.total_chars > self.max_chars:
+            _, evicted = self._cleaned.popitem(last=False)
+            self.total_chars -= len(evicted)
+
+    def forget(self, key: str):
+        if (cleaned := self._cleaned.pop(key, None)) is not None:
+            self.total_chars -= len(cleaned)
+
+    def clear(self):
+        self._cleaned.clear()
+        self.total_chars = 0
+
+    def __len__(self):
+        return len(self._cleaned)
+
+
+_sanitized = _SanitizedCache()
 
 
+@timed_function("clean_userstuff")
 def clean_userstuff(some_html: str):
-    soup = bs4.BeautifulSoup(some_html, "html5lib")
-    soup.head.decompose()
-    for a_tag in soup.find_all("a", href=True):
-        url = hyperlink.parse(a_tag["href"])
-        if url.absolute:
-            a_tag["rel"] = "noreferrer"
-    soup.body.unwrap()
-    soup.html.unwrap()
-    return markupsafe.Markup(str(soup))
+    key = cache_key(some_html)
+    if (cleaned := _sanitized.get(key)) is not None:
+        return cleaned
+    cleaned = markupsafe.Markup(process_userstuff(some_html).cleaned)
+    _sanitized.put(key, cleaned)
+    return cleaned
+
+
+def count_userstuff(some_html: str) -> int:
+    """Count the words of some userstuff by sanitizing it, keeping the sanitized copy for clean_userstuff so that the
+    pages showing it need no second parse."""
+    processed = process_userstuff(some_html)
+    _sanitized.put(cache_key(some_html), markupsafe.Markup(processed.cleaned))
+    return processed.wordcount
+
+
+def userstuff_cache_key(some_html: str) -> str:
+    return cache_key(code_version, some_html)
+
+
+def process_userstuff(some_html: str) -> ProcessedHtml:
+    """Sanitize some userstuff and count its words, or find both in the build cache."""
+    from .sanitize import ProcessedHtml, process_html
+
+    disk_cache = get_cache("userstuff")
+    if disk_cache is None:
+        return process_html(some_html)
+    key = userstuff_cache_key(some_html)
+    if (cached := disk_cache.get(key)) is not None:
+        try:
+            return msgspec.msgpack.decode(cached, type=ProcessedHtml)
+        except msgspec.DecodeError:
+            pass
+    processed = process_html(some_html)
+    disk_cache.set(key, msgspec.msgpack.encode(processed))
+    return processed
+
+
+def forget_cleaned(some_html: str):
+    """Stop holding on to the sanitized copy of some HTML, which clean_userstuff keeps in case it is needed again."""
+    _sanitized.forget(cache_key(some_html))
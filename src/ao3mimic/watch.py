@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import pathlib
+import stat
+import time
+import traceback
+import typing as T
+
+from . import cache
+from .media import MediaMode
+from .models import Site
+from .render import SEARCH_DATA_ENDPOINTS, RenderableArchive
+
+if T.TYPE_CHECKING:
+    from .models import Chapter, Work
+
+POLL_INTERVAL = 0.2
+
+type FileStats = dict[pathlib.Path, tuple[int, int]]
+
+
+def stat_content(content: pathlib.Path) -> FileStats:
+    """Snapshot the mtime and size of every content file, leaving out the build cache and anything hidden."""
+    cache_root = cache.get_root()
+    stats = {}
+    for directory, dirnames, filenames in content.walk():
+        # hidden directories, such as .git, and the build cache aren't even looked inside
+        dirnames[:] = [
+            name
+            for name in dirnames
+            if not name.startswith(".") and (cache_root is None or not (directory / name).is_relative_to(cache_root))
+        ]
+        for name in filenames:
+            if name.startswith("."):
+                # editors' swap files and the like
+                continue
+            path = directory / name
+            try:
+                path_stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if stat.S_ISREG(path_stat.st_mode):
+                stats[path] = (path_stat.st_mtime_ns, path_stat.st_size)
+    return stats
+
+
+class Watcher:
+    """Keeps the site in memory and rebuilds just the pages affected by each change to the content directory."""
+
+    def __init__(
+        self,
+        content: pathlib.Path,
+        output_directory: pathlib.Path,
+        jobs: int = 1,
+        force: bool = False,
+        verify_links: bool = False,
+        precompress: T.Collection[str] = (),
+        fingerprint_assets: bool = False,
+        media_mode: MediaMode = MediaMode.COPY,
+        low_memory: bool = False,
+    ):
+        self.content = content.resolve()
+        self.output_directory = output_directory
+        self.jobs = jobs
+        self.force = force
+        self.verify_links = verify_links
+        self.precompress = precompress
+        self.fingerprint_assets = fingerprint_assets
+        self.media_mode = media_mode
+        self.low_memory = low_memory
+        self.archive = self._load_archive()
+
+    def _load_archive(self):
+        return RenderableArchive(Site.load_site(self.content), fingerprint_assets=self.fingerprint_assets, media_mode=self.media_mode)
+
+    @property
+    def site(self):
+        return self.archive.site
+
+    def _find_chapter(self, path: pathlib.Path) -> T.Optional[tuple[Work, Chapter]]:
+        for work in self.site.works:
+            for chapter in work.chapters:
+                if chapter.content_path.resolve() == path.resolve():
+                    return work, chapter
+        return None
+
+    def _find_binary_url(self, path: pathlib.Path) -> T.Optional[str]:
+        if self.site.settings.logo is not None and path == self.site.settings.logo.resolve():
+            return self.archive.absolute_url("site.logo")
+        for work in self.site.works:
+            work_path = T.cast(pathlib.Path, work.work_path)
+            if path.parent == work_path / "media":
+                return self.archive.absolute_url("work.media", slug=work.slug, filename=path.name)
+        return None
+
+    def _work_pages(self, work: Work):
+        return [url for url in self.archive.plan_work(work) if not self.archive.router(url).is_binary]
+
+    def _search_data(self) -> dict[str, bytes]:
+        """The search index files as they would be written now, by URL."""
+        search_data = {}
+        for url in self.archive.search_urls():
+            router = self.archive.router(url)
+            if router.endpoint in SEARCH_DATA_ENDPOINTS:
+                search_data[url] = self.archive.binary_data(router.endpoint, router.args)
+        return search_data
+
+    def affected_urls(self, changed: T.Collection[pathlib.Path]) -> T.Optional[set[str]]:
+        """Work out which URLs must be rendered again after these files changed, updating the site to match.
+
+        Returns None if the site's structure may have changed, in which case it has to be reloaded.
+        """
+        urls = set()
+        for path in changed:
+            if not path.exists():
+                return None
+            if (found := self._find_chapter(path)) is not None:
+                work, chapter = found
+                old_wordcount = work.wordcount
+                old_search_data = self._search_data() if self.site.settings.search_chapter_text else {}
+                self.site.reload_chapter(work, chapter)
+                urls.add(self.archive.chapter_url(work, chapter))
+                if not work.is_oneshot:
+                    urls.add(self.archive.absolute_url("work.all_chapters", slug=work.slug))
+                if self.site.settings.search_chapter_text:
+                    # the chapter's terms are in the search index, and may have moved to other shards
+                    self.archive.__dict__.pop("search_index", None)
+                    search_data = self._search_data()
+                    if search_data.keys() != old_search_data.keys():
+                        return None
+                    urls.update(url for url, data in search_data.items() if data != old_search_data[url])
+                if work.wordcount != old_wordcount:
+                    if self.archive.fragments is not None:
+                        self.archive.fragments.clear()
+                    # every page showing the word count: the work's own pages, each listing with its blurb, and the search index
+                    urls.update(self._work_pages(work))
+                    if not self.site.settings.single_work:
+                        self.archive.__dict__.pop("search_index", None)
+                        urls.update(self.archive.blurb_urls(work))
+                        urls.add(self.archive.absolute_url("search.documents"))
+            elif (url := self._find_binary_url(path)) is not None:
+                if url in self.archive.routes.assets.values():
+                    # a fingerprinted asset gets a new name, which every page links to
+                    return None
+                urls.add(url)
+            else:
+                # TOML files, stylesheets (which may refer to other files), and files coming or going
+                return None
+        return urls
+
+    def rebuild(self, changed: T.Collection[pathlib.Path]):
+        start = time.perf_counter()
+        urls = self.affected_urls(changed)
+        if urls is None:
+            self.archive = self._load_archive()
+            rendered = self.archive.render(self.output_directory, jobs=self.jobs, precompress=self.precompress, low_memory=self.low_memory)
+        else:
+            self.archive.rerender(urls, self.output_directory, precompress=self.precompress)
+            rendered = urls
+        print(f"Rebuilt {len(rendered)} pages in {time.perf_counter() - start:.2f}s")
+        self.report_broken_links()
+
+    def report_broken_links(self):
+        if not self.verify_links:
+            return
+        for page, target in self.archive.verify_links(self.output_directory, self.archive.plan()):
+            print(f"Broken link: {page} -> {target}")
+
+    def run(self):
+        stats = stat_content(self.content)
+        self.archive.render(
+            self.output_directory, jobs=self.jobs, force=self.force, precompress=self.precompress, low_memory=self.low_memory
+        )
+        self.report_broken_links()
+        print(f"Watching {self.content} for changes; press Ctrl-C to stop.")
+        while True:
+            time.sleep(POLL_INTERVAL)
+            new_stats = stat_content(self.content)
+            if new_stats == stats:
+                continue
+            changed = {path for path in stats.keys() | new_stats.keys() if stats.get(path) != new_stats.get(path)}
+            stats = new_stats
+            try:
+                self.rebuild(changed)
+            except Exception:
+                # most likely the file is still being edited; report it and wait for the next change
+                traceback.print_exc()
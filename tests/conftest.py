@@ -0,0 +1,17 @@
+import pathlib
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def fake_sass(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    """Put a stand-in for the sass command on the PATH, which compiles any stylesheet to "body {}". Each call adds an "x"
+    to the file it returns."""
+    calls = tmp_path / "sass-calls"
+    sass = tmp_path / "bin" / "sass"
+    sass.parent.mkdir()
+    sass.write_text(f"#!{sys.executable}\nwith open({str(calls)!r}, 'a') as f:\n    f.write('x')\nprint('body {{}}')\n")
+    sass.chmod(0o755)
+    monkeypatch.setenv("PATH", str(sass.parent))
+    return calls
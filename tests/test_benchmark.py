@@ -0,0 +1,57 @@
+import pathlib
+
+import pytest
+
+from ao3mimic import benchmark, cache
+from ao3mimic.benchmark import ArchiveShape, BenchmarkReport, BenchmarkResult
+from ao3mimic.exceptions import Ao3MimicException
+from ao3mimic.models import Site
+
+TINY = ArchiveShape(works=6, chapters=3, paragraphs=5, words_per_paragraph=30, tags=4, series=2)
+
+
+def test_generated_archive_has_the_requested_shape(tmp_path: pathlib.Path):
+    benchmark.generate_archive(tmp_path / "content", TINY)
+    site = Site.load_site(tmp_path / "content")
+    assert len(site.works) == 6
+    assert all(len(work.chapters) == 3 and len(work.additional_tags) == 4 for work in site.works)
+    assert all(work.wordcount > 0 for work in site.works)
+    assert [len(series.works) for series in site.series] == [2, 1]
+
+    # the same seed gives the same archive
+    benchmark.generate_archive(tmp_path / "again", TINY)
+    chapter = pathlib.Path("works", "work-00003", "chapter-002.html")
+    assert (tmp_path / "content" / chapter).read_text() == (tmp_path / "again" / chapter).read_text()
+
+
+def _report(**runs: float):
+    return BenchmarkReport(
+        version="0",
+        python="3",
+        shape=TINY,
+        results={name: BenchmarkResult(items=1, runs=[seconds, seconds * 2]) for name, seconds in runs.items()},
+    )
+
+
+def test_compare_finds_regressions():
+    baseline = _report(layout=1.0, render=2.0)
+    regressions = benchmark.compare(_report(layout=1.05, render=3.0, load_site=1.0), baseline)
+    assert [regression.name for regression in regressions] == ["render"]
+    assert regressions[0].ratio == 1.5
+    assert benchmark.compare(_report(layout=1.05, render=3.0), baseline, tolerance=0.6) == []
+
+    baseline = BenchmarkReport(version="0", python="3", shape=ArchiveShape(), results=baseline.results)
+    with pytest.raises(Ao3MimicException):
+        benchmark.compare(_report(layout=1.0), baseline)
+
+
+def test_run_benchmarks(tmp_path: pathlib.Path, fake_sass):
+    cache.configure(None)
+    benchmark.generate_archive(tmp_path / "content", TINY)
+    report = benchmark.run_benchmarks(tmp_path / "content", repeat=1, shape=TINY)
+    assert list(report.results) == ["load_site", "count_html_text", "clean_userstuff", "layout", "get_site_urls", "render"]
+    assert report.results["count_html_text"].items == 18
+    assert all(len(result.runs) == 1 for result in report.results.values())
+
+    report.save(tmp_path / "results.json")
+    assert BenchmarkReport.load(tmp_path / "results.json") == report
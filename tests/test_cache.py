@@ -0,0 +1,28 @@
+from ao3mimic.cache import DiskCache, cache_key
+
+
+def test_disk_cache_round_trip(tmp_path):
+    disk_cache = DiskCache(tmp_path / "example")
+    key = cache_key("some", b"parts")
+    assert disk_cache.get(key) is None
+    disk_cache.set(key, b"value")
+    assert disk_cache.get(key) == b"value"
+    disk_cache.set(key, b"replaced")
+    assert disk_cache.get(key) == b"replaced"
+
+
+def test_cache_key_separates_parts():
+    assert cache_key("ab", "c") != cache_key("a", "bc")
+    assert cache_key("ab", "c") == cache_key(b"ab", b"c")
+
+
+def test_disk_cache_prune_keeps_only_given_keys(tmp_path):
+    disk_cache = DiskCache(tmp_path / "example")
+    kept, dropped = cache_key("kept"), cache_key("dropped")
+    disk_cache.set(kept, b"kept")
+    disk_cache.set(dropped, b"dropped")
+    disk_cache.prune({kept})
+    assert disk_cache.get(kept) == b"kept"
+    assert disk_cache.get(dropped) is None
+    # pruning a cache that was never written to does nothing
+    DiskCache(tmp_path / "missing").prune(set())
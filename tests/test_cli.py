@@ -0,0 +1,50 @@
+import subprocess
+import sys
+
+import pytest
+
+# Starting the command line (for --help, say) should take no longer than this, in microseconds. It is generous, to allow
+# for slow machines; the heavy modules below are what would really blow it.
+IMPORT_TIME_BUDGET = 300_000
+
+HEAVY_MODULES = ["bs4", "html5lib", "cssutils", "httpx", "hyperlink", "werkzeug", "htpy", "lxml", "asyncio"]
+
+
+def _import_times(module: str) -> dict[str, int]:
+    """Import a module in a fresh interpreter, returning the cumulative import time of each module it loaded."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_import_time_budget():
+    times = _import_times("ao3mimic.cli")
+    assert [module for module in HEAVY_MODULES if module in times] == []
+    assert "cattrs" not in times
+    # nor the parts of ao3mimic which only some commands need
+    assert [
+        module for module in ["ao3mimic.utils", "ao3mimic.benchmark", "ao3mimic.compress", "ao3mimic.profiling"] if module in times
+    ] == []
+    assert times["ao3mimic.cli"] < IMPORT_TIME_BUDGET
+
+
+@pytest.mark.parametrize("module", ["ao3mimic.models", "ao3mimic.benchmark"])
+def test_loading_content_imports_no_heavy_modules(module: str):
+    # analyze and generate-archive only need these
+    times = _import_times(module)
+    assert [name for name in HEAVY_MODULES if name in times] == []
+
+
+def test_watch_rejects_profile(tmp_path, monkeypatch, capsys):
+    from ao3mimic import cli
+
+    monkeypatch.setattr(sys, "argv", ["ao3mimic", "render", "--watch", "--profile", str(tmp_path / "report.json"), "content", "dest"])
+    with pytest.raises(SystemExit) as excinfo:
+        cli.main()
+    assert excinfo.value.code == 2
+    assert "--profile can't be used with --watch" in capsys.readouterr().err
@@ -0,0 +1,69 @@
+import gzip
+import pathlib
+
+import pytest
+
+from ao3mimic import cache, compress
+from ao3mimic.manifest import BuildManifest
+from ao3mimic.models import Site
+from ao3mimic.render import RenderableArchive
+
+SAMPLE_CONTENT = pathlib.Path(__file__).parent.parent / "sample-content"
+
+TEXT = b"<p>All work and no play makes Jack a dull boy.</p>\n" * 100
+
+
+def test_compress_file_round_trip(tmp_path: pathlib.Path):
+    page = tmp_path / "page.html"
+    page.write_bytes(TEXT)
+    digest = compress.compress_file(page, ["gzip"], None)
+    assert digest is not None
+    assert gzip.decompress((tmp_path / "page.html.gz").read_bytes()) == TEXT
+    assert not (tmp_path / "page.html.br").exists()
+
+
+def test_compress_file_skips_unchanged_content(tmp_path: pathlib.Path):
+    page = tmp_path / "page.html"
+    page.write_bytes(TEXT)
+    digest = compress.compress_file(page, ["gzip"], None)
+    (tmp_path / "page.html.gz").write_bytes(b"left alone")
+    assert compress.compress_file(page, ["gzip"], digest) == digest
+    assert (tmp_path / "page.html.gz").read_bytes() == b"left alone"
+
+    page.write_bytes(TEXT + b"<p>Jack</p>")
+    assert compress.compress_file(page, ["gzip"], digest) != digest
+    assert gzip.decompress((tmp_path / "page.html.gz").read_bytes()) == TEXT + b"<p>Jack</p>"
+
+
+def test_compress_file_skips_small_files(tmp_path: pathlib.Path):
+    page = tmp_path / "page.html"
+    page.write_bytes(TEXT)
+    compress.compress_file(page, ["gzip"], None)
+    page.write_bytes(b"<p>Short.</p>")
+    assert compress.compress_file(page, ["gzip"], None) is None
+    assert not (tmp_path / "page.html.gz").exists()
+
+
+def test_brotli():
+    brotli = pytest.importorskip("brotli")
+    assert brotli.decompress(compress.compress(TEXT, "brotli")) == TEXT
+
+
+def test_render_precompresses_text_files(tmp_path: pathlib.Path, fake_sass):
+    cache.configure(None)
+    output = tmp_path / "output"
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT))
+    archive.render(output, precompress=["gzip"])
+    assert (output / "works" / "dracula" / "work.html.gz").is_file()
+    assert (output / "static" / "_hyperscript-0.9.13.js.gz").is_file()
+    assert not (output / "static" / "logo.png.gz").exists()
+    manifest = BuildManifest.load(output)
+    assert manifest is not None
+    assert "/works/dracula/work.html" in manifest.compressed
+
+    # going without compression afterward must not leave stale copies to be served
+    archive.render(output)
+    assert not list(output.rglob("*.gz"))
+    manifest = BuildManifest.load(output)
+    assert manifest is not None
+    assert manifest.compressed == {}
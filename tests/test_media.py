@@ -0,0 +1,69 @@
+import pathlib
+
+import pytest
+
+from ao3mimic.manifest import InputFingerprints
+from ao3mimic.media import MediaMode, MediaPublisher
+from ao3mimic.models import Site
+
+SAMPLE_CONTENT = pathlib.Path(__file__).parent.parent / "sample-content"
+
+
+@pytest.fixture
+def sources(tmp_path: pathlib.Path):
+    source_dir = tmp_path / "content"
+    source_dir.mkdir()
+    (tmp_path / "output").mkdir()
+    (source_dir / "a.png").write_bytes(b"picture" * 100)
+    (source_dir / "b.png").write_bytes(b"picture" * 100)
+    (source_dir / "c.png").write_bytes(b"another picture")
+    return source_dir
+
+
+def test_copies_of_identical_files_are_shared(sources: pathlib.Path, tmp_path: pathlib.Path):
+    output = tmp_path / "output"
+    publisher = MediaPublisher(MediaMode.COPY)
+    for name in ["a.png", "b.png", "c.png"]:
+        publisher.publish(sources / name, output / name)
+    assert (output / "a.png").read_bytes() == (output / "b.png").read_bytes() == b"picture" * 100
+    assert (output / "a.png").stat().st_ino == (output / "b.png").stat().st_ino
+    assert (output / "a.png").stat().st_ino != (sources / "a.png").stat().st_ino
+    assert (output / "c.png").stat().st_ino != (output / "a.png").stat().st_ino
+
+    # once a.png has been replaced, it must not be shared any longer
+    (sources / "a.png").write_bytes(b"new picture")
+    publisher.publish(sources / "a.png", output / "a.png")
+    publisher.publish(sources / "b.png", output / "b.png")
+    assert (output / "a.png").read_bytes() == b"new picture"
+    assert (output / "b.png").read_bytes() == b"picture" * 100
+
+
+def test_hardlinks_are_never_written_through(sources: pathlib.Path, tmp_path: pathlib.Path):
+    output = tmp_path / "output"
+    publisher = MediaPublisher(MediaMode.HARDLINK)
+    publisher.publish(sources / "a.png", output / "logo.png")
+    assert (output / "logo.png").stat().st_ino == (sources / "a.png").stat().st_ino
+    publisher.publish(sources / "c.png", output / "logo.png")
+    assert (output / "logo.png").read_bytes() == b"another picture"
+    assert (sources / "a.png").read_bytes() == b"picture" * 100
+
+
+def test_symlinks_and_reflinks(sources: pathlib.Path, tmp_path: pathlib.Path):
+    output = tmp_path / "output"
+    MediaPublisher(MediaMode.SYMLINK).publish(sources / "a.png", output / "a.png")
+    assert (output / "a.png").readlink() == (sources / "a.png").resolve()
+    # most filesystems can't do reflinks, in which case the file is copied
+    MediaPublisher(MediaMode.REFLINK).publish(sources / "c.png", output / "c.png")
+    assert not (output / "c.png").is_symlink()
+    assert (output / "c.png").read_bytes() == b"another picture"
+
+
+def test_media_mode_is_part_of_fingerprint():
+    site = Site.load_site(SAMPLE_CONTENT)
+    args = {"slug": "the-adventure-of-the-dancing-men", "filename": "e-letter.svg"}
+    copied = InputFingerprints(site).fingerprint("work.media", args)
+    linked = InputFingerprints(site, media_mode=MediaMode.HARDLINK).fingerprint("work.media", args)
+    assert copied != linked
+    assert InputFingerprints(site).fingerprint("static_file", {"filename": "search.js"}) == InputFingerprints(
+        site, media_mode=MediaMode.HARDLINK
+    ).fingerprint("static_file", {"filename": "search.js"})
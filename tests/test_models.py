@@ -0,0 +1,219 @@
+import pathlib
+import pickle
+import shutil
+
+import pytest
+
+from ao3mimic import cache, models, utils
+from ao3mimic.exceptions import SiteStructureError
+from ao3mimic.models import Site
+
+SAMPLE_CONTENT = pathlib.Path(__file__).parent.parent / "sample-content"
+
+
+def test_site_survives_pickling():
+    site = Site.load_site(SAMPLE_CONTENT)
+    unpickled = pickle.loads(pickle.dumps(site))
+    assert [work.slug for work in unpickled.works] == [work.slug for work in site.works]
+    assert [work.work_path for work in unpickled.works] == [work.work_path for work in site.works]
+    assert unpickled.works[0].chapters[0].content == site.works[0].chapters[0].content
+    assert unpickled.work_in_series.keys() == site.work_in_series.keys()
+    # works shared between the site and its series must stay shared
+    for series in unpickled.series:
+        for work in series.works:
+            assert work is unpickled.get_work(work.slug)
+
+
+def test_chapter_wordcount_is_cached_on_disk(tmp_path, monkeypatch):
+    cache.configure(tmp_path / "cache")
+    try:
+        expected = Site.load_site(SAMPLE_CONTENT).get_work("nuth").wordcount
+        # a second load should not need to count anything
+        monkeypatch.setattr(models, "count_userstuff", None)
+        assert Site.load_site(SAMPLE_CONTENT).get_work("nuth").wordcount == expected
+    finally:
+        cache.configure(None)
+
+
+def test_prune_cache_drops_entries_for_edited_chapters(tmp_path):
+    content = tmp_path / "content"
+    shutil.copytree(SAMPLE_CONTENT, content)
+    cache.configure(tmp_path / "cache")
+    try:
+        site = Site.load_site(content)
+        chapter = site.get_work("a-scandal-in-bohemia").chapters[1]
+        old_keys = chapter.file_cache_key(), utils.userstuff_cache_key(chapter.content)
+        chapter.content_path.write_text(chapter.content + "<p>Some more words.</p>", encoding="utf-8")
+        site = Site.load_site(content)
+        chapter = site.get_work("a-scandal-in-bohemia").chapters[1]
+        new_keys = chapter.file_cache_key(), utils.userstuff_cache_key(chapter.content)
+        site.prune_cache()
+        for namespace, old_key, new_key in zip(("wordcount", "userstuff"), old_keys, new_keys, strict=True):
+            disk_cache = cache.get_cache(namespace)
+            assert disk_cache.get(old_key) is None
+            assert disk_cache.get(new_key) is not None
+    finally:
+        cache.configure(None)
+
+
+def test_chapter_navigation():
+    work = Site.load_site(SAMPLE_CONTENT).get_work("dracula")
+    first, second, last = work.chapters[0], work.chapters[1], work.chapters[-1]
+    assert work.previous_chapter(first) is None
+    assert work.next_chapter(first) is second
+    assert work.previous_chapter(second) is first
+    assert work.next_chapter(last) is None
+    assert [work.display_num_for_chapter(chapter) for chapter in work.chapters] == list(range(1, len(work.chapters) + 1))
+    other_work = Site.load_site(SAMPLE_CONTENT).get_work("a-scandal-in-bohemia")
+    with pytest.raises(ValueError):
+        work.next_chapter(other_work.chapters[0])
+    # an equal chapter of another copy of the work isn't one of this work's chapters either
+    copy = Site.load_site(SAMPLE_CONTENT).get_work("dracula")
+    assert copy.chapters[1] == second
+    with pytest.raises(ValueError):
+        work.next_chapter(copy.chapters[1])
+
+
+def test_series_wordcount_follows_reloaded_chapter(tmp_path):
+    content = tmp_path / "content"
+    shutil.copytree(SAMPLE_CONTENT, content)
+    cache.configure(None)
+    site = Site.load_site(content)
+    series = site.get_series("sherlock-holmes")
+    work = series.works[0]
+    old_wordcount = series.wordcount
+    assert old_wordcount == sum(series_work.wordcount for series_work in series.works)
+    chapter = work.chapters[0]
+    with chapter.content_path.open("a") as chapter_file:
+        chapter_file.write("<p>Two words.</p>")
+    # the totals are kept until the chapter is reloaded
+    assert series.wordcount == old_wordcount
+    old_content = chapter.content
+    utils.clean_userstuff(old_content)
+    site.reload_chapter(work, chapter)
+    # and so is the old content's sanitized copy
+    assert utils._sanitized.get(cache.cache_key(old_content)) is None
+    assert series.wordcount == old_wordcount + 2
+    assert series.ratings == tuple(dict.fromkeys(series_work.rating for series_work in series.works))
+
+
+def test_site_snapshot_reparses_only_changed_files(tmp_path, monkeypatch):
+    content = tmp_path / "content"
+    shutil.copytree(SAMPLE_CONTENT, content)
+    cache.configure(tmp_path / "cache")
+    try:
+        site = Site.load_site(content)
+        loaded = []
+        original_load = models.Work.load.__func__
+        monkeypatch.setattr(
+            models.Work, "load", classmethod(lambda cls, toml_path: loaded.append(toml_path.parent.name) or original_load(cls, toml_path))
+        )
+        monkeypatch.setattr(models.Series, "load", None)
+
+        reloaded = Site.load_site(content)
+        assert loaded == []
+        assert [work.slug for work in reloaded.works] == [work.slug for work in site.works]
+        for work in reloaded.works:
+            assert work == site.get_work(work.slug)
+            assert work.work_path == site.get_work(work.slug).work_path
+            assert work.wordcount == site.get_work(work.slug).wordcount
+        assert [series.works for series in reloaded.series] == [series.works for series in site.series]
+
+        with (content / "works" / "nuth" / "work.toml").open("a") as work_toml:
+            work_toml.write("\n")
+        with (content / "works" / "dracula" / "chapter-01.html").open("a") as chapter_file:
+            chapter_file.write("\n<p>Two words.</p>")
+        reloaded = Site.load_site(content)
+        assert loaded == ["nuth"]
+        assert reloaded.get_work("dracula").wordcount == site.get_work("dracula").wordcount + 2
+    finally:
+        cache.configure(None)
+
+
+def test_page_size_must_be_positive(tmp_path: pathlib.Path):
+    settings_path = tmp_path / "settings.toml"
+    settings_path.write_text('name = "Test"\npage_size = 0\n')
+    with pytest.raises(SiteStructureError):
+        models.Settings.load(settings_path)
+
+
+def test_tags_are_interned():
+    site = Site.load_site(SAMPLE_CONTENT)
+    tags = [tag for work in site.works for tag in (*work.fandoms, *work.relationships, *work.characters, *work.additional_tags)]
+    assert len(site.tags) < len(tags)
+    assert all(site.tags[tag.id] is tag for tag in tags)
+    # a tag's id depends only on the tag, not on the order the works were loaded in
+    holmes = models.Tag.parse(["Holmes", "https://example.com/Holmes"])
+    assert holmes.id == models.Tag("Holmes", "https://example.com/Holmes").id != models.Tag("Holmes").id
+    reloaded = Site.load_site(SAMPLE_CONTENT)
+    assert reloaded.tags is not site.tags
+    assert [tag.id for tag in reloaded.tags] == [tag.id for tag in site.tags]
+    assert [work.fandoms for work in reloaded.works] == [work.fandoms for work in site.works]
+    # a worker's copy of the site shares its tags among its works in the same way
+    unpickled = pickle.loads(pickle.dumps(site))
+    assert all(unpickled.tags[tag.id] is tag for work in unpickled.works for tag in work.characters)
+
+
+@pytest.mark.parametrize("declaration", ["Bare <Tag> & Co", ("Linked", "https://archiveofourown.org/tags/A%20&%20B")])
+def test_tag_anchor(declaration):
+    import htpy as h
+
+    tag = models.Tag.parse(declaration)
+    if isinstance(declaration, str):
+        expected = h.span(".tag")[declaration]
+    else:
+        expected = h.a(".tag", rel="noreferrer", href=declaration[1])[declaration[0]]
+    assert str(tag.anchor) == str(expected)
+
+
+def test_bad_tag_declaration():
+    with pytest.raises(ValueError):
+        models.Tag.parse(["name", "url", "extra"])
+
+
+def test_work_asdict_round_trips():
+    work = Site.load_site(SAMPLE_CONTENT).get_work("elfland")
+    assert work.wordcount > 0
+    work_dict = work.asdict()
+    assert "work_path" not in work_dict
+    assert all("content" not in chapter_dict for chapter_dict in work_dict["chapters"])
+    assert work_dict["characters"] == [tag.declaration for tag in work.characters]
+    reloaded = models.converter.structure({**work_dict, "slug": work.slug}, models.Work)
+    assert reloaded.characters == work.characters
+
+
+@pytest.mark.parametrize(
+    ("toml_file", "where", "field"),
+    [
+        ("works/dracula/work.toml", None, "_wordcount"),
+        ("works/dracula/work.toml", "chapters", "_content"),
+        ("works/dracula/work.toml", "chapters", "work_path"),
+        ("series/sherlock-holmes.toml", None, "_ratings"),
+    ],
+)
+def test_runtime_fields_cannot_be_declared(tmp_path, toml_file, where, field):
+    import tomli_w
+
+    content = tmp_path / "content"
+    shutil.copytree(SAMPLE_CONTENT, content)
+    declaration = utils.load_toml(content / toml_file)
+    target = declaration if where is None else declaration[where][0]
+    target[field] = "<p>one two three</p>" if field == "_content" else 5
+    (content / toml_file).write_text(tomli_w.dumps(declaration))
+    with pytest.raises(SiteStructureError, match=field):
+        Site.load_site(content)
+
+
+def test_pickled_chapter_leaves_its_content_behind():
+    chapter = Site.load_site(SAMPLE_CONTENT).get_work("dracula").chapters[0]
+    content = chapter.content
+    unpickled = pickle.loads(pickle.dumps(chapter))
+    assert unpickled._content is None
+    assert unpickled.wordcount == chapter.wordcount
+    assert unpickled.content == content
+
+
+def test_work_in_series_follows_series_order():
+    site = Site.load_site(SAMPLE_CONTENT)
+    for wises in site.work_in_series.values():
+        assert [wis.series.sort_key for wis in wises] == sorted(wis.series.sort_key for wis in wises)
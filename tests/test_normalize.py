@@ -0,0 +1,86 @@
+import asyncio
+import pathlib
+import shutil
+import typing as T
+
+import httpx
+
+from ao3mimic import cache, models
+from ao3mimic.models import Site, Work
+from ao3mimic.normalize import NormalizeArgs, check_work_tags, normalize, normalize_work
+from ao3mimic.utils import check_tag_urls, resolve_tag, tag_check_url
+
+SAMPLE_CONTENT = pathlib.Path(__file__).parent.parent / "sample-content"
+
+EXISTING_TAGS = frozenset(["Alveric", "Lirazel", "Alveric/Lirazel"])
+
+
+def fake_ao3(requested: list[str]):
+    def handler(request: httpx.Request):
+        requested.append(str(request.url))
+        assert request.method == "HEAD"
+        tag = request.url.path.removeprefix("/tags/").replace("*s*", "/")
+        return httpx.Response(200 if tag in EXISTING_TAGS else 404)
+
+    return httpx.MockTransport(handler)
+
+
+def test_tag_check_url():
+    assert tag_check_url("Alveric/Lirazel", is_ship=True) == "https://archiveofourown.org/tags/Alveric*s*Lirazel"
+    assert tag_check_url(("Alveric", "Alveric")) == "https://archiveofourown.org/tags/Alveric"
+    assert tag_check_url(("Fae", "https://en.wikipedia.org/wiki/Fairy")) is None
+
+
+def test_resolve_tag():
+    assert resolve_tag("Alveric") == "Alveric"
+    assert resolve_tag(("Alveric", "Alveric")) == ("Alveric", "https://archiveofourown.org/tags/Alveric")
+    tag_exists = {"https://archiveofourown.org/tags/Alveric": True, "https://archiveofourown.org/tags/Ziroonderel": False}
+    assert resolve_tag("Alveric", tag_exists=tag_exists) == ("Alveric", "https://archiveofourown.org/tags/Alveric")
+    assert resolve_tag("Ziroonderel", tag_exists=tag_exists) == "Ziroonderel"
+
+
+def test_check_tag_urls_uses_cache(tmp_path):
+    requested: list[str] = []
+    urls = ["https://archiveofourown.org/tags/Alveric", "https://archiveofourown.org/tags/Ziroonderel"]
+    cache.configure(tmp_path)
+    try:
+        expected = {urls[0]: True, urls[1]: False}
+        assert asyncio.run(check_tag_urls(urls + urls, transport=fake_ao3(requested))) == expected
+        assert sorted(requested) == urls
+        assert asyncio.run(check_tag_urls(urls, transport=fake_ao3(requested))) == expected
+        assert len(requested) == 2
+    finally:
+        cache.configure(None)
+
+
+def test_normalize_work_checks_tags():
+    work = Work.load(SAMPLE_CONTENT / "works" / "elfland" / "work.toml")
+    requested: list[str] = []
+    tag_exists = check_work_tags([work], transport=fake_ao3(requested))
+    normalize_work(work, tag_exists=tag_exists)
+    assert [tag.declaration for tag in work.relationships] == [("Alveric/Lirazel", "https://archiveofourown.org/tags/Alveric*s*Lirazel")]
+    # tags which already have full URLs aren't checked
+    characters = [tag.declaration for tag in work.characters]
+    assert ("Lirazel", "https://archiveofourown.org/tags/Lirazel%20(Elfland)") in characters
+    assert "Ziroonderel" in characters
+    assert sorted(requested) == [
+        "https://archiveofourown.org/tags/Alveric*s*Lirazel",
+        "https://archiveofourown.org/tags/Ziroonderel",
+    ]
+
+
+def test_normalize_all_loads_only_the_work_files(tmp_path, monkeypatch, capsys):
+    content = tmp_path / "content"
+    shutil.copytree(SAMPLE_CONTENT, content)
+    cache.configure(None)
+    expected = [str(T.cast(pathlib.Path, work.work_path) / "work.toml") for work in Site.load_site(content).works]
+    cache.configure(tmp_path / "cache")
+    try:
+        # no site, no snapshot and no word counts
+        monkeypatch.setattr(models, "SnapshotLoader", None)
+        monkeypatch.setattr(models, "count_userstuff", None)
+        normalize(NormalizeArgs(work=content, dry_run=True, skip_tag_check=True, all=True))
+    finally:
+        cache.configure(None)
+    printed = [line.removeprefix("# ") for line in capsys.readouterr().out.splitlines() if line.startswith("# ")]
+    assert printed == expected
@@ -0,0 +1,68 @@
+import json
+import pathlib
+
+import pytest
+
+from ao3mimic import cache, profiling
+from ao3mimic.models import Site
+from ao3mimic.render import RenderableArchive
+
+SAMPLE_CONTENT = pathlib.Path(__file__).parent.parent / "sample-content"
+
+
+@pytest.fixture
+def profile():
+    profile = profiling.start()
+    yield profile
+    profiling.stop()
+
+
+def test_percentile():
+    values = [float(n) for n in range(1, 101)]
+    assert profiling.percentile(values, 95) == 95.0
+    assert profiling.percentile(values, 100) == 100.0
+    assert profiling.percentile([3.0], 95) == 3.0
+
+
+def test_timed_does_nothing_without_a_profile():
+    assert profiling.get_profile() is None
+    with profiling.timed("layout"):
+        pass
+    assert profiling.stop() is None
+
+
+def test_merge_adds_up_timings(profile: profiling.BuildProfile):
+    profile.add_phase("layout", 1.0)
+    profile.add_url("/works/", "works.index", 1.0, 100)
+    worker = profiling.BuildProfile()
+    worker.add_phase("layout", 2.0)
+    worker.add_phase("write", 0.5)
+    worker.add_url("/works/dracula/", "work.index", 3.0, 200)
+    worker.add_url("/works/zenda/", "work.index", 1.0, 50)
+    profile.merge(worker.take())
+    assert worker.data.phases == {}
+
+    report = profile.report()
+    assert report.phases["layout"] == profiling.PhaseReport(count=2, seconds=3.0)
+    assert report.phases["write"] == profiling.PhaseReport(count=1, seconds=0.5)
+    assert report.endpoints["work.index"].count == 2
+    assert report.endpoints["work.index"].max_seconds == 3.0
+    assert report.endpoints["work.index"].bytes_written == 250
+    assert [url.url for url in report.slowest_urls] == ["/works/dracula/", "/works/zenda/", "/works/"]
+
+
+def test_render_with_profile(profile: profiling.BuildProfile, tmp_path: pathlib.Path, fake_sass):
+    cache.configure(None)
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT))
+    urls = archive.render(tmp_path / "output")
+
+    report = profile.report()
+    assert {"load", "plan", "render", "layout", "write", "sass", "clean_userstuff"} <= report.phases.keys()
+    assert sum(endpoint.count for endpoint in report.endpoints.values()) == len(urls)
+    assert report.endpoints["work.chapter"].bytes_written > 0
+    assert report.peak_memory_bytes > 0
+
+    report.save(tmp_path / "report.json")
+    saved = json.loads((tmp_path / "report.json").read_text())
+    assert saved["endpoints"]["archive.index"]["count"] == 1
+    assert "Slowest URLs:" in report.summary()
@@ -0,0 +1,349 @@
+import json
+import pathlib
+import re
+import shutil
+import tracemalloc
+
+import pytest
+
+from ao3mimic import cache
+from ao3mimic.exceptions import RenderError
+from ao3mimic.manifest import ASSET_MANIFEST_FILENAME, MANIFEST_FILENAME, BuildManifest, InputFingerprints
+from ao3mimic.models import Site
+from ao3mimic.render import RenderableArchive
+from ao3mimic.search import SearchIndex, shard_name
+from ao3mimic.utils import format_chapter_number, make_relative_url
+
+SAMPLE_CONTENT = pathlib.Path(__file__).parent.parent / "sample-content"
+
+
+def test_plan_covers_site_model():
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT))
+    urls = archive.plan()
+    assert urls == sorted(set(urls))
+    for expected in [
+        "/",
+        "/works/",
+        "/series/",
+        "/series/sherlock-holmes/",
+        "/works/dracula/",
+        "/works/dracula/nav.html",
+        "/works/dracula/work.html",
+        "/works/dracula/01.html",
+        "/works/dracula/27.html",
+        "/works/nuth/",
+        "/works/the-adventure-of-the-dancing-men/work.css",
+        "/works/the-adventure-of-the-dancing-men/media/e-letter.svg",
+        "/static/styles.css",
+        "/static/logo.png",
+        "/static/imageset.png",
+        "/static/_hyperscript-0.9.13.js",
+    ]:
+        assert expected in urls
+    # oneshots are rendered entirely on their index page
+    assert "/works/nuth/nav.html" not in urls
+    assert "/works/nuth/work.html" not in urls
+
+
+def test_plan_single_work():
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT / "works" / "dracula"))
+    urls = archive.plan()
+    assert "/" in urls
+    assert "/01.html" in urls
+    assert "/work.html" in urls
+    assert not any(url.startswith(("/works/", "/search/")) for url in urls)
+
+
+def _fingerprints(content: pathlib.Path):
+    archive = RenderableArchive(Site.load_site(content))
+    fingerprinter = InputFingerprints(archive.site)
+    fingerprints = {}
+    for url in archive.plan():
+        router = archive.router(url)
+        fingerprints[url] = fingerprinter.fingerprint(router.endpoint, router.args)
+    return fingerprints
+
+
+def test_fingerprints_follow_inputs(tmp_path):
+    content = tmp_path / "content"
+    shutil.copytree(SAMPLE_CONTENT, content)
+    before = _fingerprints(content)
+    assert _fingerprints(content) == before
+
+    with (content / "works" / "a-scandal-in-bohemia" / "part-2.html").open("a") as chapter_file:
+        chapter_file.write("<p>Some more words.</p>")
+    after = _fingerprints(content)
+    changed = {url for url in before if before[url] != after[url]}
+    # the search files are all generated from every work
+    search_data = {url for url in before if url.startswith("/search/") and url != "/search/"}
+    assert changed == search_data | {
+        "/",
+        "/works/",
+        "/series/",
+        "/series/sherlock-holmes/",
+        "/works/a-scandal-in-bohemia/",
+        "/works/a-scandal-in-bohemia/nav.html",
+        "/works/a-scandal-in-bohemia/work.html",
+        "/works/a-scandal-in-bohemia/1.html",
+        "/works/a-scandal-in-bohemia/2.html",
+        "/works/a-scandal-in-bohemia/3.html",
+    }
+
+
+def test_listing_fingerprints_follow_the_works_they_show(tmp_path):
+    archive = _paginated_archive(tmp_path, page_size=3)
+    content = archive.site.base_path
+    before = _fingerprints(content)
+    with (content / "works" / "dracula" / "chapter-01.html").open("a") as chapter_file:
+        chapter_file.write("<p>Some more words.</p>")
+    after = _fingerprints(content)
+    changed = {url for url in before if before[url] != after[url]}
+    assert {"/", "/works/"} <= changed
+    assert not changed & {"/series/", "/works/page/2/", "/works/page/3/", "/works/page/4/"}
+
+
+def test_search_files_are_rewritten_only_when_they_change(tmp_path, monkeypatch, fake_sass):
+    content = tmp_path / "content"
+    shutil.copytree(SAMPLE_CONTENT, content)
+    with (content / "settings.toml").open("a") as settings_file:
+        settings_file.write("search_chapter_text = true\n")
+    cache.configure(None)
+    output = tmp_path / "output"
+    RenderableArchive(Site.load_site(content)).render(output)
+    stamps = {path: path.stat().st_mtime_ns for path in (output / "search").rglob("*.json")}
+
+    # nothing to do, so no need to build the search index
+    archive = RenderableArchive(Site.load_site(content))
+    with monkeypatch.context() as patch:
+        patch.setattr(SearchIndex, "build", None)
+        assert archive.render(output) == []
+
+    with (content / "works" / "a-scandal-in-bohemia" / "part-2.html").open("a") as chapter_file:
+        chapter_file.write("<p>Holmes, Holmes.</p>")
+    RenderableArchive(Site.load_site(content)).render(output)
+    rewritten = {path.relative_to(output).as_posix() for path, stamp in stamps.items() if path.stat().st_mtime_ns != stamp}
+    assert rewritten == {"search/documents.json", f"search/terms/{shard_name('holmes')}.json"}
+
+
+def test_build_manifest_round_trip(tmp_path):
+    assert BuildManifest.load(tmp_path) is None
+    BuildManifest(entries={"/": "abc"}).save(tmp_path)
+    assert BuildManifest.load(tmp_path) == BuildManifest(entries={"/": "abc"})
+
+
+def test_compiled_sass_is_cached(tmp_path, monkeypatch, fake_sass):
+    cache.configure(tmp_path / "cache")
+    try:
+        archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT))
+        assert archive.compile_sass() == b"body {}\n"
+        assert archive.compile_sass() == b"body {}\n"
+        assert fake_sass.read_text() == "x"
+        # a machine without sass can still use the cached stylesheet
+        monkeypatch.setenv("PATH", str(tmp_path / "nowhere"))
+        assert archive.compile_sass() == b"body {}\n"
+    finally:
+        cache.configure(None)
+
+
+def test_routes_match_werkzeug_and_relpath():
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT))
+    adapter = archive.url_map.bind("archive.example", "/")
+    work = archive.site.get_work("dracula")
+    for url in archive.plan():
+        router = archive.router(url)
+        assert (router.endpoint, router.args) == adapter.match(url)
+        for chapter in work.chapters:
+            chapter_number = format_chapter_number(chapter.num, len(work.chapters))
+            expected = make_relative_url(url, adapter.build("work.chapter", {"slug": work.slug, "chapter_number": chapter_number}))
+            assert router.chapter_path(work, chapter) == expected
+        assert router.series_detail(archive.site.get_series("sherlock-holmes")) == make_relative_url(url, "/series/sherlock-holmes/")
+
+
+def test_fragment_cache_matches_uncached_render():
+    site = Site.load_site(SAMPLE_CONTENT)
+    archive = RenderableArchive(site)
+    uncached = RenderableArchive(site)
+    uncached.fragments = None
+    for url in archive.plan():
+        router = archive.router(url)
+        if not router.is_binary:
+            assert archive.render_layout(router) == uncached.render_layout(uncached.router(url))
+
+
+def test_write_page_streams_long_works(tmp_path):
+    cache.configure(None)
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT))
+    router = archive.router("/works/dracula/work.html")
+    expected = archive.render_layout(router)
+    tracemalloc.start()
+    try:
+        archive.write_page(router, tmp_path / "work.html")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert (tmp_path / "work.html").read_text() == expected
+    # the page is never assembled in memory as a whole
+    assert peak < len(expected) / 2
+
+
+def _paginated_archive(tmp_path: pathlib.Path, page_size: int):
+    content = tmp_path / "content"
+    shutil.copytree(SAMPLE_CONTENT, content)
+    with (content / "settings.toml").open("a") as settings_file:
+        settings_file.write(f"page_size = {page_size}\n")
+    return RenderableArchive(Site.load_site(content))
+
+
+def test_paginated_indexes(tmp_path):
+    archive = _paginated_archive(tmp_path, page_size=3)
+    urls = archive.plan()
+    assert {"/works/", "/works/page/2/", "/works/page/3/", "/works/page/4/", "/series/sherlock-holmes/page/2/"} <= set(urls)
+    assert "/works/page/5/" not in urls
+    assert "/series/page/2/" not in urls
+
+    last_page = archive.render_layout(archive.router("/works/page/4/"))
+    assert last_page.count('class="work blurb group"') == 1
+    assert '<a rel="prev" href="../3/">' in last_page
+    assert '<li><a href="../..">1</a></li>' in last_page
+    assert '<li class="next" title="next"><span class="disabled">' in last_page
+    front_page = archive.render_layout(archive.router("/"))
+    assert front_page.count('class="work blurb group"') == 3
+    assert '<a rel="next" href="works/page/2/">' in front_page
+    with pytest.raises(KeyError):
+        archive.render_layout(archive.router("/works/page/5/"))
+    with pytest.raises(KeyError):
+        archive.router("/works/page/1/")
+
+
+def test_pagination_leaves_gaps(tmp_path):
+    archive = _paginated_archive(tmp_path, page_size=1)
+    page = archive.render_layout(archive.router("/works/page/6/"))
+    numbers = re.findall(r'<li>(?:<a href="[^"]*">|<span class="current">)(\d+)<', page)
+    assert numbers == ["1", "2", "4", "5", "6", "7", "8", "9", "10"]
+    assert page.count('<li class="gap">') == 1
+
+
+def test_blurb_urls(tmp_path):
+    archive = _paginated_archive(tmp_path, page_size=3)
+    site = archive.site
+    assert all(site.works[site.work_positions[work.slug]] is work for work in site.works)
+    assert all(site.series[site.series_positions[series.slug]] is series for series in site.series)
+    assert archive.blurb_urls(archive.site.get_work("dracula")) == {"/", "/works/"}
+    # fifth in the works index and the series, whose blurb is on the front page
+    assert archive.blurb_urls(archive.site.get_work("the-adventure-of-the-dancing-men")) == {
+        "/",
+        "/works/page/3/",
+        "/series/",
+        "/series/sherlock-holmes/page/2/",
+    }
+
+
+def test_fingerprinted_assets(tmp_path, fake_sass):
+    cache.configure(None)
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT), fingerprint_assets=True)
+    stylesheet = archive.absolute_url("archive.stylesheet")
+    assert re.fullmatch(r"/static/styles\.[0-9a-f]{8}\.css", stylesheet)
+    assert archive.router(stylesheet).endpoint == "archive.stylesheet"
+    work_css = archive.absolute_url("work.stylesheet", slug="the-adventure-of-the-dancing-men")
+    assert re.fullmatch(r"/works/the-adventure-of-the-dancing-men/work\.[0-9a-f]{8}\.css", work_css)
+    urls = archive.plan()
+    assert stylesheet in urls
+    assert "/static/styles.css" not in urls
+    # images referred to from the stylesheet keep their names
+    assert "/static/imageset.png" in urls
+
+    page = archive.render_layout(archive.router("/works/the-adventure-of-the-dancing-men/"))
+    assert f'href="../..{stylesheet}"' in page
+    assert f'href="{work_css.rsplit("/", 1)[1]}"' in page
+
+    output = tmp_path / "output"
+    archive.render(output)
+    assert (output / stylesheet.removeprefix("/")).read_bytes() == b"body {}\n"
+    asset_manifest = json.loads((output / ASSET_MANIFEST_FILENAME).read_text())
+    assert asset_manifest["static/styles.css"] == stylesheet.removeprefix("/")
+    assert archive.verify_links(output, urls) == []
+
+
+def test_group_by_work():
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT))
+    groups = archive.group_by_work(["/", "/works/nuth/", "/works/dracula/02.html", "/works/dracula/work.html", "/static/logo.png"])
+    assert [(work and work.slug, urls) for work, urls in groups] == [
+        ("dracula", ["/works/dracula/02.html", "/works/dracula/work.html"]),
+        ("nuth", ["/works/nuth/"]),
+        (None, ["/", "/static/logo.png"]),
+    ]
+
+
+def test_low_memory_render(tmp_path, fake_sass):
+    cache.configure(None)
+    RenderableArchive(Site.load_site(SAMPLE_CONTENT)).render(tmp_path / "default")
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT))
+    archive.render(tmp_path / "low", low_memory=True)
+    for path in (tmp_path / "default").rglob("*.html"):
+        assert path.read_bytes() == (tmp_path / "low" / path.relative_to(tmp_path / "default")).read_bytes()
+    # only the word counts are left behind
+    for work in archive.site.works:
+        assert all(chapter._content is None for chapter in work.chapters)
+        assert all(chapter._wordcount is not None for chapter in work.chapters)
+
+
+def _files(directory: pathlib.Path):
+    return {path.relative_to(directory).as_posix(): path.read_bytes() for path in directory.rglob("*") if path.is_file()}
+
+
+def test_parallel_render_matches_serial_render(tmp_path, fake_sass):
+    cache.configure(None)
+    RenderableArchive(Site.load_site(SAMPLE_CONTENT)).render(tmp_path / "serial", jobs=1)
+    RenderableArchive(Site.load_site(SAMPLE_CONTENT)).render(tmp_path / "parallel", jobs=2)
+    serial = _files(tmp_path / "serial")
+    assert len(serial) > 100
+    assert _files(tmp_path / "parallel") == serial
+
+
+def test_parallel_render_names_the_url_that_failed(tmp_path, fake_sass):
+    content = tmp_path / "content"
+    shutil.copytree(SAMPLE_CONTENT, content)
+    cache.configure(None)
+    archive = RenderableArchive(Site.load_site(content))
+    for work in archive.site.works:
+        work.wordcount  # noqa: B018
+    # the worker rendering this oneshot's page finds its chapter gone
+    (content / "works" / "nuth" / "nuth.html").unlink()
+    with pytest.raises(RenderError) as excinfo:
+        archive.render(tmp_path / "output", jobs=2)
+    assert excinfo.value.url == "/works/nuth/"
+    assert str(excinfo.value) == "Failed to render /works/nuth/"
+
+
+def test_incremental_render_rewrites_only_what_changed(tmp_path, fake_sass):
+    content = tmp_path / "content"
+    shutil.copytree(SAMPLE_CONTENT, content)
+    output = tmp_path / "output"
+    cache.configure(None)
+    RenderableArchive(Site.load_site(content)).render(output)
+    stamps = {path: path.stat().st_mtime_ns for path in output.rglob("*") if path.is_file()}
+
+    with (content / "works" / "a-scandal-in-bohemia" / "part-2.html").open("a") as chapter_file:
+        chapter_file.write("<p>Some more words.</p>")
+    RenderableArchive(Site.load_site(content)).render(output)
+    rewritten = {path.relative_to(output).as_posix() for path, stamp in stamps.items() if path.stat().st_mtime_ns != stamp}
+    assert rewritten == {
+        MANIFEST_FILENAME,
+        "index.html",
+        "works/index.html",
+        "series/index.html",
+        "series/sherlock-holmes/index.html",
+        "search/documents.json",
+        "works/a-scandal-in-bohemia/index.html",
+        "works/a-scandal-in-bohemia/nav.html",
+        "works/a-scandal-in-bohemia/work.html",
+        "works/a-scandal-in-bohemia/1.html",
+        "works/a-scandal-in-bohemia/2.html",
+        "works/a-scandal-in-bohemia/3.html",
+    }
+
+    shutil.rmtree(content / "works" / "nuth")
+    RenderableArchive(Site.load_site(content)).render(output)
+    assert not (output / "works" / "nuth").exists()
+    assert "/works/nuth/" not in BuildManifest.load(output).entries
+    assert "nuth" not in (output / "works" / "index.html").read_text()
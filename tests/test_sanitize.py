@@ -0,0 +1,118 @@
+import pathlib
+
+import pytest
+
+from ao3mimic import benchmark, cache, sanitize, utils
+from ao3mimic.models import Site
+from ao3mimic.sanitize import ProcessedHtml, process_html
+from ao3mimic.utils import count_html_text
+
+SAMPLE_CONTENT = pathlib.Path(__file__).parent.parent / "sample-content"
+
+
+def _userstuff(site: Site):
+    for work in site.works:
+        yield from (work.summary, work.notes_before, work.notes_after)
+        for chapter in work.chapters:
+            yield from (chapter.content, chapter.summary, chapter.notes_before, chapter.notes_after)
+    for series in site.series:
+        yield from (series.summary, series.notes)
+
+
+def _assert_same_as_html5lib(html: str):
+    processed = sanitize._process_fast(html)
+    assert processed is not None, "fell back to html5lib"
+    assert processed == sanitize._process_html5lib(html)
+    assert processed.wordcount == count_html_text(html)
+
+
+def test_sample_content_matches_html5lib():
+    texts = [text for text in _userstuff(Site.load_site(SAMPLE_CONTENT)) if text]
+    assert len(texts) > 50
+    for html in texts:
+        _assert_same_as_html5lib(html)
+
+
+def test_synthetic_archive_matches_html5lib(tmp_path: pathlib.Path):
+    benchmark.generate_archive(tmp_path, benchmark.ArchiveShape(works=4, chapters=3, paragraphs=20))
+    for html in _userstuff(Site.load_site(tmp_path)):
+        if html:
+            _assert_same_as_html5lib(html)
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        "",
+        "Leading text <b>bold</b> trailing",
+        "   \n  <p>whitespace first</p>  \n",
+        '<p title=a id=b class="  c   d  ">sorted attributes, tidied classes</p>',
+        """<p title='say "hi"'>quotes</p><p title="it's &quot;both&quot;">both</p>""",
+        '<a href="https://example.com/">new rel</a> <a rel="nofollow  me" href="http://x.org" title="t">old rel</a>',
+        '<a href="/relative">no rel</a> <a href="mailto:a@b.c">mail</a> <a href="#frag">fragment</a>',
+        "<table>\n  <thead><tr><th>h</th></tr></thead>\n  <tbody><tr><td><p>in cell</p></td></tr></tbody>\n</table>",
+        "<p>a<!-- a comment -->b</p><!--x-->",
+        "<p>&amp; &lt; &gt; &nbsp; &copy; &#8217; &#x2014; Tom & Jerry &;</p>",
+        '<br><br/><hr><img src="a.png" alt="a < b &amp; c">',
+        "<ol><li><ul><li>nested</li></ul></li></ol><dl><dt>term</dt><dd>definition</dd></dl>",
+        "<section><header>h</header><p>x</p><footer>f</footer></section><details><summary>s</summary>d</details>",
+        "<P CLASS=Upper>Caps</P><p>crlf\r\nline\rbreak</p>",
+        "<pre>no leading newline</pre>",
+    ],
+)
+def test_fast_path_matches_html5lib(html: str):
+    _assert_same_as_html5lib(html)
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        # libxml2 closes elements itself more readily than HTML5
+        "<p>one<p>two",
+        "<ul><li>one<li>two</ul>",
+        "<p>para <div>div in p</div></p>",
+        "<p>a<table><tbody><tr><td>x</td></tr></tbody></table>b</p>",
+        "<table><tr><td>no tbody</td></tr></table>",
+        "<table>stray<tbody><tr><td>x</td></tr></tbody></table>",
+        "<td>orphan cell</td>",
+        "<span/>text",
+        "<em>unclosed <strong>nested</em> mis</strong>",
+        "<i><p>closed early by libxml2",
+        "<h1>a<h2>b</h2></h1>",
+        '<a href="/a">one <a href="/b">two</a></a>',
+        "<pre>\nleading newline</pre>",
+        "<wbr>inside</wbr>",
+        "<p>&notanentity; &bigstar; &copy AT&T &#150; &#0;</p>",
+        "<!-- leading comment --><p>x</p>",
+        "<script>alert(1)</script><form><input name=x></form><svg><circle/></svg>",
+        "<html><body><p>x</p></body></html>",
+    ],
+)
+def test_falls_back_to_html5lib(html: str):
+    assert sanitize._process_fast(html) is None
+    assert process_html(html) == sanitize._process_html5lib(html)
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_chapter_wordcount_leaves_it_sanitized(tmp_path: pathlib.Path, monkeypatch, use_cache: bool):
+    monkeypatch.setattr(utils, "_sanitized", utils._SanitizedCache())
+    cache.configure(tmp_path if use_cache else None)
+    try:
+        chapter = Site.load_site(SAMPLE_CONTENT).get_work("dracula").chapters[0]
+        expected = sanitize._process_html5lib(chapter.content)
+        assert chapter.wordcount == expected.wordcount
+        # rendering the chapter afterward needs no second parse
+        monkeypatch.setattr(sanitize, "process_html", None)
+        assert utils.clean_userstuff(chapter.content) == expected.cleaned
+    finally:
+        cache.configure(None)
+
+
+def test_processed_html_round_trips_through_cache(tmp_path: pathlib.Path):
+    cache.configure(tmp_path)
+    try:
+        first = utils.process_userstuff("<p>Cached <i>words</i></p>")
+        assert first == ProcessedHtml(cleaned="<p>Cached <i>words</i></p>", wordcount=2)
+        assert utils.process_userstuff("<p>Cached <i>words</i></p>") == first
+    finally:
+        cache.configure(None)
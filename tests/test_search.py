@@ -0,0 +1,77 @@
+import pathlib
+import shutil
+
+import msgspec
+
+from ao3mimic import cache
+from ao3mimic.models import Site
+from ao3mimic.render import RenderableArchive
+from ao3mimic.search import SearchIndex, search_terms, shard_name
+
+SAMPLE_CONTENT = pathlib.Path(__file__).parent.parent / "sample-content"
+
+
+def _postings(archive: RenderableArchive, term: str):
+    shard = archive.search_index.shards.get(shard_name(term), {})
+    postings = shard.get(term, [])
+    return dict(zip(postings[::2], postings[1::2], strict=True))
+
+
+def _titles(archive: RenderableArchive, term: str):
+    return {archive.search_index.documents[doc_id].title for doc_id in _postings(archive, term)}
+
+
+def test_search_terms():
+    assert list(search_terms("Holmes, Watson; and Mrs. Hudson's don't")) == ["holmes", "watson", "and", "mrs", "hudson's", "don't"]
+    assert list(search_terms("-- ... ,")) == []
+
+
+def test_shard_name():
+    assert shard_name("vampires") == "7661"
+    assert shard_name("v") == "76"
+    assert shard_name("éclair") == "c3a963"
+
+
+def test_index_finds_works_by_title_author_and_tag():
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT))
+    assert _titles(archive, "dracula") == {"Dracula"}
+    assert _titles(archive, "stoker") == {"Dracula"}
+    assert _titles(archive, "vampires") == {"Dracula"}
+    # title words count for more than tags
+    dracula = next(doc_id for doc_id, doc in enumerate(archive.search_index.documents) if doc.title == "Dracula")
+    assert _postings(archive, "dracula")[dracula] > _postings(archive, "vampires")[dracula]
+
+
+def test_index_shards_and_documents():
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT))
+    index = archive.search_index
+    for shard, terms in index.shards.items():
+        assert all(shard_name(term) == shard for term in terms)
+    assert msgspec.json.decode(index.shard_json(shard_name("dracula")))["dracula"] == index.shards[shard_name("dracula")]["dracula"]
+    documents = msgspec.json.decode(index.documents_json())
+    assert len(documents["documents"]) == len(archive.site.works)
+    # links are relative to the search page
+    assert ["../works/dracula/01.html", "Dracula", "Bram Stoker", archive.site.get_work("dracula").wordcount] in documents["documents"]
+
+    urls = archive.plan()
+    assert "/search/" in urls
+    assert "/search/documents.json" in urls
+    assert f"/search/terms/{shard_name('dracula')}.json" in urls
+
+
+def test_chapter_text_is_indexed_when_enabled(tmp_path: pathlib.Path):
+    content = tmp_path / "content"
+    shutil.copytree(SAMPLE_CONTENT, content)
+    archive = RenderableArchive(Site.load_site(content))
+    assert not _postings(archive, "bistritz")
+
+    with (content / "settings.toml").open("a") as settings_file:
+        settings_file.write("search_chapter_text = true\n")
+    cache.configure(tmp_path / "cache")
+    try:
+        archive = RenderableArchive(Site.load_site(content))
+        assert _titles(archive, "bistritz") == {"Dracula"}
+        # the second time round, chapter terms come from the cache
+        assert SearchIndex.build(archive.site.works, [""] * len(archive.site.works), True).shards == archive.search_index.shards
+    finally:
+        cache.configure(None)
@@ -0,0 +1,75 @@
+import pathlib
+
+import pytest
+from werkzeug.test import Client
+
+from ao3mimic.models import Site
+from ao3mimic.render import RenderableArchive
+from ao3mimic.serve import DevServer, PageCache, RenderedPage
+
+SAMPLE_CONTENT = pathlib.Path(__file__).parent.parent / "sample-content"
+
+
+def test_dev_server():
+    server = DevServer(RenderableArchive(Site.load_site(SAMPLE_CONTENT)))
+    client = Client(server)
+
+    response = client.get("/works/nuth/")
+    assert response.status_code == 200
+    assert response.mimetype == "text/html"
+    assert b"How Nuth Would Have Practised His Art Upon the Gnoles" in response.data
+    etag = response.headers["ETag"]
+    assert client.get("/works/nuth/", headers={"If-None-Match": etag}).status_code == 304
+
+    assert client.get("/works/nuth").status_code == 308
+    assert client.get("/works/no-such-work/").status_code == 404
+    assert client.get("/no/such/page").status_code == 404
+
+    media = client.get("/works/the-adventure-of-the-dancing-men/media/e-letter.svg")
+    assert media.status_code == 200
+    assert media.mimetype == "image/svg+xml"
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/works/dracula/99.html",
+        "/works/dracula/00.html",
+        "/works/dracula/1.html",
+        "/works/dracula/abc.html",
+        "/works/nuth/3.html",
+        "/works/nuth/01.html",
+        "/works/nuth/nav.html",
+        "/works/nuth/work.html",
+        "/works/dracula/media/nope.png",
+        "/works/the-adventure-of-the-dancing-men/media/nope.png",
+        "/works/dracula/work.css",
+        "/static/nope.js",
+        "/static/site.css",
+        "/search/terms/nope.json",
+    ],
+)
+def test_dev_server_not_found(url: str):
+    # only the URLs a build would write are served
+    client = Client(DevServer(RenderableArchive(Site.load_site(SAMPLE_CONTENT))))
+    assert client.get(url).status_code == 404
+
+
+def test_dev_server_serves_planned_urls():
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT))
+    client = Client(DevServer(archive))
+    for url in ["/works/dracula/01.html", "/works/dracula/27.html", "/works/dracula/nav.html", "/works/dracula/work.html"]:
+        assert url in archive.plan()
+        assert client.get(url).status_code == 200
+
+
+def test_page_cache_evicts_least_recently_used():
+    pages = PageCache(max_bytes=10)
+    pages.put("/a", RenderedPage(b"aaaa", "text/html", "a"))
+    pages.put("/b", RenderedPage(b"bbbb", "text/html", "b"))
+    assert pages.get("/a") is not None
+    pages.put("/c", RenderedPage(b"cccc", "text/html", "c"))
+    assert pages.get("/b") is None
+    assert pages.get("/a") is not None
+    assert pages.get("/c") is not None
+    assert pages.total_bytes == 8
@@ -1,9 +1,19 @@
+import pathlib
+
+import bs4
 import htpy
 import hyperlink
+import more_itertools
 import pytest
 from markupsafe import Markup
 
-from ao3mimic.utils import clean_userstuff, comma_separated, make_relative_url
+from ao3mimic import cache, sanitize, utils
+from ao3mimic._wordchars import WORD_CHARS
+from ao3mimic.models import Site
+from ao3mimic.render import RenderableArchive
+from ao3mimic.utils import clean_userstuff, comma_separated, count_html_text, count_plain_text, get_site_urls, make_relative_url
+
+SAMPLE_CONTENT = pathlib.Path(__file__).parent.parent / "sample-content"
 
 
 @pytest.mark.parametrize(
@@ -49,3 +59,82 @@ def test_clean_userstuff_adds_rel_attr_on_external_links():
     html = '<p><a href="http://example.com">Please buy my product</a></p>'
     expected = '<p><a href="http://example.com" rel="noreferrer">Please buy my product</a></p>'
     assert clean_userstuff(html) == Markup(expected)
+
+
+def test_sanitized_cache_evicts_least_recently_used(monkeypatch):
+    sanitized = utils._SanitizedCache(max_chars=10)
+    monkeypatch.setattr(utils, "_sanitized", sanitized)
+    first, second, third = clean_userstuff("<b>a</b>"), clean_userstuff("<i>b</i>"), clean_userstuff("<u>c</u>")
+    assert len(sanitized) == 1
+    assert sanitized.total_chars == len(third)
+    assert sanitized.get(cache.cache_key("<u>c</u>")) == third
+    # kept by a digest of the HTML, not the HTML itself
+    assert sanitized.get("<u>c</u>") is None
+    assert (first, second) == (Markup("<b>a</b>"), Markup("<i>b</i>"))
+    utils.forget_cleaned("<u>c</u>")
+    assert len(sanitized) == 0
+    assert sanitized.total_chars == 0
+
+
+def test_clean_userstuff_uses_disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "_sanitized", utils._SanitizedCache())
+    cache.configure(tmp_path)
+    try:
+        html = '<p><a href="http://example.com">Cached</a></p>'
+        cleaned = clean_userstuff(html)
+        # a fresh process would only have the disk cache to go on
+        monkeypatch.setattr(utils, "_sanitized", utils._SanitizedCache())
+        monkeypatch.setattr(sanitize, "process_html", None)
+        assert clean_userstuff(html) == cleaned
+    finally:
+        cache.configure(None)
+
+
+def _reference_count(html: str) -> int:
+    # the original implementation: a full html5lib parse, then every WORD_CHARS match in the text
+    return more_itertools.ilen(WORD_CHARS.finditer(bs4.BeautifulSoup(html, "html5lib").get_text()))
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        "",
+        "plain words here",
+        "<p>a<!-- c d --><script>x y</script><style>p q</style>b</p>",
+        "<p>one&amp;two &nbsp;three<br>four</p>",
+        "<p>well-known -- dashes --- and em—dashes, soft­hyphens</p>",
+        "<p>It's 3.14; e.g. <i>emph</i>asis</p>",
+        # libxml2 reads these differently
+        "<p>&notit; &amp</p>",
+        "<plaintext>a <b> c",
+    ],
+)
+def test_count_html_text_matches_reference(html):
+    assert count_html_text(html) == _reference_count(html)
+
+
+def test_count_html_text_matches_reference_for_sample_chapters():
+    for chapter_file in SAMPLE_CONTENT.glob("works/*/*.html"):
+        html = chapter_file.read_text()
+        assert count_html_text(html) == _reference_count(html), chapter_file
+
+
+def test_count_plain_text_matches_word_chars():
+    text = "a--b c---d e-f -g h- ­i‐j \U0002b400k 𫐀l m—n"
+    assert count_plain_text(text) == more_itertools.ilen(WORD_CHARS.finditer(text))
+
+
+def _reference_site_urls(html: str, current_url: str) -> set[str]:
+    # the original implementation, with html5lib
+    soup = bs4.BeautifulSoup(html, "html5lib")
+    urls = {tag["href"] for tag in soup.find_all(href=True)} | {tag["src"] for tag in soup.find_all(src=True)}
+    return set(utils._site_urls(current_url, urls))
+
+
+def test_get_site_urls_matches_reference_for_sample_pages():
+    archive = RenderableArchive(Site.load_site(SAMPLE_CONTENT))
+    for url in archive.plan():
+        router = archive.router(url)
+        if not router.is_binary:
+            page = archive.render_layout(router)
+            assert get_site_urls(page, url) == _reference_site_urls(page, url), url
@@ -0,0 +1,109 @@
+import pathlib
+import shutil
+
+import pytest
+
+from ao3mimic import cache, watch
+from ao3mimic.search import shard_name
+from ao3mimic.watch import Watcher, stat_content
+
+SAMPLE_CONTENT = pathlib.Path(__file__).parent.parent / "sample-content"
+
+
+@pytest.fixture
+def content(tmp_path: pathlib.Path):
+    content = tmp_path / "content"
+    shutil.copytree(SAMPLE_CONTENT, content)
+    cache.configure(None)
+    return content
+
+
+def test_edited_chapter_rebuilds_work_and_listings(content: pathlib.Path, tmp_path: pathlib.Path):
+    watcher = Watcher(content, tmp_path / "output")
+    chapter_path = watcher.content / "works" / "a-scandal-in-bohemia" / "part-2.html"
+    old_wordcount = watcher.site.get_work("a-scandal-in-bohemia").wordcount
+    with chapter_path.open("a") as chapter_file:
+        chapter_file.write("<p>Some more words.</p>")
+
+    assert watcher.affected_urls([chapter_path]) == {
+        "/",
+        "/works/",
+        "/series/",
+        "/series/sherlock-holmes/",
+        "/works/a-scandal-in-bohemia/",
+        "/works/a-scandal-in-bohemia/nav.html",
+        "/works/a-scandal-in-bohemia/work.html",
+        "/works/a-scandal-in-bohemia/1.html",
+        "/works/a-scandal-in-bohemia/2.html",
+        "/works/a-scandal-in-bohemia/3.html",
+        "/search/documents.json",
+    }
+    assert watcher.site.get_work("a-scandal-in-bohemia").wordcount == old_wordcount + 3
+
+
+def test_edited_chapter_rebuilds_only_its_search_shards(content: pathlib.Path, tmp_path: pathlib.Path):
+    with (content / "settings.toml").open("a") as settings_file:
+        settings_file.write("search_chapter_text = true\n")
+    watcher = Watcher(content, tmp_path / "output")
+    chapter_path = watcher.content / "works" / "a-scandal-in-bohemia" / "part-2.html"
+    # as it was for the last build
+    assert watcher.archive.search_index is not None
+    with chapter_path.open("a") as chapter_file:
+        chapter_file.write("<p>Holmes, Holmes.</p>")
+
+    urls = watcher.affected_urls([chapter_path])
+    assert urls is not None
+    assert {url for url in urls if url.startswith("/search/")} == {"/search/documents.json", f"/search/terms/{shard_name('holmes')}.json"}
+
+
+def test_same_wordcount_rebuilds_only_the_chapter(content: pathlib.Path, tmp_path: pathlib.Path):
+    watcher = Watcher(content, tmp_path / "output")
+    chapter_path = watcher.content / "works" / "dracula" / "chapter-02.html"
+    chapter_path.write_text(chapter_path.read_text().replace("</p>", " </p>", 1))
+
+    assert watcher.affected_urls([chapter_path]) == {"/works/dracula/02.html", "/works/dracula/work.html"}
+
+
+def test_structural_change_reloads_site(content: pathlib.Path, tmp_path: pathlib.Path):
+    watcher = Watcher(content, tmp_path / "output")
+    work_toml = watcher.content / "works" / "nuth" / "work.toml"
+    assert watcher.affected_urls([work_toml]) is None
+    assert watcher.affected_urls([watcher.content / "works" / "nuth" / "deleted.html"]) is None
+
+
+def test_stat_content_skips_cache(content: pathlib.Path):
+    cache.configure(content / cache.DEFAULT_CACHE_DIRNAME)
+    try:
+        cache.get_cache("test").set("key", b"value")
+        stats = stat_content(content.resolve())
+    finally:
+        cache.configure(None)
+    assert content.resolve() / "settings.toml" in stats
+    assert not any(cache.DEFAULT_CACHE_DIRNAME in path.parts for path in stats)
+
+
+def test_stat_content_skips_hidden_directories(content: pathlib.Path):
+    (content / ".git" / "objects").mkdir(parents=True)
+    (content / ".git" / "objects" / "ab").write_text("x")
+    (content / "works" / "nuth" / ".backup").mkdir()
+    (content / "works" / "nuth" / ".backup" / "nuth.html").write_text("x")
+    stats = stat_content(content.resolve())
+    assert content.resolve() / "works" / "nuth" / "nuth.html" in stats
+    assert not any(part.startswith(".") for path in stats for part in path.relative_to(content.resolve()).parts)
+
+
+def test_run_forces_a_fresh_build_and_verifies_links(content: pathlib.Path, tmp_path: pathlib.Path, monkeypatch, capsys, fake_sass):
+    with (content / "works" / "nuth" / "nuth.html").open("a") as chapter_file:
+        chapter_file.write('<p><a href="missing.html">Nowhere</a></p>')
+    output = tmp_path / "output"
+    Watcher(content, output).archive.render(output)
+    (output / "stray.html").write_text("left over")
+
+    def stop(_):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(watch.time, "sleep", stop)
+    with pytest.raises(KeyboardInterrupt):
+        Watcher(content, output, force=True, verify_links=True).run()
+    assert not (output / "stray.html").exists()
+    assert "Broken link: /works/nuth/ -> /works/nuth/missing.html" in capsys.readouterr().out